@@ -0,0 +1,534 @@
+"""
+Local HTTP/JSON API of the movie catalogue.
+
+An asyncio server keeps one catalogue loaded in memory (the cached
+storage of open_storage()) and serves it to other tools:
+
+    GET    /movies                 all the movies
+    GET    /movies/<title>         one movie (the title URL-encoded)
+    GET    /search?q=&threshold=   search, with fuzzy suggestions
+    GET    /filter?min_rating=&start_year=&end_year=
+    GET    /sort?by=rating|year|title&order=desc|asc&limit=&offset=
+    GET    /stats                  rating statistics
+    POST   /movies                 add {"title", "year", "rating",
+                                   "poster"}, or {"title"} from OMDb
+    PATCH  /movies/<title>         update {"rating"} (PUT too)
+    DELETE /movies/<title>         delete
+    GET    /metrics                the metrics of the session, in the
+                                   Prometheus text format (--metrics)
+
+Every storage call runs in one worker thread, so the server keeps
+accepting connections while the catalogue is reloaded or saved; a
+read/write lock lets any number of reads run between two writes and
+keeps them out while a write runs. The OMDb lookup of a POST runs
+before the write lock is taken, in the default executor of the loop,
+so a slow answer of OMDb does not hold back the other requests. Every successful GET carries an
+ETag that changes with every write, also the writes of other
+processes to the storage files, and a request with a matching
+If-None-Match gets an empty 304 response. The body of /movies is
+serialised once per version of the catalogue. Connections are kept
+alive (HTTP/1.1) until the client closes them or stays idle for
+KEEP_ALIVE_TIMEOUT seconds.
+
+Run from the repository root:
+    python api_server.py [-f data/movies.json] [--port 8000] [--metrics]
+"""
+from movie_app import MovieApp, CommandError
+from storage.storage_factory import open_storage, BACKENDS
+from storage.storage_file import StorageConflictError
+from storage.instrumentation import metrics
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs, unquote
+import argparse
+import asyncio
+import json
+import os
+import re
+import zlib
+
+HOST = "127.0.0.1"
+PORT = 8000
+MOVIES_FILE = "data/movies.json"
+KEEP_ALIVE_TIMEOUT = 15
+MAX_HEADERS = 100
+MAX_BODY = 1 << 20
+SORT_KEYS = ("rating", "year", "title")
+PROMETHEUS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class HttpError(Exception):
+    """
+    Ends a request with an error status and message
+    """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ReadWriteLock:
+    """
+    asyncio lock held by any number of readers or by one writer.
+    A waiting writer goes before the readers that arrive after it,
+    so a steady flow of reads cannot hold the writes back.
+    """
+    def __init__(self):
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def read(self):
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: not self._writer and self._writers_waiting == 0)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._readers -= 1
+                self._condition.notify_all()
+
+    @asynccontextmanager
+    async def write(self):
+        async with self._condition:
+            self._writers_waiting += 1
+            try:
+                await self._condition.wait_for(
+                    lambda: not self._writer and self._readers == 0)
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class Request:
+    def __init__(self, method, target, version, headers, body):
+        self.method = method
+        self.version = version
+        self.headers = headers
+        self.body = body
+        url = urlsplit(target)
+        self.path = url.path
+        self.query = {name: values[-1] for name, values
+                      in parse_qs(url.query).items()}
+
+    def keep_alive(self):
+        """
+        Returns True if the connection stays open after the response
+        """
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def json(self):
+        """
+        Returns the JSON object of the body
+        """
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid JSON body")
+        if not isinstance(data, dict):
+            raise HttpError(HTTPStatus.BAD_REQUEST,
+                            "Expected a JSON object")
+        return data
+
+    def number(self, name, convert=float):
+        """
+        Returns a number of the query string, or None if it is missing
+        """
+        value = self.query.get(name)
+        if value is None:
+            return None
+        try:
+            return convert(value)
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST,
+                            f"{name} must be a number")
+
+
+class MovieServer:
+    """
+    The HTTP server of a movie storage
+    """
+    def __init__(self, storage, host=HOST, port=PORT):
+        self.storage = storage
+        self.app = MovieApp(storage)
+        self.host = host
+        self.port = port
+        self._lock = ReadWriteLock()
+        # one thread runs every storage call, so the writes never
+        # overlap and the cached storage is only used from one thread
+        self._executor = ThreadPoolExecutor(1)
+        self._version = 0
+        self._instance = os.urandom(4).hex()
+        self._list_body = None  # (etag, body) of GET /movies
+        self._server = None
+        self._routes = [
+            ("GET", re.compile(r"/movies"), self._list),
+            ("GET", re.compile(r"/movies/(.+)"), self._lookup),
+            ("GET", re.compile(r"/search"), self._search),
+            ("GET", re.compile(r"/filter"), self._filter),
+            ("GET", re.compile(r"/sort"), self._sort),
+            ("GET", re.compile(r"/stats"), self._stats),
+            ("POST", re.compile(r"/movies"), self._add),
+            ("PATCH", re.compile(r"/movies/(.+)"), self._update),
+            ("PUT", re.compile(r"/movies/(.+)"), self._update),
+            ("DELETE", re.compile(r"/movies/(.+)"), self._delete),
+        ]
+
+    def etag(self):
+        """
+        Returns the ETag of the current version of the catalogue: the
+        number of writes of the server, and the version of the storage
+        files when the storage has one, so that the writes of other
+        processes change it too
+        """
+        etag = f"{self._instance}-{self._version}"
+        if hasattr(self.storage, "version"):
+            signature = repr(self.storage.version()).encode("utf-8")
+            etag += f"-{zlib.crc32(signature):08x}"
+        return f'"{etag}"'
+
+    async def start(self):
+        """
+        Loads the catalogue and starts listening
+        (port 0 picks a free port, see self.port)
+        """
+        self.storage.count()
+        self._server = await asyncio.start_server(
+            self._serve_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        self._executor.shutdown()
+
+    async def _serve_connection(self, reader, writer):
+        """
+        Answers the requests of one connection until it is closed
+        """
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(
+                        self._read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except HttpError as e:
+                    writer.write(self._response(
+                        e.status, {"error": str(e)}, keep_alive=False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                keep_alive = request.keep_alive()
+                writer.write(await self._answer(request, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, ConnectionError,
+                asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """
+        Reads one request of the connection
+        :return: the Request, or None if the client closed the connection
+        """
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) == MAX_HEADERS:
+                raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                "Too many headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if "transfer-encoding" in headers:
+            raise HttpError(HTTPStatus.NOT_IMPLEMENTED,
+                            "Chunked bodies are not supported")
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > MAX_BODY:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                            "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), target, version, headers, body)
+
+    def _route(self, request):
+        """
+        Returns the handler of a request and the title in its path
+        """
+        allowed = False
+        for method, pattern, handler in self._routes:
+            match = pattern.fullmatch(request.path)
+            if match is None:
+                continue
+            allowed = True
+            if method == request.method:
+                return handler, [unquote(group) for group in match.groups()]
+        if allowed:
+            raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED,
+                            f"{request.method} not allowed on {request.path}")
+        raise HttpError(HTTPStatus.NOT_FOUND, f"No such path {request.path}")
+
+    async def _answer(self, request, keep_alive):
+        """
+        Runs a request and returns the bytes of its response
+        """
+        try:
+            if request.path == "/metrics":
+                return self._metrics(request, keep_alive)
+            handler, arguments = self._route(request)
+            loop = asyncio.get_running_loop()
+            if request.method == "GET":
+                async with self._lock.read():
+                    etag, body = await loop.run_in_executor(
+                        self._executor, self._read, handler, request,
+                        arguments)
+                if body is None:
+                    return self._response(HTTPStatus.NOT_MODIFIED, None,
+                                          keep_alive, etag)
+                return self._response(HTTPStatus.OK, body, keep_alive, etag)
+            if request.method == "POST":
+                arguments.append(await self._fetch(request))
+            async with self._lock.write():
+                status, result = await loop.run_in_executor(
+                    self._executor, handler, request, *arguments)
+                self._version += 1
+            return self._response(status, result, keep_alive)
+        except HttpError as e:
+            return self._response(e.status, {"error": str(e)}, keep_alive)
+        except StorageConflictError as e:
+            return self._response(HTTPStatus.CONFLICT, {"error": str(e)},
+                                  keep_alive)
+        except (CommandError, ValueError) as e:
+            return self._response(HTTPStatus.BAD_REQUEST, {"error": str(e)},
+                                  keep_alive)
+        except OSError as e:
+            return self._response(HTTPStatus.INTERNAL_SERVER_ERROR,
+                                  {"error": str(e)}, keep_alive)
+
+    def _read(self, handler, request, arguments):
+        """
+        Runs a GET handler, in the storage thread
+        :return: the ETag of the catalogue and the body of the response,
+            None if the ETag matches If-None-Match
+        """
+        etag = self.etag()
+        if request.headers.get("if-none-match") == etag:
+            return etag, None
+        return etag, handler(request, *arguments)
+
+    async def _fetch(self, request):
+        """
+        Gets from OMDb the properties of the movie of a POST that only
+        has a title, before the write lock is taken
+        :return: the properties, None if the request has them or is
+            invalid (_add reports it)
+        :raise HttpError: 409 if the movie is already in the catalogue
+        """
+        data = request.json()
+        title = data.get("title")
+        if not isinstance(title, str) or title == "" or \
+                "year" in data or "rating" in data:
+            return None
+        loop = asyncio.get_running_loop()
+        async with self._lock.read():
+            properties = await loop.run_in_executor(
+                self._executor, self.storage.get_movie, title)
+        if properties is not None:
+            raise HttpError(HTTPStatus.CONFLICT,
+                            f"Movie {title} already exist!")
+        return await loop.run_in_executor(None, self.app.fetch_movie, title)
+
+    def _metrics(self, request, keep_alive):
+        """
+        Returns the response of GET /metrics, never cached since the
+        metrics change with every request
+        """
+        if not metrics.enabled:
+            raise HttpError(HTTPStatus.NOT_FOUND,
+                            "Metrics are off, start the server "
+                            "with --metrics")
+        if request.method != "GET":
+            raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED,
+                            f"{request.method} not allowed on /metrics")
+        return self._response(HTTPStatus.OK,
+                              metrics.to_prometheus().encode("utf-8"),
+                              keep_alive, content_type=PROMETHEUS_TYPE)
+
+    @staticmethod
+    def _response(status, result, keep_alive, etag=None,
+                  content_type="application/json"):
+        """
+        Returns the bytes of a response: result is serialised as JSON,
+        unless it already is bytes
+        """
+        if status == HTTPStatus.NOT_MODIFIED:
+            body = b""
+        elif isinstance(result, bytes):
+            body = result
+        else:
+            body = json.dumps(result).encode("utf-8")
+        headers = [f"HTTP/1.1 {status.value} {status.phrase}",
+                   f"Content-Type: {content_type}",
+                   f"Content-Length: {len(body)}",
+                   f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if etag is not None:
+            headers.append(f"ETag: {etag}")
+        return ("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body
+
+    def _require(self, title):
+        """
+        Returns the properties of a movie
+        :raise HttpError: 404 if it is not in the catalogue
+        """
+        properties = self.storage.get_movie(title)
+        if properties is None:
+            raise HttpError(HTTPStatus.NOT_FOUND,
+                            f"Movie '{title}' doesn't exist!")
+        return properties
+
+    def _list(self, request):
+        etag = self.etag()
+        if self._list_body is None or self._list_body[0] != etag:
+            self._list_body = (etag, json.dumps(self.app.list_movies())
+                               .encode("utf-8"))
+        return self._list_body[1]
+
+    def _lookup(self, request, title):
+        return {"title": title, **self._require(title)}
+
+    def _search(self, request):
+        if not request.query.get("q"):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "q is required")
+        threshold = request.number("threshold", int)
+        return self.app.search_movie(
+            request.query["q"], 60 if threshold is None else threshold)
+
+    def _filter(self, request):
+        return self.app.filter_movies(request.number("min_rating"),
+                                      request.number("start_year", int),
+                                      request.number("end_year", int))
+
+    def _sort(self, request):
+        key = request.query.get("by", "rating")
+        order = request.query.get("order", "desc")
+        if key not in SORT_KEYS or order not in ("asc", "desc"):
+            raise HttpError(HTTPStatus.BAD_REQUEST,
+                            f"by must be one of {', '.join(SORT_KEYS)} "
+                            f"and order asc or desc")
+        limit = request.number("limit", int)
+        offset = request.number("offset", int) or 0
+        if (limit is not None and limit < 0) or offset < 0:
+            raise HttpError(HTTPStatus.BAD_REQUEST,
+                            "limit and offset must not be negative")
+        return self.storage.top_n(key, limit, order == "desc", offset)
+
+    def _stats(self, request):
+        return self.app.movie_stats()
+
+    def _add(self, request, properties=None):
+        """
+        :param properties: the properties fetched from OMDb by _fetch(),
+            None to take them from the request
+        """
+        data = request.json()
+        title = data.get("title")
+        if not isinstance(title, str) or title == "":
+            raise HttpError(HTTPStatus.BAD_REQUEST, "title is required")
+        if self.storage.get_movie(title) is not None:
+            raise HttpError(HTTPStatus.CONFLICT,
+                            f"Movie {title} already exist!")
+        if properties is None:
+            try:
+                year = int(data["year"])
+                rating = float(data["rating"])
+            except (KeyError, TypeError, ValueError):
+                raise HttpError(HTTPStatus.BAD_REQUEST,
+                                "year and rating must be numbers")
+            if not 0 <= rating <= 10:
+                raise HttpError(HTTPStatus.BAD_REQUEST,
+                                "The rating must be a number from 0 to 10")
+            properties = {"year": year, "rating": rating,
+                          "poster": data.get("poster", "N/A")}
+        self.storage.add_movie(title, properties["year"],
+                               properties["rating"], properties["poster"])
+        return HTTPStatus.CREATED, {"title": title, **properties}
+
+    def _update(self, request, title):
+        self._require(title)
+        rating = request.json().get("rating")
+        if isinstance(rating, bool) or not isinstance(rating, (int, float)):
+            raise HttpError(HTTPStatus.BAD_REQUEST,
+                            "rating must be a number")
+        self.app.update_movie(title, rating)
+        return HTTPStatus.OK, {"title": title, **self._require(title)}
+
+    def _delete(self, request, title):
+        self._require(title)
+        self.app.delete_movie(title)
+        return HTTPStatus.OK, {"title": title}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="HTTP/JSON API of the movie catalogue")
+    parser.add_argument("-f", "--file", dest="movies_file",
+                        default=MOVIES_FILE, help="the movies file")
+    parser.add_argument("--storage", choices=BACKENDS,
+                        help="storage of the movies file "
+                             "(default: from its extension)")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--metrics", action="store_true",
+                        help="serve the metrics of the session "
+                             "at GET /metrics")
+    args = parser.parse_args(argv)
+    if args.metrics:
+        metrics.enable()
+    storage = open_storage(args.movies_file, args.storage, interactive=False)
+    server = MovieServer(storage, args.host, args.port)
+
+    async def serve():
+        await server.start()
+        print(f"Serving {args.movies_file} on "
+              f"http://{server.host}:{server.port}", flush=True)
+        await server.serve_forever()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark of the point operations of the memory-mapped binary storage
+(storage/storage_binary.py) against the JSON and SQLite storages.
+
+Every operation opens the storage afresh, as a command of main.py
+does: picking a random movie, looking a movie up and updating its
+rating. The JSON storage parses the whole file for each of them, the
+binary storage reads (or writes) one record of the map.
+
+Run from the repository root:
+    python -m benchmarks.bench_binary [sizes...]
+"""
+import os
+import random
+import sys
+import tempfile
+from benchmarks.bench_index import timed
+from benchmarks.synthetic import iter_movies
+from storage import movie_streams
+from storage.storage_factory import open_storage
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+BACKENDS = ("json", "sqlite", "binary")
+EXTENSIONS = {"json": ".json", "sqlite": ".sqlite", "binary": ".bin"}
+
+
+def random_movie(file_path):
+    return open_storage(file_path, interactive=False).random_movie()
+
+
+def get_movie(file_path, title):
+    return open_storage(file_path, interactive=False).get_movie(title)
+
+
+def update_movie(file_path, title):
+    storage = open_storage(file_path, interactive=False)
+    storage.update_movie(title, round(random.uniform(0, 10), 1))
+
+
+def main(sizes):
+    print(f"{'movies':>10} {'backend':<8} {'random ms':>10} "
+          f"{'lookup ms':>10} {'update ms':>10}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {backend: os.path.join(directory,
+                                           "movies" + EXTENSIONS[backend])
+                     for backend in BACKENDS}
+            with open(paths["json"], "w", encoding="utf-8") as json_file:
+                movie_streams.write_json(json_file, iter_movies(size))
+            source = open_storage(paths["json"], cache=False)
+            for backend in BACKENDS[1:]:
+                movie_streams.convert(source, open_storage(paths[backend]))
+            title = random_movie(paths["json"])[0]
+            for backend in BACKENDS:
+                file_path = paths[backend]
+                print(f"{size:>10} {backend:<8} "
+                      f"{timed(random_movie, file_path)[0]:>10.2f} "
+                      f"{timed(get_movie, file_path, title)[0]:>10.2f} "
+                      f"{timed(update_movie, file_path, title)[0]:>10.2f}")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
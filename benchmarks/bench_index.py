@@ -0,0 +1,84 @@
+"""
+Benchmark of the sorted secondary indexes (storage/movie_index.py)
+against the comprehension and sorted() based code they replace.
+
+Run from the repository root:
+    python -m benchmarks.bench_index [sizes...]
+"""
+import sys
+import time
+from benchmarks.synthetic import generate_movies
+from storage.movie_index import MovieIndex
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+QUERIES = ((8.5, None, None), (None, 1990, 1999), (7.0, 2000, 2005))
+TOP = 20
+
+
+def comprehension_filter(movies, min_rate, start, end):
+    """
+    The filter of MovieApp before the indexes: one dict
+    comprehension over the catalogue per criterion
+    """
+    if min_rate is not None:
+        movies = {key: value for key, value in movies.items() if
+                  value["rating"] >= min_rate}
+    if start is not None:
+        movies = {key: value for key, value in movies.items() if
+                  value["year"] >= start}
+    if end is not None:
+        movies = {key: value for key, value in movies.items() if
+                  value["year"] <= end}
+    return list(movies)
+
+
+def comprehension_top(movies, key):
+    """
+    The ranking of MovieApp before the indexes: a full sort
+    """
+    return [title for title, properties in
+            sorted(movies.items(), key=lambda movie: movie[1][key],
+                   reverse=True)[:TOP]]
+
+
+def timed(function, *args, repeat=3):
+    """
+    Returns the best time in milliseconds of repeat runs,
+    and the result of the last one
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(sizes):
+    print(f"{'movies':>10} {'operation':<28} {'scan ms':>10} "
+          f"{'index ms':>10} {'speed-up':>9}")
+    for size in sizes:
+        movies = generate_movies(size)
+        build_ms, index = timed(MovieIndex, movies, repeat=1)
+        print(f"{size:>10} {'build index':<28} {'':>10} {build_ms:>10.2f}")
+        rows = []
+        for query in QUERIES:
+            scan_ms, expected = timed(comprehension_filter, movies, *query)
+            index_ms, result = timed(index.filter, *query)
+            assert result == expected
+            rows.append((f"filter {query}", scan_ms, index_ms))
+        for key in ("rating", "year"):
+            scan_ms, expected = timed(comprehension_top, movies, key)
+            index_ms, result = timed(
+                lambda: [title for title, _ in
+                         zip(index.ordered(key, reverse=True), range(TOP))])
+            assert result == expected
+            rows.append((f"top {TOP} by {key}", scan_ms, index_ms))
+        for operation, scan_ms, index_ms in rows:
+            print(f"{size:>10} {operation:<28} {scan_ms:>10.2f} "
+                  f"{index_ms:>10.3f} {scan_ms / index_ms:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,57 @@
+"""
+Memory benchmark of the columnar catalogue (storage/movie_catalogue.py)
+against the dictionary of dictionaries returned by list_movies().
+
+Both are built from the same JSON text, so that neither shares its
+strings with the other, and the memory they keep is measured with
+tracemalloc.
+
+Run from the repository root:
+    python -m benchmarks.bench_memory [sizes...]
+"""
+import json
+import sys
+import time
+import tracemalloc
+from benchmarks.synthetic import generate_movies
+from storage.movie_catalogue import MovieCatalogue
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+
+def measure(build, text):
+    """
+    Builds a catalogue from the JSON text
+    :return: (bytes kept, peak bytes, build ms, the catalogue)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    catalogue = build(text)
+    elapsed = (time.perf_counter() - start) * 1000
+    kept, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return kept, peak, elapsed, catalogue
+
+
+def main(sizes):
+    print(f"{'movies':>10} {'representation':<16} {'kept MB':>9} "
+          f"{'bytes/movie':>12} {'peak MB':>9} {'build ms':>9}")
+    for size in sizes:
+        text = json.dumps(generate_movies(size))
+        rows = []
+        for name, build in (
+                ("dict of dicts", json.loads),
+                ("columnar", lambda data: MovieCatalogue(json.loads(data)))):
+            kept, peak, elapsed, catalogue = measure(build, text)
+            rows.append((name, kept, peak, elapsed, catalogue))
+        assert dict(rows[1][4].items()) == rows[0][4]
+        for name, kept, peak, elapsed, catalogue in rows:
+            print(f"{size:>10} {name:<16} {kept / 2 ** 20:>9.1f} "
+                  f"{kept / size:>12.0f} {peak / 2 ** 20:>9.1f} "
+                  f"{elapsed:>9.0f}")
+        print(f"{size:>10} {'saving':<16} "
+              f"{rows[0][1] / rows[1][1]:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,56 @@
+"""
+Benchmark of the sharded storage (storage/storage_sharded.py) as the
+number of shards grows: the cost of one mutation, which rewrites a
+single shard, and the throughput of a full scan (list_movies) and of
+a ranking (top 20 by rating), fanned out to threads or processes.
+One shard is the cost of the single-file StorageJson.
+
+Run from the repository root:
+    python -m benchmarks.bench_shards [movies] [shard counts...]
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+from benchmarks.bench_index import timed
+from benchmarks.synthetic import generate_movies
+from storage.storage_sharded import StorageSharded
+
+DEFAULT_SIZE = 200_000
+DEFAULT_SHARDS = (1, 2, 4, 8, 16)
+TOP = 20
+
+
+def main(size, shard_counts):
+    movies = generate_movies(size)
+    titles = list(movies)
+    print(f"{'movies':>10} {'shards':>6} {'executor':<8} {'update ms':>10} "
+          f"{'add+delete ms':>14} {'scan ms':>9} {'movies/s':>10} "
+          f"{'top ms':>8}")
+    for shards in shard_counts:
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "movies.shards")
+            StorageSharded(file_path, shards).add_movies(movies)
+            for executor in ("thread", "process"):
+                storage = StorageSharded(file_path, executor=executor)
+                update = timed(storage.update_movie, titles[0], 5.0)[0]
+
+                def add_delete():
+                    storage.add_movie("Benchmark", 2000, 5.0, "N/A")
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        storage.delete_movie("Benchmark")
+                change = timed(add_delete)[0]
+                scan, scanned = timed(storage.list_movies)
+                assert len(scanned) == size
+                top = timed(storage.top_n, "rating", TOP, True)[0]
+                storage.close()
+                print(f"{size:>10} {shards:>6} {executor:<8} {update:>10.1f} "
+                      f"{change:>14.1f} {scan:>9.0f} "
+                      f"{size / scan * 1000:>10.0f} {top:>8.0f}")
+
+
+if __name__ == "__main__":
+    arguments = [int(argument) for argument in sys.argv[1:]]
+    main(arguments[0] if arguments else DEFAULT_SIZE,
+         arguments[1:] or DEFAULT_SHARDS)
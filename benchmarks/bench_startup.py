@@ -0,0 +1,118 @@
+"""
+Start-up benchmark of the command line (main.py): runs every command
+in a fresh interpreter under python -X importtime and reports the time
+spent importing modules, the wall time, and which heavy dependencies
+got loaded. A command that loads a heavy dependency it does not need,
+or whose imports exceed the budget, fails the benchmark.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup [--repeat N] [--budget MS]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Top-level packages that are slow to import
+HEAVY = ("matplotlib", "thefuzz", "rapidfuzz", "requests", "dotenv",
+         "PIL")
+# Commands, and the heavy packages they are allowed to load
+COMMANDS = (
+    (["list-movies"], ()),
+    (["movie-stats"], ()),
+    (["random-movie"], ()),
+    (["sort-movies-by-rating"], ()),
+    (["sort-movies-by-year"], ()),
+    (["filter-movies", "--min-rating", "8"], ()),
+    (["search-movie", "the"], ("thefuzz", "rapidfuzz")),
+    (["search-movie", "titanik"], ("thefuzz", "rapidfuzz")),
+    (["create-histogram", "{tmp}/histogram"], ("matplotlib", "PIL")),
+)
+
+
+def parse_importtime(stderr):
+    """
+    Parses the output of -X importtime
+    :return: (time in ms of the imports of main.py, not counting the
+        interpreter start-up (site), set of the loaded top-level packages)
+    """
+    total = 0
+    started = False
+    packages = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():  # the header line
+            continue
+        packages.add(name.strip().split(".")[0])
+        if name.startswith("  "):  # counted in its importer
+            continue
+        if started:
+            total += int(cumulative)
+        started = started or name.strip() == "site"
+    return total / 1000, packages
+
+
+def run_command(command, movies_file, tmp):
+    """
+    Runs a command of main.py under -X importtime
+    :return: (import ms, wall ms, loaded packages)
+    """
+    args = [argument.format(tmp=tmp) for argument in command]
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "main.py", "-f", movies_file]
+        + args, capture_output=True, text=True)
+    wall = (time.perf_counter() - start) * 1000
+    if process.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{process.stdout}")
+    import_ms, packages = parse_importtime(process.stderr)
+    return import_ms, wall, packages
+
+
+def main(repeat, budget, movies_file):
+    tmp = tempfile.mkdtemp()
+    try:
+        catalogue = os.path.join(tmp, os.path.basename(movies_file))
+        shutil.copy(movies_file, catalogue)
+        print(f"{'command':<34} {'import ms':>10} {'wall ms':>9}  "
+              f"heavy modules")
+        failures = []
+        for command, allowed in COMMANDS:
+            runs = [run_command(command, catalogue, tmp)
+                    for _ in range(repeat)]
+            import_ms = min(run[0] for run in runs)
+            wall = min(run[1] for run in runs)
+            heavy = sorted(set(HEAVY) & runs[-1][2])
+            name = " ".join(command).format(tmp="tmp")
+            print(f"{name:<34} {import_ms:>10.1f} {wall:>9.1f}  "
+                  f"{', '.join(heavy) or '-'}")
+            unexpected = set(heavy) - set(allowed)
+            if unexpected:
+                failures.append(f"{name} loads {', '.join(unexpected)}")
+            if budget is not None and not allowed and import_ms > budget:
+                failures.append(f"{name} imports take {import_ms:.1f} ms, "
+                                f"budget {budget} ms")
+    finally:
+        shutil.rmtree(tmp)
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs of every command, the best is kept")
+    parser.add_argument("--budget", type=float,
+                        help="maximum import ms of the commands that "
+                             "need no heavy module")
+    parser.add_argument("--file", default=os.path.join("data",
+                                                       "movies.json"),
+                        help="movies file copied for the runs")
+    args = parser.parse_args()
+    sys.exit(main(args.repeat, args.budget, args.file))
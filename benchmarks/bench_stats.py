@@ -0,0 +1,83 @@
+"""
+Benchmark of the statistics engine (storage/rating_stats.py) against
+the code it replaces: a list of the ratings, statistics.mean() and
+median(), and a full sort to pick the best and worst movie, plus the
+same list built again for the histogram. The running aggregates of
+the MovieIndex, which answer the same queries without a pass over the
+catalogue, are timed too.
+
+Run from the repository root:
+    python -m benchmarks.bench_stats [sizes...]
+"""
+import statistics
+import sys
+from benchmarks.bench_index import timed
+from benchmarks.synthetic import generate_movies
+from storage import rating_stats
+from storage.movie_catalogue import MovieCatalogue
+from storage.movie_index import MovieIndex
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+
+def list_stats(movies):
+    """
+    The stats command of MovieApp before the engine
+    """
+    rate = [properties["rating"] for properties in movies.values()]
+    ordered = sorted(movies.items(), key=lambda movie: movie[1]["rating"])
+    return (statistics.mean(rate), statistics.median(rate),
+            ordered[-1][0], ordered[0][0])
+
+
+def list_histogram(movies):
+    """
+    The ratings list the histogram command built before the engine
+    """
+    return [properties["rating"] for properties in movies.values()]
+
+
+def dict_columns(movies):
+    """
+    Columns of a dictionary catalogue, as IStorage.rating_columns()
+    builds them
+    """
+    titles = list(movies)
+    ratings = [properties["rating"] for properties in movies.values()]
+    years = [properties["year"] for properties in movies.values()]
+    return titles, ratings, years
+
+
+def main(sizes):
+    print(f"{'movies':>10} {'operation':<34} {'ms':>10}")
+    for size in sizes:
+        movies = generate_movies(size)
+        catalogue = MovieCatalogue(movies)
+        columns = catalogue.columns()
+        index = MovieIndex(movies)
+        rows = [
+            ("stats: list + statistics + sort",
+             timed(list_stats, movies)[0]),
+            ("histogram: ratings list",
+             timed(list_histogram, movies)[0]),
+            ("columns of the dict catalogue",
+             timed(dict_columns, movies)[0]),
+            ("engine: summarise (columnar)",
+             timed(rating_stats.summarise, columns[0], columns[1])[0]),
+            ("engine: histogram (columnar)",
+             timed(rating_stats.histogram, columns[1])[0]),
+            ("engine: per-decade (columnar)",
+             timed(rating_stats.group_means, columns[2], columns[1])[0]),
+            ("running: rating_summary (index)",
+             timed(index.rating_summary)[0]),
+            ("running: rating_histogram (index)",
+             timed(index.rating_histogram)[0]),
+            ("running: decade_averages (index)",
+             timed(index.decade_averages)[0]),
+        ]
+        for operation, elapsed in rows:
+            print(f"{size:>10} {operation:<34} {elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,97 @@
+"""
+Benchmark of the streaming readers and writers (storage/movie_streams.py)
+against loading the whole JSON file with json.loads(), as StorageJson
+did before, and of converting a catalogue to the other formats.
+
+Every measure runs in its own process, so that its peak memory (the
+maximum resident set size) is not hidden by the others. The JSON file
+is written as a stream too, so it can be larger than the memory:
+about 140 bytes per movie, 20 million movies for a 2.7 GB file.
+
+Run from the repository root (Linux or macOS):
+    python -m benchmarks.bench_streams [sizes...]
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.synthetic import iter_movies
+from storage import movie_streams
+from storage.storage_factory import open_storage
+
+DEFAULT_SIZES = (100_000, 1_000_000)
+MEASURES = ("json.loads", "iter_json", "convert to csv",
+            "convert to jsonl", "convert to sqlite")
+TARGETS = {"convert to csv": "csv", "convert to jsonl": "jsonl",
+           "convert to sqlite": "sqlite"}
+
+
+def peak_memory():
+    """
+    Returns the peak resident memory of the process in bytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_measure(measure, file_path, directory):
+    """
+    Runs one measure on the JSON movies file in this process
+    :return: (number of movies, seconds)
+    """
+    start = time.perf_counter()
+    if measure == "json.loads":
+        with open(file_path, "r", encoding="utf-8") as json_file:
+            count = len(json.loads(json_file.read()))
+    elif measure == "iter_json":
+        with open(file_path, "r", encoding="utf-8") as json_file:
+            count = sum(1 for movie in movie_streams.iter_json(json_file))
+    else:
+        backend = TARGETS[measure]
+        source = open_storage(file_path, interactive=False, cache=False)
+        target = open_storage(os.path.join(directory, "movies." + backend),
+                              interactive=False, cache=False)
+        count = movie_streams.convert(source, target)
+    return count, time.perf_counter() - start
+
+
+def measure_in_process(measure, file_path, directory):
+    """
+    Runs one measure in a new Python process
+    :return: (number of movies, seconds, peak bytes)
+    """
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_streams", "--measure",
+         measure, file_path, directory],
+        check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main(sizes):
+    print(f"{'movies':>10} {'file MB':>8} {'operation':<18} {'s':>8} "
+          f"{'peak MB':>9}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "movies.json")
+            with open(file_path, "w", encoding="utf-8") as json_file:
+                movie_streams.write_json(json_file, iter_movies(size))
+            file_size = os.path.getsize(file_path)
+            for measure in MEASURES:
+                count, elapsed, peak = measure_in_process(
+                    measure, file_path, directory)
+                assert count == size, (measure, count)
+                print(f"{size:>10} {file_size / 2 ** 20:>8.0f} "
+                      f"{measure:<18} {elapsed:>8.2f} "
+                      f"{peak / 2 ** 20:>9.0f}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--measure"]:
+        count, elapsed = run_measure(*sys.argv[2:5])
+        print(json.dumps([count, elapsed, peak_memory()]))
+    else:
+        main([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,300 @@
+"""
+Benchmark suite of the MovieApp operations on every storage backend.
+
+For every backend and catalogue size, a synthetic catalogue is written
+to a temporary directory, and every operation of OPERATIONS is timed
+twice:
+    cold: opening the storage and running the operation, as a command
+          of main.py does in a new process
+    warm: running the operation again on the same MovieApp, as the
+          interactive menu and the API server do
+Each time is the best of --repeat runs, in milliseconds. add_movie
+gets its movie from a stub instead of OMDb, so that it measures the
+storage and not the network.
+
+The results are printed and, with --output, written as JSON. With
+--baseline, they are compared to the results of an earlier run, and
+the exit status is 1 if any time grew by more than --threshold
+(and by more than --min-ms, to ignore the noise of tiny timings).
+--input compares an existing results file instead of running.
+
+Run from the repository root:
+    python -m benchmarks.bench_suite --sizes 1000 10000 \\
+        --output results.json [--baseline previous.json]
+"""
+from contextlib import redirect_stdout
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from benchmarks.synthetic import iter_movies
+from movie_app import MovieApp
+from storage import movie_streams
+from storage.storage_factory import open_storage, BACKENDS
+from website import WebsiteGenerator
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+# Extension of the catalogue file of every backend
+EXTENSIONS = {"json": ".json", "csv": ".csv", "jsonl": ".jsonl",
+              "journal": ".json", "sqlite": ".sqlite", "binary": ".bin",
+              "sharded": ".shards"}
+NEW_TITLE = "Benchmark Movie"
+PER_PAGE = 100
+# A page of a ranking: PAGE_SIZE movies from PAGE_OFFSET
+PAGE_SIZE = 20
+PAGE_OFFSET = 500
+
+
+class StubOmdb:
+    """
+    Answers like OmdbClient.fetch_movie(), without the network
+    """
+    def fetch_movie(self, title):
+        return {"year": 2000, "rating": 5.0, "poster": "N/A"}
+
+
+class Catalogue:
+    """
+    The catalogue file of one backend, and what the operations need
+    """
+    def __init__(self, backend, file_path, titles, directory):
+        self.backend = backend
+        self.file_path = file_path
+        self.directory = directory
+        # a title in the middle of the catalogue, and a query of it
+        self.title = titles[len(titles) // 2]
+        self.query = self.title.split()[-1]
+        self.storage = None  # the storage of the timed MovieApp
+
+    def open(self):
+        return open_storage(self.file_path, self.backend, interactive=False)
+
+    def change(self, operation, *args):
+        """
+        Runs an untimed change on a storage of its own
+        """
+        storage = self.open()
+        getattr(storage, operation)(*args)
+        close(storage)
+
+
+def close(storage):
+    """
+    Releases the files and workers of the storages that hold some
+    """
+    if hasattr(storage, "close"):
+        storage.close()
+
+
+def add_movie(app, catalogue):
+    app.add_movie(NEW_TITLE)
+
+
+def delete_movie(app, catalogue):
+    app.delete_movie(NEW_TITLE)
+
+
+def update_movie(app, catalogue):
+    app.update_movie(catalogue.title, 7.5)
+
+
+def create_histogram(app, catalogue):
+    app.create_histogram(os.path.join(catalogue.directory, "histogram"))
+
+
+def generate_website(app, catalogue):
+    WebsiteGenerator(catalogue.storage, output_dir=catalogue.directory) \
+        .generate(PER_PAGE, force=True)
+
+
+# operation: (run, setup, cleanup); setup and cleanup are untimed
+# changes that keep the catalogue the same from one run to the next
+OPERATIONS = {
+    "list": (lambda app, catalogue: app.list_movies(), None, None),
+    "add": (add_movie, None, ("delete_movie", NEW_TITLE)),
+    "delete": (delete_movie, ("add_movie", NEW_TITLE, 2000, 5.0, "N/A"),
+               None),
+    "update": (update_movie, None, None),
+    "stats": (lambda app, catalogue: app.movie_stats(), None, None),
+    "search": (lambda app, catalogue: app.search_movie(catalogue.query),
+               None, None),
+    "search_fuzzy": (lambda app, catalogue:
+                     app.search_movie("Nigth Strom"), None, None),
+    "sort_rating": (lambda app, catalogue: app.sort_movies_by_rating(),
+                    None, None),
+    "sort_year": (lambda app, catalogue: app.sort_movies_by_year(),
+                  None, None),
+    "top_rating": (lambda app, catalogue:
+                   app.sort_movies_by_rating(PAGE_SIZE), None, None),
+    "page_year": (lambda app, catalogue:
+                  app.sort_movies_by_year(True, PAGE_SIZE, PAGE_OFFSET),
+                  None, None),
+    "filter": (lambda app, catalogue: app.filter_movies(7.0, 1990, 2000),
+               None, None),
+    "random": (lambda app, catalogue: app.random_movie(), None, None),
+    "histogram": (create_histogram, None, None),
+    "website": (generate_website, None, None),
+}
+
+
+def make_catalogues(size, backends, directory):
+    """
+    Writes the synthetic catalogue of size movies in every backend
+    :return: list of Catalogue
+    """
+    source_path = os.path.join(directory, "source.json")
+    with open(source_path, "w", encoding="utf-8") as json_file:
+        movie_streams.write_json(json_file, iter_movies(size))
+    titles = [title for title, properties in iter_movies(size)]
+    catalogues = []
+    for backend in backends:
+        backend_directory = os.path.join(directory, backend)
+        os.mkdir(backend_directory)
+        file_path = os.path.join(backend_directory,
+                                 "movies" + EXTENSIONS[backend])
+        target = open_storage(file_path, backend, interactive=False,
+                              cache=False)
+        movie_streams.convert(open_storage(source_path, cache=False), target)
+        close(target)
+        catalogues.append(Catalogue(backend, file_path, titles,
+                                    backend_directory))
+    return catalogues
+
+
+def time_operation(catalogue, operation, repeat):
+    """
+    Returns the best cold and warm times of an operation, in ms
+    """
+    run, setup, cleanup = OPERATIONS[operation]
+    cold = warm = None
+    for _ in range(repeat):
+        times = []
+        storage = None
+        for phase in ("cold", "warm"):
+            if setup and storage is None:
+                catalogue.change(*setup)
+            elif setup:  # the storage may not see changes of others
+                getattr(storage, setup[0])(*setup[1:])
+            start = time.perf_counter()
+            if storage is None:
+                storage = catalogue.storage = catalogue.open()
+                app = MovieApp(storage, omdb=StubOmdb())
+            run(app, catalogue)
+            times.append((time.perf_counter() - start) * 1000)
+            if cleanup:
+                getattr(storage, cleanup[0])(*cleanup[1:])
+        close(storage)
+        cold = times[0] if cold is None else min(cold, times[0])
+        warm = times[1] if warm is None else min(warm, times[1])
+    return cold, warm
+
+
+def run_suite(sizes, backends, operations, repeat):
+    """
+    Times every operation on every backend and size
+    :return: list of result dictionaries
+    """
+    results = []
+    print(f"{'backend':<8} {'movies':>8} {'operation':<13} "
+          f"{'cold ms':>10} {'warm ms':>10}", file=sys.stderr)
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            with redirect_stdout(io.StringIO()):
+                catalogues = make_catalogues(size, backends, directory)
+            for catalogue in catalogues:
+                for operation in operations:
+                    # the storages print their messages
+                    with redirect_stdout(io.StringIO()):
+                        cold, warm = time_operation(catalogue, operation,
+                                                    repeat)
+                    results.append({"backend": catalogue.backend,
+                                    "size": size, "operation": operation,
+                                    "cold_ms": cold, "warm_ms": warm})
+                    print(f"{catalogue.backend:<8} {size:>8} "
+                          f"{operation:<13} {cold:>10.2f} {warm:>10.2f}",
+                          file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold, min_ms):
+    """
+    Returns the timings of results that are more than threshold
+    (a fraction) and min_ms slower than in the baseline
+    """
+    old_results = {(result["backend"], result["size"], result["operation"]):
+                   result for result in baseline["results"]}
+    regressions = []
+    for result in results["results"]:
+        old = old_results.get((result["backend"], result["size"],
+                               result["operation"]))
+        if old is None:
+            continue
+        for metric in ("cold_ms", "warm_ms"):
+            if result[metric] > old[metric] * (1 + threshold) and \
+                    result[metric] - old[metric] > min_ms:
+                regressions.append(dict(result, metric=metric,
+                                        baseline_ms=old[metric],
+                                        ratio=result[metric] / old[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark suite of the MovieApp operations")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=DEFAULT_SIZES)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS,
+                        default=BACKENDS)
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS,
+                        default=list(OPERATIONS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results to this file")
+    parser.add_argument("--input", help="compare this results file "
+                                        "instead of running the suite")
+    parser.add_argument("--baseline", help="results file to compare to")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="slow-down that fails, as a fraction "
+                             "(default: 0.25)")
+    parser.add_argument("--min-ms", type=float, default=1.0,
+                        help="ignore slow-downs of less than this")
+    args = parser.parse_args(argv)
+    if args.input:
+        with open(args.input, "r") as input_file:
+            results = json.loads(input_file.read())
+    else:
+        results = {
+            "meta": {
+                "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "repeat": args.repeat
+            },
+            "results": run_suite(args.sizes, args.backends, args.operations,
+                                 args.repeat)
+        }
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(json.dumps(results, indent=4))
+    if not args.baseline:
+        return 0
+    with open(args.baseline, "r") as baseline_file:
+        baseline = json.loads(baseline_file.read())
+    regressions = compare(results, baseline, args.threshold, args.min_ms)
+    for regression in regressions:
+        print(f"REGRESSION {regression['backend']} {regression['size']} "
+              f"{regression['operation']} {regression['metric']}: "
+              f"{regression['baseline_ms']:.2f} -> "
+              f"{regression[regression['metric']]:.2f} ms "
+              f"({regression['ratio']:.2f}x)", file=sys.stderr)
+    print(f"{len(regressions)} regression(s) beyond "
+          f"{args.threshold:.0%}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
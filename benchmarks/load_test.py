@@ -0,0 +1,247 @@
+"""
+Load test of the HTTP/JSON API (api_server.py).
+
+Starts the server in its own process on a synthetic catalogue (or
+targets a running server with --url), opens --connections keep-alive
+connections and sends requests from MIX on all of them for --duration
+seconds. Reports the requests per second and the p50/p99 latencies of
+every endpoint. The /movies requests send the ETag of their previous
+response in If-None-Match, as a polling client does, and get 304s
+until a write changes the catalogue.
+
+Run from the repository root:
+    python -m benchmarks.load_test [--movies 10000] [--connections 16]
+"""
+from urllib.parse import quote, urlsplit
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.synthetic import iter_movies
+from storage import movie_streams
+
+# endpoint: weight of its requests in the load
+MIX = {
+    "list": 10,
+    "lookup": 40,
+    "search": 10,
+    "filter": 10,
+    "stats": 10,
+    "sort": 5,
+    "update": 15,
+}
+
+
+def percentile(ordered, fraction):
+    """
+    Returns a percentile of sorted latencies (nearest rank)
+    """
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Client:
+    """
+    One keep-alive connection to the server
+    """
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        """
+        Sends a request and reads its response
+        :return: (status, headers, body)
+        """
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port)
+        data = b"" if body is None else json.dumps(body).encode("utf-8")
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}",
+                 f"Content-Length: {len(data)}"]
+        lines += [f"{name}: {value}" for name, value
+                  in (headers or {}).items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n")
+                          .encode("latin-1") + data)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        length = int(response_headers.get("content-length", 0))
+        response = await self.reader.readexactly(length)
+        if response_headers.get("connection") == "close":
+            self.close()
+        return status, response_headers, response
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+async def run_connection(client, titles, deadline, results, rand):
+    """
+    Sends requests from MIX until the deadline, recording
+    (endpoint, status, seconds) in results
+    """
+    endpoints = list(MIX)
+    weights = list(MIX.values())
+    etag = None
+    while time.perf_counter() < deadline:
+        endpoint = rand.choices(endpoints, weights)[0]
+        title = quote(rand.choice(titles), safe="")
+        headers = None
+        body = None
+        method = "GET"
+        if endpoint == "list":
+            path = "/movies"
+            headers = {"If-None-Match": etag} if etag else None
+        elif endpoint == "lookup":
+            path = f"/movies/{title}"
+        elif endpoint == "search":
+            path = f"/search?q={quote(rand.choice(titles).split()[0])}"
+        elif endpoint == "filter":
+            path = (f"/filter?min_rating={rand.randint(5, 9)}"
+                    f"&start_year={rand.randint(1920, 2020)}")
+        elif endpoint == "stats":
+            path = "/stats"
+        elif endpoint == "sort":
+            path = "/sort?by=year&order=desc"
+        else:
+            method = "PATCH"
+            path = f"/movies/{title}"
+            body = {"rating": round(rand.uniform(0, 10), 1)}
+        start = time.perf_counter()
+        status, response_headers, response = await client.request(
+            method, path, body, headers)
+        results.append((endpoint, status, time.perf_counter() - start))
+        if endpoint == "list" and status == 200:
+            etag = response_headers.get("etag")
+    client.close()
+
+
+async def load(host, port, titles, connections, duration, seed):
+    """
+    Runs the connections for duration seconds
+    :return: the results of all the requests and the elapsed seconds
+    """
+    results = []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(
+        run_connection(Client(host, port), titles, deadline, results,
+                       random.Random(seed + number))
+        for number in range(connections)))
+    return results, time.perf_counter() - start
+
+
+def report(results, elapsed):
+    """
+    Prints the requests per second and latencies of every endpoint
+    :return: the report as a dictionary
+    """
+    summary = {}
+    for endpoint in list(MIX) + ["all"]:
+        selected = [result for result in results
+                    if endpoint in ("all", result[0])]
+        if not selected:
+            continue
+        latencies = sorted(seconds * 1000 for _, _, seconds in selected)
+        statuses = {}
+        for _, status, _ in selected:
+            statuses[status] = statuses.get(status, 0) + 1
+        summary[endpoint] = {
+            "requests": len(selected),
+            "rps": len(selected) / elapsed,
+            "p50_ms": percentile(latencies, 0.50),
+            "p99_ms": percentile(latencies, 0.99),
+            "statuses": statuses
+        }
+    print(f"{'endpoint':<8} {'requests':>9} {'req/s':>9} {'p50 ms':>8} "
+          f"{'p99 ms':>8}  statuses")
+    for endpoint, row in summary.items():
+        statuses = " ".join(f"{status}:{count}" for status, count
+                            in sorted(row["statuses"].items()))
+        print(f"{endpoint:<8} {row['requests']:>9} {row['rps']:>9.0f} "
+              f"{row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f}  {statuses}")
+    return summary
+
+
+def start_server(movies, directory):
+    """
+    Starts api_server.py on a synthetic catalogue of movies movies
+    :return: (the server process, host, port, the titles)
+    """
+    file_path = os.path.join(directory, "movies.json")
+    with open(file_path, "w", encoding="utf-8") as json_file:
+        movie_streams.write_json(json_file, iter_movies(movies))
+    process = subprocess.Popen(
+        [sys.executable, "api_server.py", "-f", file_path, "--port", "0"],
+        stdout=subprocess.PIPE, text=True)
+    url = urlsplit(process.stdout.readline().split()[-1])
+    titles = [title for title, properties in iter_movies(movies)]
+    return process, url.hostname, url.port, titles
+
+
+async def fetch_titles(host, port):
+    client = Client(host, port)
+    status, headers, body = await client.request("GET", "/movies")
+    client.close()
+    return list(json.loads(body))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--url", help="a running server, e.g. "
+                                      "http://127.0.0.1:8000")
+    parser.add_argument("--movies", type=int, default=10_000,
+                        help="size of the synthetic catalogue")
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--mix", help="weights of the endpoints, e.g. "
+                                      "lookup=80,update=0 (default: MIX)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="also write the report to a file")
+    args = parser.parse_args(argv)
+    for weight in (args.mix.split(",") if args.mix else []):
+        endpoint, _, value = weight.partition("=")
+        if endpoint not in MIX:
+            parser.error(f"unknown endpoint {endpoint}, "
+                         f"choose among {', '.join(MIX)}")
+        MIX[endpoint] = int(value)
+    with tempfile.TemporaryDirectory() as directory:
+        process = None
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port
+            titles = asyncio.run(fetch_titles(host, port))
+        else:
+            process, host, port, titles = start_server(args.movies,
+                                                       directory)
+        try:
+            results, elapsed = asyncio.run(load(
+                host, port, titles, args.connections, args.duration,
+                args.seed))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+    summary = report(results, elapsed)
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json_file.write(json.dumps(summary, indent=4))
+
+
+if __name__ == "__main__":
+    main()
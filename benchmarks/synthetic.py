@@ -0,0 +1,37 @@
+"""
+Synthetic movie catalogues for the benchmarks.
+
+Generates deterministic catalogues with the same shape as
+data/movies.json, of any size.
+"""
+import random
+
+POSTER_PREFIX = "https://m.media-amazon.com/images/M/"
+WORDS = ("The", "Last", "Night", "City", "Love", "Dark", "Return", "Star",
+         "King", "Lost", "River", "Dream", "Fire", "House", "Secret",
+         "Wild", "Ghost", "Blue", "Empire", "Shadow", "Storm", "Road")
+
+
+def iter_movies(count, seed=42):
+    """
+    Yields the (title, properties) pairs of generate_movies() one at
+    a time, to write catalogues larger than the memory
+    """
+    rand = random.Random(seed)
+    for number in range(count):
+        title = f"{' '.join(rand.sample(WORDS, 3))} {number}"
+        yield title, {
+            "year": rand.randint(1920, 2024),
+            "rating": round(rand.uniform(0, 10), 1),
+            "poster": f"{POSTER_PREFIX}MV5B{rand.getrandbits(64):016x}"
+                      f"._V1_SX300.jpg"
+        }
+
+
+def generate_movies(count, seed=42):
+    """
+    Returns a movies dictionary with count movies, in the format
+    returned by IStorage.list_movies(). Titles are unique, years
+    range from 1920 to 2024 and ratings from 0.0 to 10.0
+    """
+    return dict(iter_movies(count, seed))
@@ -1,14 +1,347 @@
 """
 Main entry point for the Movie App.
 
-Initializes the application with the chosen storage (JSON or CSV)
-and runs the menu-driven interface for managing the movie database
+Without a command, runs the menu-driven interface for managing the
+movie database. With a command (main.py list-movies, main.py add-movie
+"Titanic", ...), runs that single operation and prints its result as
+JSON. With --batch, reads operations from stdin, one JSON object per
+line such as {"command": "update_movie", "title": "Titanic",
+"rating": 8}, runs them all against the catalogue loaded once, and
+prints one JSON result per line.
+
+The storage (JSON, CSV, JSON Lines, journal, SQLite, memory-mapped
+binary or sharded) is chosen from the extension of the movies file, or with
+--storage. JSON, CSV and JSON Lines files are wrapped in an in-memory
+write-through cache.
+A catalogue is copied to another format, one movie at a time, with
+    main.py -f data/movies.json convert-movies data/movies.csv
+One-shot import of an existing catalogue into SQLite:
+    StorageSqlite("data/movies.sqlite").import_movies(
+        StorageJson("data/movies.json"))
+With --metrics FILE, the timings of the operations and storage methods,
+the bytes read and written and the full-file loads of the session are
+written to FILE when it ends, as JSON or, for a .prom file, in the
+Prometheus text format; --profile adds a cProfile and tracemalloc
+summary of the hottest functions and allocation sites.
 """
-from movie_app import MovieApp
-# from storage.storage_csv import StorageCsv
-from storage.storage_json import StorageJson
-
-# storage = StorageCsv("data/movies.csv")
-storage = StorageJson("data/movies.json")
-movie_app = MovieApp(storage)
-movie_app.run()
+from movie_app import MovieApp, CommandError
+from storage.storage_factory import open_storage, BACKENDS
+from storage.storage_file import StorageConflictError
+from storage.instrumentation import metrics
+from contextlib import redirect_stdout
+import argparse
+import inspect
+import json
+import sys
+
+MOVIES_FILE = "data/movies.json"
+# The operations of MovieApp, available as commands
+OPERATIONS = (
+    "list_movies",
+    "add_movie",
+    "import_movies",
+    "delete_movie",
+    "update_movie",
+    "movie_stats",
+    "random_movie",
+    "search_movie",
+    "sort_movies_by_rating",
+    "sort_movies_by_year",
+    "create_histogram",
+    "filter_movies",
+    "generate_website",
+    "convert_movies"
+)
+# Type of every argument of the operations, for the arguments of
+# --batch lines, which are not checked by the parser
+ARGUMENT_TYPES = {
+    "title": str,
+    "titles": list,
+    "file": str,
+    "rating": float,
+    "query": str,
+    "threshold": int,
+    "latest_first": bool,
+    "limit": int,
+    "offset": int,
+    "file_name": str,
+    "min_rating": float,
+    "start_year": int,
+    "end_year": int,
+    "per_page": int,
+    "posters": bool,
+    "force": bool,
+    "target_file": str,
+    "backend": str
+}
+TYPE_NAMES = {str: "a string", list: "a list of strings", int: "an integer",
+              float: "a number", bool: "true or false"}
+# Options that are not arguments of the operation
+GLOBAL_OPTIONS = ("movies_file", "storage", "columnar", "batch",
+                  "metrics", "profile", "command")
+
+
+def add_page_arguments(command):
+    """
+    Adds the --limit and --offset options of a ranking command
+    """
+    command.add_argument("--limit", type=int,
+                         help="number of movies (default: all of them)")
+    command.add_argument("--offset", type=int, default=0,
+                         help="number of first movies to skip")
+
+
+def build_parser():
+    """
+    Builds the parser of the command line, with a subcommand
+    for every operation
+    """
+    parser = argparse.ArgumentParser(
+        description="My Movies Database. Runs the interactive menu "
+                    "when no command is given.")
+    parser.add_argument("-f", "--file", dest="movies_file",
+                        default=MOVIES_FILE,
+                        help=f"movies file (default: {MOVIES_FILE})")
+    parser.add_argument("--storage", choices=BACKENDS,
+                        help="storage of the movies file, by default "
+                             "chosen from its extension")
+    parser.add_argument("--columnar", action="store_true",
+                        help="keep the catalogue in compact columns "
+                             "(less memory for large catalogues)")
+    parser.add_argument("--batch", action="store_true",
+                        help="run the operations read from stdin, "
+                             "one JSON object per line")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write the metrics of the session to FILE, "
+                             "as JSON or, for a .prom file, in the "
+                             "Prometheus text format")
+    parser.add_argument("--profile", action="store_true",
+                        help="add a cProfile and tracemalloc summary "
+                             "to the metrics (needs --metrics)")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    commands.add_parser("list-movies", help="list all the movies")
+    command = commands.add_parser("add-movie",
+                                  help="add a movie from the omdb API")
+    command.add_argument("title")
+    command = commands.add_parser(
+        "import-movies", help="add the movies listed in a text file")
+    command.add_argument("file", help="file with one title per line")
+    command = commands.add_parser("delete-movie", help="delete a movie")
+    command.add_argument("title")
+    command = commands.add_parser("update-movie",
+                                  help="update the rating of a movie")
+    command.add_argument("title")
+    command.add_argument("rating", type=float)
+    commands.add_parser("movie-stats", help="statistics of the ratings")
+    commands.add_parser("random-movie", help="pick a random movie")
+    command = commands.add_parser("search-movie",
+                                  help="search the movies by title")
+    command.add_argument("query")
+    command.add_argument("--threshold", type=int, default=60,
+                         help="minimum score of the suggestions")
+    command = commands.add_parser("sort-movies-by-rating",
+                                  help="the movies, best rated first")
+    add_page_arguments(command)
+    command = commands.add_parser("sort-movies-by-year",
+                                  help="the movies, latest first")
+    command.add_argument("--oldest-first", dest="latest_first",
+                         action="store_false")
+    add_page_arguments(command)
+    command = commands.add_parser("create-histogram",
+                                  help="save a histogram of the ratings")
+    command.add_argument("file_name", help="file name, without .png")
+    command = commands.add_parser("filter-movies",
+                                  help="filter by rating and year")
+    command.add_argument("--min-rating", type=float)
+    command.add_argument("--start-year", type=int)
+    command.add_argument("--end-year", type=int)
+    command = commands.add_parser("generate-website",
+                                  help="generate the website")
+    command.add_argument("--per-page", type=int,
+                         help="movies per page (default: a single page)")
+    command.add_argument("--posters", action="store_true",
+                         help="save the posters with the website")
+    command.add_argument("--force", action="store_true",
+                         help="rebuild the pages that did not change")
+    command = commands.add_parser(
+        "convert-movies", help="copy the movies to a file of another format")
+    command.add_argument("target_file", help="the new movies file")
+    command.add_argument("--to", dest="backend", choices=BACKENDS,
+                         help="format of the new file "
+                              "(default: from its extension)")
+    return parser
+
+
+def read_titles(file_name):
+    """
+    Reads a text file with one movie title per line
+    """
+    try:
+        with open(file_name, "r", encoding="utf-8") as titles_file:
+            return [line.strip() for line in titles_file]
+    except IOError as e:
+        raise CommandError(str(e))
+
+
+def convert_argument(name, value):
+    """
+    Converts an argument to the type of ARGUMENT_TYPES, accepting
+    numbers written as strings ("8" for a rating)
+    :raise CommandError: if the value has another type
+    """
+    expected = ARGUMENT_TYPES.get(name)
+    if value is None or expected is None:
+        return value
+    if expected in (int, float) and not isinstance(value, bool):
+        if isinstance(value, str):
+            try:
+                value = expected(value.strip())
+            except ValueError:
+                pass
+        elif isinstance(value, float) and expected is int and \
+                value.is_integer():
+            value = int(value)
+        elif isinstance(value, int) and expected is float:
+            value = float(value)
+    if expected is list and isinstance(value, list) and \
+            all(isinstance(item, str) for item in value):
+        return value
+    if type(value) is not expected:
+        raise CommandError(f"{name} must be {TYPE_NAMES[expected]}")
+    return value
+
+
+def run_operation(movie_app, command, arguments):
+    """
+    Runs one operation of the movie app
+    :param command: name of the operation, with "_" or "-"
+    :param arguments: dictionary of the arguments of the operation
+        (import_movies also takes a "file" of titles)
+    :return: the result of the operation
+    """
+    if not isinstance(command, str):
+        raise CommandError(f"The command must be a string, not {command!r}")
+    name = command.replace("-", "_")
+    if name not in OPERATIONS:
+        raise CommandError(f"Unknown command '{command}'")
+    arguments = {key: convert_argument(key, value)
+                 for key, value in arguments.items()}
+    if name == "import_movies" and "file" in arguments:
+        arguments["titles"] = read_titles(arguments.pop("file"))
+    operation = getattr(movie_app, name)
+    try:
+        inspect.signature(operation).bind(**arguments)
+    except TypeError as e:
+        raise CommandError(f"{command}: {e}")
+    return operation(**arguments)
+
+
+def run_command(movie_app, command, arguments):
+    """
+    Runs an operation, catching its errors
+    :return: dictionary with the command, "ok", and the "result"
+        of the operation or the "error" that stopped it
+    """
+    try:
+        return {"command": command, "ok": True,
+                "result": run_operation(movie_app, command, arguments)}
+    except (CommandError, StorageConflictError) as e:
+        return {"command": command, "ok": False, "error": str(e)}
+
+
+def write_result(output, result):
+    """
+    Writes a result to output as one JSON line
+    """
+    output.write(json.dumps(result) + "\n")
+    output.flush()
+
+
+def run_batch(movie_app, storage, lines, output):
+    """
+    Runs the operations given as JSON lines in a single transaction,
+    writing one JSON result line per operation to output. The results
+    are written once the transaction is saved: if saving fails, none
+    of the operations is kept, and every result reports the error.
+    :return: True if all the operations succeeded
+    """
+    results = []
+    try:
+        with storage.transaction():
+            for number, line in enumerate(lines, 1):
+                if line.strip() == '':
+                    continue
+                try:
+                    arguments = json.loads(line)
+                    command = arguments.pop("command")
+                except (ValueError, KeyError, AttributeError, TypeError):
+                    result = {"line": number, "ok": False,
+                              "error": "expected a JSON object with "
+                                       "a command"}
+                else:
+                    result = run_command(movie_app, command, arguments)
+                results.append(result)
+    except (StorageConflictError, OSError) as e:
+        results = [{"command": result.get("command"), "ok": False,
+                    "error": f"not saved: {e}"} if result["ok"] else result
+                   for result in results]
+        results.append({"ok": False, "error": str(e)})
+    for result in results:
+        write_result(output, result)
+    return all(result["ok"] for result in results)
+
+
+def main(argv=None):
+    """
+    Runs the interactive menu, a single command or a batch
+    :return: the exit status, 0 if all the operations succeeded
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.profile and not args.metrics:
+        parser.error("--profile needs --metrics")
+    if not args.metrics:
+        return run(args)
+    metrics.enable(profile=args.profile)
+    try:
+        return run(args)
+    finally:
+        # also when the interactive menu exits
+        metrics.disable()
+        metrics.write(args.metrics)
+
+
+def run(args):
+    """
+    Runs the interactive menu, a single command or a batch
+    as selected by the parsed command line
+    :return: the exit status
+    """
+    interactive = args.command is None and not args.batch
+    try:
+        storage = open_storage(args.movies_file, args.storage, interactive,
+                               columnar=args.columnar)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    movie_app = MovieApp(storage)
+    if interactive:
+        movie_app.run()
+        return 0
+    output = sys.stdout
+    # The messages printed by the app and the storage go to stderr,
+    # so that stdout only holds the JSON results
+    with redirect_stdout(sys.stderr):
+        if args.batch:
+            return 0 if run_batch(movie_app, storage, sys.stdin,
+                                  output) else 1
+        arguments = {key: value for key, value in vars(args).items()
+                     if key not in GLOBAL_OPTIONS}
+        result = run_command(movie_app, args.command, arguments)
+    write_result(output, result)
+    return 0 if result["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
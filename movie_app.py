@@ -1,10 +1,6 @@
-import statistics
-import random
-import matplotlib.pyplot as plt
-from thefuzz import process
-import requests
-from dotenv import load_dotenv
-import os
+from storage.storage_file import StorageConflictError
+from storage.instrumentation import instrumented
+from website import WebsiteGenerator
 
 # We define colors as global variables
 MAGENTA = '\033[95m'
@@ -13,12 +9,301 @@ GREEN = '\033[92m'
 YELLOW = '\033[93m'
 RED = '\033[91m'
 ENDC = '\033[0m'
+# Movies printed at a time by the ranking commands of the menu
+PAGE_SIZE = 20
 
-load_dotenv()
+class CommandError(Exception):
+    """
+    Raised by the operations of MovieApp when they cannot be
+    carried out, the message explains why
+    """
+    pass
 
 class MovieApp:
-    def __init__(self, storage):
+    """
+    The operations (list_movies(), add_movie(), ...) never prompt or
+    print: they take their arguments, return their result as plain
+    data, and raise CommandError when they fail, so scripts can call
+    them. The _command_* methods are the interactive menu around them.
+    """
+    def __init__(self, storage, omdb=None):
+        """
+        :param omdb: OmdbClient used to fetch the movies, by default
+            one with a cache in data/omdb_cache.sqlite, created when
+            a movie is first fetched
+        """
         self._storage = storage
+        self._omdb = omdb
+
+    def _omdb_client(self):
+        """
+        Returns the OmdbClient, creating the default one on first use
+        """
+        if self._omdb is None:
+            # The API client and its dependencies are only
+            # loaded by the commands that fetch movies
+            from dotenv import load_dotenv
+            from omdb_client import OmdbClient
+            from omdb_cache import OmdbCache
+            load_dotenv()
+            self._omdb = OmdbClient(
+                cache=OmdbCache("data/omdb_cache.sqlite"))
+        return self._omdb
+
+    def _require_movies(self):
+        """
+        Raises CommandError if there are no movies in the database
+        """
+        if self._storage.count() == 0:
+            raise CommandError("No movies in database")
+
+    def _require_movie(self, title):
+        """
+        Raises CommandError if the movie is not in the database
+        """
+        if self._storage.get_movie(title) is None:
+            raise CommandError(f"Movie '{title}' doesn't exist!")
+
+    @instrumented
+    def list_movies(self):
+        """
+        Returns all the movies, as a dictionary of title: properties
+        """
+        return dict(self._storage.list_movies())
+
+    def fetch_movie(self, title):
+        """
+        Gets the properties of a movie from the omdb API,
+        without touching the storage
+        :raise CommandError: if the request failed or the movie
+            was not found
+        """
+        import requests
+        try:
+            properties = self._omdb_client().fetch_movie(title)
+        except requests.exceptions.RequestException as e:
+            raise CommandError(str(e))
+        except ValueError:
+            raise CommandError("Error: omdb returned invalid data")
+        if properties is None:
+            raise CommandError("Error: Movie not found!")
+        return properties
+
+    @instrumented
+    def add_movie(self, title):
+        """
+        Adds a movie, getting its properties from the omdb API
+        :return: the properties of the movie
+        """
+        if self._storage.get_movie(title) is not None:
+            raise CommandError(f"Movie {title} already exist!")
+        properties = self.fetch_movie(title)
+        self._change("add_movie", title, properties["year"],
+                     properties["rating"], properties["poster"])
+        return properties
+
+    def _change(self, method, *args):
+        """
+        Runs a method of the storage that changes the movies
+        :raise CommandError: if the storage cannot hold the movies
+            (e.g. a title too long) or the change could not be saved
+        """
+        try:
+            getattr(self._storage, method)(*args)
+        except ValueError as e:
+            raise CommandError(str(e))
+        except IOError as e:
+            raise CommandError(f"Changes not saved. {e}.")
+
+    def _new_titles(self, titles):
+        """
+        Returns the titles that are not empty and not in the database
+        """
+        existing = self._storage.list_movies()
+        return [title for title in titles
+                if title != '' and title not in existing]
+
+    @instrumented
+    def import_movies(self, titles):
+        """
+        Adds many movies, fetching their properties from the omdb API
+        concurrently, and saves all the found movies with a single write
+        :param titles: iterable of titles, the empty ones and the movies
+            already in the database are skipped
+        :return: dictionary with the imported movies under "movies"
+            and the titles that could not be imported under "errors"
+        """
+        titles = self._new_titles(titles)
+        if not titles:
+            return {"movies": {}, "errors": {}}
+        movies, errors = self._omdb_client().fetch_movies(titles)
+        if movies:
+            self._change("add_movies", movies)
+        return {"movies": movies, "errors": errors}
+
+    @instrumented
+    def delete_movie(self, title):
+        """
+        Deletes a movie
+        """
+        self._require_movie(title)
+        self._change("delete_movie", title)
+
+    @instrumented
+    def update_movie(self, title, rating):
+        """
+        Updates the rating of a movie
+        :param rating: number from 0 to 10
+        """
+        self._require_movie(title)
+        if not 0 <= rating <= 10:
+            raise CommandError("The rating must be a number from 0 to 10")
+        self._change("update_movie", title, rating)
+
+    @instrumented
+    def movie_stats(self):
+        """
+        Returns statistics about the ratings of the movies (count,
+        mean, median, min, max, best and worst movie), and the number
+        of movies and average rating of every decade under "decades"
+        """
+        stats = self._storage.aggregate_ratings()
+        if stats is None:
+            raise CommandError("No movies in database")
+        return dict(stats, decades=self._storage.average_by_decade())
+
+    @instrumented
+    def random_movie(self):
+        """
+        Returns a random movie, as its properties along with its title
+        """
+        movie = self._storage.random_movie()
+        if movie is None:
+            raise CommandError("No movies in database")
+        title, properties = movie
+        return {"title": title, **properties}
+
+    @instrumented
+    def search_movie(self, query, threshold=60):
+        """
+        Searches the movies whose title contains the query
+        (case-insensitive); if none does, suggests similar titles
+        :return: dictionary with the matching movies under "movies" and
+            the suggested titles under "suggestions"
+        """
+        self._require_movies()
+        movies = dict(self._storage.search(query))
+        suggestions = []
+        if not movies:
+            suggestions = [title for title, score
+                           in self._storage.suggest(query, threshold)]
+        return {"movies": movies, "suggestions": suggestions}
+
+    def _check_page(self, limit, offset):
+        """
+        Raises CommandError if the limit or the offset of a ranking
+        is negative
+        """
+        if (limit is not None and limit < 0) or offset < 0:
+            raise CommandError("The limit and offset must not be negative")
+
+    @instrumented
+    def sort_movies_by_rating(self, limit=None, offset=0):
+        """
+        Returns the movies as (title, properties) pairs,
+        in descending order by the rating
+        :param limit: number of movies returned, all of them if None
+        :param offset: number of best rated movies skipped
+        """
+        self._require_movies()
+        self._check_page(limit, offset)
+        return self._storage.top_n("rating", limit, True, offset)
+
+    @instrumented
+    def sort_movies_by_year(self, latest_first=True, limit=None, offset=0):
+        """
+        Returns the movies as (title, properties) pairs, ordered by year
+        :param limit: number of movies returned, all of them if None
+        :param offset: number of first movies skipped
+        """
+        self._require_movies()
+        self._check_page(limit, offset)
+        return self._storage.top_n("year", limit, latest_first, offset)
+
+    @instrumented
+    def create_histogram(self, file_name):
+        """
+        Saves a histogram of the ratings of the movies to
+        file_name + ".png", using the matplotlib library
+        :return: the name of the saved file
+        """
+        self._require_movies()
+        import matplotlib.pyplot as plt  # slow to import, loaded on use
+        counts, edges = self._storage.rating_histogram()
+        # draws the bins computed by the storage, as plt.hist(ratings)
+        plt.hist(edges[:-1], bins=edges, weights=counts)
+        plt.title("Movies Ratings")
+        plt.xlabel("Rate")
+        plt.ylabel("Movies")
+        try:
+            plt.savefig(file_name + '.png')
+        except IOError as e:
+            raise CommandError(str(e))
+        finally:
+            plt.close()
+        return file_name + '.png'
+
+    @instrumented
+    def filter_movies(self, min_rating=None, start_year=None,
+                      end_year=None):
+        """
+        Returns the movies with at least min_rating, released from
+        start_year to end_year (None for no limit)
+        """
+        self._require_movies()
+        return dict(self._storage.filter(min_rating, start_year, end_year))
+
+    @instrumented
+    def generate_website(self, per_page=None, posters=False, force=False):
+        """
+        Generates the website, see WebsiteGenerator.generate()
+        :param per_page: movies per page, None for a single page
+        :param posters: saves the posters with the website
+        :return: the report of the generation
+        """
+        if isinstance(per_page, int) and per_page < 1:
+            raise CommandError("The movies per page must be at least 1")
+        mirror = None
+        if posters:
+            from poster_mirror import PosterMirror
+            mirror = PosterMirror()
+        try:
+            return WebsiteGenerator(self._storage, posters=mirror) \
+                .generate(per_page, force)
+        except IOError as e:
+            raise CommandError(f'WARNING! Website not Generated. {e}.')
+
+    @instrumented
+    def convert_movies(self, target_file, backend=None):
+        """
+        Copies the catalogue into a new file of another format (JSON,
+        CSV, JSON Lines, SQLite...), streaming it one movie at a time
+        :param backend: storage of the target, by default chosen
+            from its extension
+        :return: dictionary with the target "file" and the number of
+            "movies" copied
+        """
+        from storage.storage_factory import open_storage
+        from storage.movie_streams import convert
+        try:
+            target = open_storage(target_file, backend, interactive=False,
+                                  cache=False)
+            return {"file": target_file,
+                    "movies": convert(self._storage, target)}
+        except ValueError as e:
+            raise CommandError(f"{target_file}: {e}")
+        except IOError as e:
+            raise CommandError(f"Movies not converted. {e}.")
 
     def _command_list_movies(self):
         """
@@ -34,35 +319,36 @@ class MovieApp:
         Adds the movie that the user inputs and gets it's properties
         from the omdb API
         """
-        movies = self._storage.list_movies()
         while True:
             title = input(GREEN + 'Enter new movie name: ')
             if title != '':
                 break
-        if title in movies:
-            print(f"{MAGENTA}Movie {title} already exist!{ENDC}")
-            return
+        self.add_movie(title)
+        print(f'{MAGENTA}Movie "{title}" successfully added{ENDC}')
 
-        URL = 'http://www.omdbapi.com/?'
-        APIKEY = os.getenv('apikey')
-        param = {'apikey':APIKEY, 't':title}
+    def _command_import_movies(self):
+        """
+        Adds all the movies listed in a text file (one title per line).
+        Their properties are fetched from the omdb API concurrently,
+        and all the found movies are saved with a single write
+        """
+        file_name = input(GREEN + 'Enter file with movie titles: ' + ENDC)
         try:
-            movie_res = requests.get(URL, params=param)
-        except requests.exceptions.RequestException as e:
+            with open(file_name, "r", encoding="utf-8") as titles_file:
+                titles = [line.strip() for line in titles_file]
+        except IOError as e:
             print(e)
             return
-        movie_data = movie_res.json()
-        if movie_data == {"Response":"False","Error":"Movie not found!"}:
-            print("Error: Movie not found!")
-        else:
-            try:
-                self._storage.add_movie(title,
-                            int(movie_data.get("Year")),
-                            float(movie_data.get("imdbRating")),
-                            movie_data.get("Poster", "N/A"))
-                print(f'{MAGENTA}Movie "{title}" successfully added{ENDC}')
-            except ValueError:
-                print("Error: omdb returned invalid data")
+        titles = self._new_titles(titles)
+        if not titles:
+            print(f"{MAGENTA}No new movies to import{ENDC}")
+            return
+        print(f"Fetching {len(titles)} movies from omdb...")
+        result = self.import_movies(titles)
+        for title, error in result["errors"].items():
+            print(f'{RED}Movie "{title}" not imported: {error}{ENDC}')
+        print(f'{MAGENTA}{len(result["movies"])} movies '
+              f'successfully imported{ENDC}')
 
     def _command_delete_movie(self):
         """
@@ -72,58 +358,46 @@ class MovieApp:
             title = input(GREEN + 'Enter movie name to delete: ' + ENDC)
             if title != '':
                 break
-        self._storage.delete_movie(title)
+        self.delete_movie(title)
 
     def _command_update_movie(self):
         """
         If the movie that the user entered exists,
         it updates the movie’s rating
         """
-        movies = self._storage.list_movies()
         while True:
             title = input(GREEN + 'Enter movie name: ' + ENDC)
             if title != '':
                 break
-        if movies.get(title, 0) == 0:  # checks if movie exists
-            print(f"{RED}Movie {title} doesn't exist!{ENDC}")
-        else:
-            rating = self.float_validation(
-                input(GREEN + "Enter new movie rating (0-10): " + ENDC))
-            self._storage.update_movie(title, rating)
-            print(f'{MAGENTA}Movie "{title}" successfully '
-                  f'updated with a new rating of: {rating} !{ENDC}')
+        self._require_movie(title)
+        rating = self.float_validation(
+            input(GREEN + "Enter new movie rating (0-10): " + ENDC))
+        self.update_movie(title, rating)
+        print(f'{MAGENTA}Movie "{title}" successfully '
+              f'updated with a new rating of: {rating} !{ENDC}')
 
     def _command_movie_stats(self):
         """
         Prints statistics about the movies in the database,
-        (Average, Median, Best, Worst), using the statistics library
-        """
-        movies = self._storage.list_movies()
-        if movies == {}:
-            print(RED + "No movies in database" + ENDC)
-            return
-        rate = []
-        for properties in movies.values():
-            rate.append(properties["rating"])
-        print(f'Average rating: {statistics.mean(rate):.1f}')
-        print(f'Median rating: {statistics.median(rate):.1f}')
-        sorted_movies = sorted(movies.items(),
-                               key=lambda movie_rate: movie_rate[1]["rating"])
-        print(f'Best movie: {sorted_movies[-1][0]}, {max(rate)}')
-        print(f'Worst movie: {sorted_movies[0][0]}, {min(rate)}')
+        (Average, Median, Best, Worst), as aggregated by the storage
+        """
+        stats = self.movie_stats()
+        print(f'Average rating: {stats["mean"]:.1f}')
+        print(f'Median rating: {stats["median"]:.1f}')
+        print(f'Best movie: {stats["best"]}, {stats["max"]}')
+        print(f'Worst movie: {stats["worst"]}, {stats["min"]}')
+        print('Average rating per decade:')
+        for decade, (count, average) in stats["decades"].items():
+            print(f'  {decade}s: {average:.1f} ({count} movies)')
 
     def _command_random_movie(self):
         """
         Prints a random movie and it’s rating, using the random library
         """
-        movies = self._storage.list_movies()
-        if movies == {}:
-            print(RED + "No movies in database" + ENDC)
-            return
-        rand_movie = random.choice(list(movies.keys()))
+        movie = self.random_movie()
         print(
-            f"Your movie for tonight: {GREEN}{rand_movie}{ENDC}, "
-            f"it's rated {GREEN}{movies[rand_movie]['rating']}{ENDC}")
+            f"Your movie for tonight: {GREEN}{movie['title']}{ENDC}, "
+            f"it's rated {GREEN}{movie['rating']}{ENDC}")
 
     def _command_search_movie(self):
         """
@@ -132,56 +406,59 @@ class MovieApp:
         If no movie is found, it uses fuzzy logic to suggest
         similar movies, using the thefuzz library
         """
-        movies = self._storage.list_movies()
-        if movies == {}:
-            print(RED + "No movies in database" + ENDC)
-            return
+        self._require_movies()
         name = input(GREEN + "Enter part of movie name: " + ENDC)
-        count = 0
-        for title in list(movies.keys()):
-            if name.lower() in title.lower(): # search must be case-insensitive
-                print(f'{title}, {movies[title]["rating"]}')
-                count += 1
-        if count == 0:
-            fuzzy_movies = process.extract(name, list(movies.keys()))
-            closest_fuzzy_movies = [result for result in fuzzy_movies if
-                                    result[
-                                        1] >= 60] # Define the fuzzy matching
-            if not closest_fuzzy_movies:  # threshold as 60%
+        # Define the fuzzy matching threshold as 60%
+        result = self.search_movie(name, 60)
+        for title, properties in result["movies"].items():
+            print(f'{title}, {properties["rating"]}')
+        if not result["movies"]:
+            if not result["suggestions"]:
                 print(f'{RED}The movie {name} does not exist.{ENDC}')
             else:
                 print(
                     f'{RED}The movie {name} does not exist.{ENDC} '
                     f'Did you mean:')
-                for fuzzy_movie in closest_fuzzy_movies:
-                    print(fuzzy_movie[0])
+                for fuzzy_movie in result["suggestions"]:
+                    print(fuzzy_movie)
+
+    def _print_pages(self, ranking):
+        """
+        Prints the movies of a ranking PAGE_SIZE at a time, asking
+        before every next page, so only the pages the user looks at
+        are selected from the catalogue
+        :param ranking: function of (limit, offset) returning
+            (title, properties) pairs
+        """
+        offset = 0
+        while True:
+            # one more movie tells whether there is a next page
+            page = ranking(PAGE_SIZE + 1, offset)
+            for sorted_movie in page[:PAGE_SIZE]:
+                print(
+                    f'{sorted_movie[0]} ({sorted_movie[1]["year"]}): '
+                    f'{sorted_movie[1]["rating"]}')
+            if len(page) <= PAGE_SIZE:
+                return
+            offset += PAGE_SIZE
+            choice = input(GREEN + "Press Enter for more movies, "
+                                   "Q to stop " + ENDC)
+            if choice in ("Q", "q"):
+                return
 
     def _command_sort_movies_by_rating(self):
         """
-        Prints all the movies and their ratings,
-        in descending order by the rating
+        Prints the movies and their ratings, in descending
+        order by the rating, a page at a time
         """
-        movies = self._storage.list_movies()
-        if movies == {}:
-            print(RED + "No movies in database" + ENDC)
-            return
-        sorted_movies = sorted(movies.items(),
-                               key=lambda movie_rate: movie_rate[1]["rating"],
-                               reverse=True)
-        for sorted_movie in sorted_movies:
-            print(
-                f'{sorted_movie[0]} ({sorted_movie[1]["year"]}): '
-                f'{sorted_movie[1]["rating"]}')
+        self._print_pages(self.sort_movies_by_rating)
 
     def _command_sort_movies_by_year(self):
         """
-        Prints all the movies and their ratings,
-        in descending order by the rating
+        Prints the movies and their ratings, ordered
+        by year, a page at a time
         """
-        movies = self._storage.list_movies()
-        if movies == {}:
-            print(RED + "No movies in database" + ENDC)
-            return
+        self._require_movies()
         while True:
             choice = input(
                 GREEN + "Do you want the latest movies first?  (Y/N) " + ENDC)
@@ -193,51 +470,28 @@ class MovieApp:
                 break
             else:
                 print('Please enter "Y" or "N"')
-        sorted_movies = sorted(movies.items(),
-                               key=lambda movie_rate: movie_rate[1]["year"],
-                               reverse=rev)
-        for sorted_movie in sorted_movies:
-            print(
-                f'{sorted_movie[0]} ({sorted_movie[1]["year"]}): '
-                f'{sorted_movie[1]["rating"]}')
+        self._print_pages(lambda limit, offset:
+                          self.sort_movies_by_year(rev, limit, offset))
 
     def _command_create_histogram(self):
         """
         Creates a histogram of the ratings of the movies,
         using the matplotlib library
         """
-        movies = self._storage.list_movies()
-        if movies == {}:
-            print(RED + "No movies in database" + ENDC)
-            return
-        rate = []
-        for properties in movies.values():
-            rate.append(properties["rating"])
-        plt.hist(rate)
-        plt.title("Movies Ratings")
-        plt.xlabel("Rate")
-        plt.ylabel("Movies")
+        self._require_movies()
         save_file = input(
             GREEN + "Histogram created successfully."
                     "\nPlease enter a file name to save it: " + ENDC)
-        try:
-            plt.savefig(save_file + '.png')
-        except IOError as e:
-            print(e)
-        else:
-            print(GREEN + "Histogram saved successfully." + ENDC)
+        self.create_histogram(save_file)
+        print(GREEN + "Histogram saved successfully." + ENDC)
       #  plt.show()  we can add this line, if we want to display the histogram
-        plt.close()
 
     def _command_filter_movies(self):
         """
         Filters the list of movies based on minimum rating,
         start year and end year
         """
-        movies = self._storage.list_movies()
-        if movies == {}:
-            print(RED + "No movies in database" + ENDC)
-            return
+        self._require_movies()
         min_rate = input(
             "Enter minimum rating (leave blank for no minimum rating): ")
         if min_rate != '':
@@ -248,15 +502,9 @@ class MovieApp:
         end = input("Enter end year (leave blank for no end year): ")
         if end != '':
             end = self.int_enter_validation(end)
-        if min_rate != '':
-            movies = {key: value for key, value in movies.items() if
-                      value["rating"] >= min_rate}
-        if start != '':
-            movies = {key: value for key, value in movies.items() if
-                      value["year"] >= start}
-        if end != '':
-            movies = {key: value for key, value in movies.items() if
-                      value["year"] <= end}
+        movies = self.filter_movies(None if min_rate == '' else min_rate,
+                                    None if start == '' else start,
+                                    None if end == '' else end)
         if len(movies) > 0:
             print("Filtered Movies:")
             for movie, properties in movies.items():
@@ -346,69 +594,28 @@ class MovieApp:
          #       if num < 0: num = ''
                 return num
 
-    def serialize_movie(self, movie, properties):
-        '''
-        Serializes a movie object and outputs it as HTML
-        :param movie: Dictionary of the movie
-        :param properties: Dictionary with the movie properties
-        :return: the movie object as HTML
-        '''
-        output = ''
-        try:
-            output += (f'        <li>\n'
-                       f'            <div class="movie">\n'
-                       f'                <img class="movie-poster" '
-                       f'src={properties["poster"]} title=""/>\n'
-                       f'                <div class ="movie-title">{movie}'
-                       f'</div>\n'
-                       f'                <div class ="movie-year">'
-                       f'{properties["year"]}</div>\n'
-                       f'            </div>\n'
-                       f'        </li>\n'
-                       )
-        except (KeyError, IndexError):
-            pass
-        return output
-
-    def read_data(self):
-        '''
-        Iterates through the objects of movies list, adding them
-            to the HTML using the serialize_movie() function
-        :return: all movies properties as HTML
-        '''
-        movies = self._storage.list_movies()
-        output = '\n'
-        for movie, properties in movies.items():
-            output += self.serialize_movie(movie, properties)
-        return output
-
-    def read_html(self):
-        '''
-        Reads the HTML template file
-        :return: the HTML template as string
-        '''
-        try:
-            with open("_static\index_template.html", "r") as html_template:
-                return html_template.read()
-        except IOError as e:
-            print(f'WARNING! Website not Generated. {e}.')
-
     def _command_generate_website(self):
         '''
-        Generates the website according to the template,
-        and creates a file called index.html that has the full website
+        Generates the website according to the template, either
+        as a single index.html or split into pages of movies
         '''
-        if  self.read_html() is not None:
-            new_html = self.read_html().replace("__TEMPLATE_MOVIE_GRID__",
-                                       self.read_data())
-        else:
-            return
-        try:
-            with open("_static\index.html", "w") as new_html_file:
-                new_html_file.write(new_html)
-            print("Website was generated successfully.")
-        except IOError as e:
-            print(f'WARNING! Website not Generated. {e}.')
+        per_page = self.int_enter_validation(input(
+            GREEN + "Enter movies per page "
+                    "(leave blank for a single page): " + ENDC))
+        if per_page == '':
+            per_page = None
+        posters = input(GREEN + "Save the posters with the website? "
+                                "(Y/N, default N): " + ENDC)
+        report = self.generate_website(per_page, posters in ("Y", "y"))
+        if report["posters"] is not None:
+            print(f"Posters: {report['posters']['downloaded']} downloaded, "
+                  f"{report['posters']['skipped']} already saved, "
+                  f"{report['posters']['failed']} failed.")
+        print(f"Website was generated successfully: "
+              f"{report['rebuilt']} pages rebuilt, "
+              f"{report['skipped']} unchanged "
+              f"({report['added']} movies added, {report['updated']} "
+              f"updated, {report['deleted']} deleted).")
 
     def _command_bye_bye(self):
         '''
@@ -438,7 +645,8 @@ class MovieApp:
             9: self._command_sort_movies_by_year,
             10: self._command_create_histogram,
             11: self._command_filter_movies,
-            12: self._command_generate_website
+            12: self._command_generate_website,
+            13: self._command_import_movies
         }
         while True:
             choice = input(
@@ -455,12 +663,18 @@ class MovieApp:
                        "9. Movies sorted by year\n"
                        "10. Create Rating Histogram\n"
                        "11. Filter Movies\n"
-                       "12. Generate Website\n\n"
-                       "Enter choice (0-12): " + ENDC)
+                       "12. Generate Website\n"
+                       "13. Import movies from file\n\n"
+                       "Enter choice (0-13): " + ENDC)
             choice = self.int_validation(choice)
             print("")
-            if choice not in range(13):
+            if choice not in range(14):
                 print(RED + "Invalid choice\n" + ENDC)
             else:
-                choices[choice]()
+                try:
+                    choices[choice]()
+                except StorageConflictError as e:
+                    print(f"{RED}{e}, please try again.{ENDC}")
+                except CommandError as e:
+                    print(f"{RED}{e}{ENDC}")
                 input(BLUE + "\nPress enter to continue" + ENDC)
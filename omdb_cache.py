@@ -0,0 +1,138 @@
+"""
+Persistent cache of OMDb responses.
+
+Responses are stored in a SQLite file keyed by the normalised title,
+so that looking up the same movie again (re-adding a deleted movie,
+running the same import twice) never goes to the network.
+"""
+import threading
+import sqlite3
+import json
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    movie TEXT,
+    expires REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_used
+    ON responses (last_used);
+"""
+
+DAY = 24 * 60 * 60
+
+
+def normalise_title(title):
+    """
+    Returns the cache key of a title: case-folded,
+    with runs of whitespace collapsed
+    """
+    return " ".join(title.casefold().split())
+
+
+class OmdbCache:
+    def __init__(self, file_path, ttl=30 * DAY, negative_ttl=DAY,
+                 max_entries=10000):
+        """
+        :param file_path: SQLite file holding the cache
+        :param ttl: seconds a found movie is kept
+        :param negative_ttl: seconds a "Movie not found!" answer is kept
+        :param max_entries: entries kept before the least
+            recently used ones are evicted
+        """
+        self.file_path = file_path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(file_path,
+                                           check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._hit_seconds = 0.0
+        self._miss_seconds = 0.0
+
+    def get(self, title):
+        """
+        Looks a title up in the cache
+        :return: (True, properties) on a hit, properties being None
+            for a cached "Movie not found!", or (False, None) on a miss
+        """
+        start = time.perf_counter()
+        key = normalise_title(title)
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT movie, expires FROM responses WHERE key = ?",
+                (key,)).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._connection.execute(
+                        "DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return False, None
+            self._connection.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?",
+                (now, key))
+            self.hits += 1
+            if row[0] is None:
+                self.negative_hits += 1
+            self._hit_seconds += time.perf_counter() - start
+        return True, None if row[0] is None else json.loads(row[0])
+
+    def put(self, title, properties, fetch_seconds=0.0):
+        """
+        Stores the answer of OMDb for a title, properties being None
+        when the movie was not found, and evicts the least recently
+        used entries beyond max_entries
+        :param fetch_seconds: time the network lookup took
+        """
+        now = time.time()
+        if properties is None:
+            movie, expires = None, now + self.negative_ttl
+        else:
+            movie, expires = json.dumps(properties), now + self.ttl
+        with self._lock, self._connection:
+            self._miss_seconds += fetch_seconds
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, movie, expires, last_used) VALUES (?, ?, ?, ?)",
+                (normalise_title(title), movie, expires, now))
+            excess = self._connection.execute(
+                "SELECT COUNT(*) FROM responses").fetchone()[0] \
+                - self.max_entries
+            if excess > 0:
+                self._connection.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM "
+                    "responses ORDER BY last_used LIMIT ?)", (excess,))
+                self.evictions += excess
+
+    def clear(self):
+        """
+        Removes every entry from the cache
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
+
+    def stats(self):
+        """
+        Returns the hit/miss counters and the average
+        latency of hits and of network lookups, in milliseconds
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "avg_hit_ms": (self._hit_seconds * 1000 / self.hits
+                           if self.hits else 0.0),
+            "avg_miss_ms": (self._miss_seconds * 1000 / self.misses
+                            if self.misses else 0.0)
+        }
@@ -0,0 +1,162 @@
+"""
+Client for the OMDb API (http://www.omdbapi.com/).
+
+Uses a pooled requests session with timeouts, retries failed requests
+with exponential backoff (honouring Retry-After on HTTP 429), limits
+the request rate, and can fetch many titles concurrently. Responses
+can be kept in a persistent OmdbCache.
+"""
+from storage.instrumentation import metrics, instrumented
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import os
+import requests
+from requests.adapters import HTTPAdapter
+
+OMDB_URL = 'http://www.omdbapi.com/'
+NOT_FOUND = "Movie not found!"
+
+
+class OmdbClient:
+    def __init__(self, api_key=None, base_url=None, timeout=10, retries=3,
+                 backoff=0.5, max_rate=10, max_workers=8, cache=None):
+        """
+        :param api_key: OMDb API key, defaults to the "apikey" variable
+        :param base_url: API URL, defaults to the "omdb_url" variable
+            or to the public OMDb API
+        :param timeout: seconds to wait for a response
+        :param retries: how many times a failed request is retried
+        :param backoff: delay in seconds before the first retry,
+            doubled for every next retry
+        :param max_rate: maximum requests per second, None for no limit
+        :param max_workers: parallel requests of fetch_movies()
+        :param cache: OmdbCache consulted before every request
+        """
+        self.api_key = api_key or os.getenv('apikey')
+        self.base_url = base_url or os.getenv('omdb_url', OMDB_URL)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_rate = max_rate
+        self.max_workers = max_workers
+        self.cache = cache
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._rate_lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def _wait_for_slot(self):
+        """
+        Sleeps until the rate limit allows the next request
+        """
+        if not self.max_rate:
+            return
+        with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + 1 / self.max_rate
+        if wait > 0:
+            time.sleep(wait)
+
+    def _get(self, params):
+        """
+        Sends a GET request to the API and returns the decoded JSON.
+        Connection errors, timeouts, HTTP 429 and 5xx responses are
+        retried; the last error is raised when all retries failed.
+        """
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * 2 ** attempt
+            self._wait_for_slot()
+            metrics.add("omdb_requests")
+            try:
+                with metrics.timer("OmdbClient.request"):
+                    response = self._session.get(self.base_url,
+                                                 params=params,
+                                                 timeout=self.timeout)
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout) as e:
+                error = e
+            else:
+                if response.status_code != 429 and response.status_code < 500:
+                    response.raise_for_status()
+                    return response.json()
+                error = requests.exceptions.HTTPError(
+                    f"{response.status_code} Error from {self.base_url}",
+                    response=response)
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+            if attempt < self.retries:
+                time.sleep(delay)
+        raise error
+
+    @instrumented
+    def fetch_movie(self, title):
+        """
+        Fetches the properties of a movie from the cache, or from
+        OMDb on a cache miss
+        :param title: title of the movie
+        :return: dictionary with year, rating and poster,
+            or None if OMDb does not know the movie
+        :raise requests.exceptions.RequestException: if OMDb
+            could not be reached
+        :raise ValueError: if OMDb returned invalid data
+        """
+        if self.cache is None:
+            return self._fetch_movie(title)
+        hit, properties = self.cache.get(title)
+        metrics.add("omdb_cache_hits" if hit else "omdb_cache_misses")
+        if not hit:
+            start = time.perf_counter()
+            properties = self._fetch_movie(title)
+            self.cache.put(title, properties, time.perf_counter() - start)
+        return properties
+
+    def _fetch_movie(self, title):
+        """
+        Fetches the properties of a movie from OMDb, see fetch_movie()
+        """
+        movie_data = self._get({'apikey': self.api_key, 't': title})
+        if movie_data.get("Response") == "False":
+            if movie_data.get("Error") == NOT_FOUND:
+                return None
+            raise ValueError(movie_data.get("Error"))
+        try:
+            return {
+                "year": int(movie_data.get("Year")),
+                "rating": float(movie_data.get("imdbRating")),
+                "poster": movie_data.get("Poster", "N/A")
+            }
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid data for {title}")
+
+    def fetch_movies(self, titles):
+        """
+        Fetches many movies concurrently, with at most
+        max_workers requests in flight
+        :param titles: iterable of movie titles
+        :return: (movies, errors) where movies maps the found titles to
+            their properties, in the order of titles, and errors maps
+            the other titles to an error message
+        """
+        titles = list(dict.fromkeys(titles))
+        movies = {}
+        errors = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.fetch_movie, title)
+                       for title in titles]
+            for title, future in zip(titles, futures):
+                try:
+                    properties = future.result()
+                except (requests.exceptions.RequestException,
+                        ValueError) as e:
+                    errors[title] = str(e)
+                else:
+                    if properties is None:
+                        errors[title] = NOT_FOUND
+                    else:
+                        movies[title] = properties
+        return movies, errors
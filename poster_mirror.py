@@ -0,0 +1,200 @@
+"""
+Local mirror of the movie posters for the generated website.
+
+Posters are downloaded concurrently and kept in a content-addressed
+store (the file name is the SHA-256 of the image), so a poster shared
+by several URLs is stored once and a URL that was already mirrored is
+never downloaded again. When Pillow is installed, a resized thumbnail
+is made of every poster and the website uses it instead of the full
+image; without Pillow the full images are used.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from storage.file_utils import atomic_write
+import mimetypes
+import hashlib
+import json
+import time
+import os
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from PIL import Image
+except ImportError:  # thumbnails are optional
+    Image = None
+
+OUTPUT_DIR = "_static"
+STORE_DIR = "posters"
+THUMBNAIL_DIR = "thumbs"
+INDEX_NAME = "index.json"
+THUMBNAIL_SIZE = (200, 300)
+DEFAULT_EXTENSION = ".jpg"
+
+
+class PosterMirror:
+    def __init__(self, output_dir=OUTPUT_DIR, store_dir=STORE_DIR,
+                 thumbnail_size=THUMBNAIL_SIZE, max_workers=8, timeout=10,
+                 retries=2, backoff=0.5):
+        """
+        :param output_dir: directory of the website
+        :param store_dir: directory of the posters, inside output_dir
+        :param thumbnail_size: largest (width, height) of the thumbnails,
+            None for no thumbnails
+        :param max_workers: parallel downloads
+        :param timeout: seconds to wait for a response
+        :param retries: how many times a failed download is retried
+        :param backoff: delay in seconds before the first retry,
+            doubled for every next retry
+        """
+        self.output_dir = output_dir
+        self.store_dir = store_dir
+        self.thumbnail_size = thumbnail_size if Image is not None else None
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._index = self._read_index()
+
+    def _path(self, *parts):
+        """
+        Returns the path of a file of the store
+        """
+        return os.path.join(self.output_dir, self.store_dir, *parts)
+
+    def _read_index(self):
+        """
+        Reads the index of the store, which maps
+        every mirrored URL to the name of its file
+        """
+        try:
+            with open(self._path(INDEX_NAME), "r") as index_file:
+                return json.load(index_file)
+        except (IOError, ValueError):
+            return {}
+
+    def _write_index(self):
+        """
+        Saves the index of the store
+        """
+        with atomic_write(self._path(INDEX_NAME)) as index_file:
+            json.dump(self._index, index_file)
+
+    @staticmethod
+    def is_remote(url):
+        """
+        Checks if a poster is a URL that can be downloaded
+        ("N/A" or an empty poster is not)
+        """
+        return isinstance(url, str) and \
+            url.startswith(("http://", "https://"))
+
+    def local_src(self, url):
+        """
+        Returns the src of the local copy of a poster, relative to
+        the website, preferring the thumbnail, or None if the poster
+        was not mirrored
+        """
+        name = self._index.get(url)
+        if name is None:
+            return None
+        if self.thumbnail_size and \
+                os.path.exists(self._path(THUMBNAIL_DIR, name)):
+            return f"{self.store_dir}/{THUMBNAIL_DIR}/{name}"
+        return f"{self.store_dir}/{name}"
+
+    def _get(self, url):
+        """
+        Downloads a poster, retrying failed requests
+        :return: (content, content type)
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                response = self._session.get(url, timeout=self.timeout)
+                response.raise_for_status()
+                return response.content, response.headers.get(
+                    "Content-Type", "")
+            except requests.exceptions.RequestException:
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def _download(self, url):
+        """
+        Downloads a poster into the store, unless a poster with
+        the same content is already there
+        :return: the name of the file
+        """
+        content, content_type = self._get(url)
+        extension = mimetypes.guess_extension(
+            content_type.split(";")[0].strip()) or \
+            os.path.splitext(url.split("?")[0])[1] or DEFAULT_EXTENSION
+        name = hashlib.sha256(content).hexdigest() + extension
+        if not os.path.exists(self._path(name)):
+            with atomic_write(self._path(name), mode="wb") as poster_file:
+                poster_file.write(content)
+        return name
+
+    def _make_thumbnail(self, name):
+        """
+        Makes the thumbnail of a stored poster if it does not exist yet
+        :return: True if a thumbnail was made
+        """
+        path = self._path(THUMBNAIL_DIR, name)
+        if not self.thumbnail_size or os.path.exists(path):
+            return False
+        with Image.open(self._path(name)) as image:
+            image_format = image.format
+            image.thumbnail(self.thumbnail_size)
+            with atomic_write(path, mode="wb") as thumbnail_file:
+                image.save(thumbnail_file, format=image_format)
+        return True
+
+    def _mirror_one(self, url):
+        """
+        Mirrors one poster, downloading it only if it is not stored yet
+        :return: (name of the file, True if it was downloaded,
+            True if a thumbnail was made)
+        """
+        name = self._index.get(url)
+        downloaded = name is None or not os.path.exists(self._path(name))
+        if downloaded:
+            name = self._download(url)
+        try:
+            thumbnail = self._make_thumbnail(name)
+        except (IOError, ValueError):  # not an image Pillow can read
+            thumbnail = False
+        return name, downloaded, thumbnail
+
+    def mirror(self, urls):
+        """
+        Mirrors the posters concurrently, with at most max_workers
+        downloads in flight
+        :param urls: iterable of poster URLs, the ones that are
+            not remote are ignored
+        :return: report with the number of posters downloaded,
+            skipped (already stored) and failed, and of thumbnails made
+        """
+        urls = [url for url in dict.fromkeys(urls) if self.is_remote(url)]
+        report = {"downloaded": 0, "skipped": 0, "failed": 0,
+                  "thumbnails": 0}
+        if not urls:
+            return report
+        os.makedirs(self._path(THUMBNAIL_DIR), exist_ok=True)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._mirror_one, url)
+                       for url in urls]
+            for url, future in zip(urls, futures):
+                try:
+                    name, downloaded, thumbnail = future.result()
+                except (requests.exceptions.RequestException, IOError):
+                    report["failed"] += 1
+                    continue
+                self._index[url] = name
+                report["downloaded" if downloaded else "skipped"] += 1
+                report["thumbnails"] += thumbnail
+        self._write_index()
+        return report
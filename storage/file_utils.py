@@ -0,0 +1,105 @@
+"""
+Helpers for safe file storage: atomic writes, advisory locks
+and file versions used for optimistic concurrency checks.
+"""
+from contextlib import contextmanager
+import tempfile
+import shutil
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locking
+    fcntl = None
+
+_UMASK = None  # see _umask()
+
+
+@contextmanager
+def atomic_write(file_path, newline=None, mode="w"):
+    """
+    Opens a temporary file next to file_path for writing (mode "wb" for
+    binary data). When the block ends the data is flushed and fsynced,
+    and the temporary file is renamed over file_path, so readers and
+    crashes only ever see the old or the new file, never a truncated
+    one. If the block raises, the temporary file is removed and
+    file_path is left untouched.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    descriptor, temp_path = tempfile.mkstemp(
+        dir=directory, prefix=os.path.basename(file_path) + ".",
+        suffix=".tmp")
+    try:
+        if os.path.exists(file_path):
+            shutil.copymode(file_path, temp_path)
+        else:  # mkstemp() creates the file readable by its owner only
+            os.chmod(temp_path, 0o666 & ~_umask())
+        with os.fdopen(descriptor, mode, newline=newline) as temp_file:
+            yield temp_file
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    _fsync_directory(directory)
+
+
+def _umask():
+    """
+    Returns the umask of the process. Reading it means setting it,
+    so it is read once, when the first new file is written, rather
+    than changed for the other threads on every write.
+    """
+    global _UMASK
+    if _UMASK is None:
+        _UMASK = os.umask(0o022)
+        os.umask(_UMASK)
+    return _UMASK
+
+
+def _fsync_directory(directory):
+    """
+    Makes the rename durable, on the systems that allow
+    opening a directory
+    """
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    descriptor = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+@contextmanager
+def file_lock(file_path):
+    """
+    Holds an exclusive advisory lock (fcntl.flock) on file_path + ".lock"
+    for the duration of the block. Only writers take the lock, readers
+    rely on atomic_write() instead. Where fcntl is not available the
+    block runs unlocked and only the version checks apply.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(file_path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def file_version(file_path):
+    """
+    Returns the version of a file as (inode, mtime, size), or None if
+    it does not exist. atomic_write() replaces the file with a new inode,
+    so every save changes the version.
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,252 @@
+"""
+Instrumentation of the hot paths: the time of every MovieApp operation
+and storage method, the bytes read and written, the full-file loads
+and the OMDb requests of a session, exported as JSON or in the
+Prometheus text format.
+
+The instrumentation is off by default, and a disabled hook costs a
+single attribute check. metrics.enable() starts a session (main.py
+--metrics FILE); with profile=True it also runs cProfile and
+tracemalloc, and the summary gets the slowest functions and the
+largest allocation sites.
+"""
+from storage.file_utils import atomic_write
+from contextlib import contextmanager
+import functools
+import datetime
+import threading
+import json
+import time
+import os
+
+# Number of functions and allocation sites in the profile summary
+PROFILE_TOP = 20
+# Prefix of the Prometheus metric names
+PROMETHEUS_PREFIX = "movies_"
+
+
+class Metrics:
+    """
+    Timings and counters of one session. Timings are kept per name
+    as [calls, total seconds, max seconds]; counters are plain sums.
+    Updates hold a lock, so the threads of the API server and of the
+    sharded storage can record at the same time.
+    """
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._profiler = None
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the timings and counters recorded so far
+        """
+        self.operations = {}
+        self.counters = {}
+        self.profile = None
+        self.started = time.time()
+
+    def enable(self, profile=False):
+        """
+        Starts a new session
+        :param profile: also run cProfile and tracemalloc
+        """
+        self.reset()
+        self.enabled = True
+        if profile:
+            import cProfile
+            import tracemalloc
+            tracemalloc.start()
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def disable(self):
+        """
+        Ends the session, stopping the profilers. The timings,
+        counters and profile are kept until the next enable().
+        """
+        self.enabled = False
+        if self._profiler is not None:
+            self._profiler.disable()
+            self.profile = self._profile_summary()
+
+    def _profile_summary(self):
+        """
+        Summarizes the profiles: the functions with the largest
+        cumulative time and the sites that allocated the most memory
+        """
+        import pstats
+        import tracemalloc
+        stats = pstats.Stats(self._profiler).stats
+        slowest = sorted(stats.items(), key=lambda item: item[1][3],
+                         reverse=True)[:PROFILE_TOP]
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self._profiler = None
+        return {
+            "functions": [{"function": f"{file}:{line}({name})",
+                           "calls": calls,
+                           "own_seconds": own_seconds,
+                           "cumulative_seconds": cumulative_seconds}
+                          for (file, line, name),
+                          (primitive_calls, calls, own_seconds,
+                           cumulative_seconds, callers) in slowest],
+            "memory": {
+                "current_bytes": current,
+                "peak_bytes": peak,
+                "allocations": [{"site": str(statistic.traceback),
+                                 "bytes": statistic.size,
+                                 "blocks": statistic.count}
+                                for statistic in snapshot.statistics(
+                                    "lineno")[:PROFILE_TOP]]
+            }
+        }
+
+    def record(self, name, seconds):
+        """
+        Records one call of name that took seconds
+        """
+        with self._lock:
+            timing = self.operations.get(name)
+            if timing is None:
+                self.operations[name] = [1, seconds, seconds]
+            else:
+                timing[0] += 1
+                timing[1] += seconds
+                timing[2] = max(timing[2], seconds)
+
+    def add(self, counter, amount=1):
+        """
+        Adds amount to a counter
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def add_file_size(self, counter, file_path):
+        """
+        Adds the size of a file to a bytes counter
+        """
+        if not self.enabled:
+            return
+        try:
+            self.add(counter, os.path.getsize(file_path))
+        except OSError:
+            pass
+
+    @contextmanager
+    def timer(self, name):
+        """
+        Records the time of the block under name
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def summary(self):
+        """
+        Returns the session as a dictionary
+        """
+        with self._lock:
+            operations = {name: {"calls": calls,
+                                 "total_seconds": total,
+                                 "mean_seconds": total / calls,
+                                 "max_seconds": longest}
+                          for name, (calls, total, longest)
+                          in sorted(self.operations.items())}
+            counters = dict(sorted(self.counters.items()))
+        summary = {
+            "started": datetime.datetime.fromtimestamp(self.started)
+                .isoformat(timespec="seconds"),
+            "seconds": time.time() - self.started,
+            "operations": operations,
+            "counters": counters
+        }
+        if self.profile is not None:
+            summary["profile"] = self.profile
+        return summary
+
+    def to_prometheus(self):
+        """
+        Returns the session in the Prometheus text exposition format
+        """
+        summary = self.summary()
+        lines = []
+
+        def metric(name, kind, description, samples):
+            name = PROMETHEUS_PREFIX + name
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value}")
+
+        def label(operation):
+            operation = operation.replace("\\", "\\\\") \
+                .replace('"', '\\"').replace("\n", "\\n")
+            return f'{{operation="{operation}"}}'
+
+        operations = summary["operations"].items()
+        metric("operation_calls_total", "counter",
+               "Calls of the operation.",
+               [(label(name), timing["calls"])
+                for name, timing in operations])
+        metric("operation_seconds_total", "counter",
+               "Total time spent in the operation.",
+               [(label(name), repr(timing["total_seconds"]))
+                for name, timing in operations])
+        metric("operation_seconds_max", "gauge",
+               "Longest call of the operation.",
+               [(label(name), repr(timing["max_seconds"]))
+                for name, timing in operations])
+        for counter, value in summary["counters"].items():
+            metric(counter + "_total", "counter",
+                   counter.replace("_", " ").capitalize() + ".",
+                   [("", value)])
+        if self.profile is not None:
+            metric("memory_peak_bytes", "gauge",
+                   "Peak memory traced by tracemalloc.",
+                   [("", self.profile["memory"]["peak_bytes"])])
+        return "\n".join(lines) + "\n"
+
+    def write(self, file_path):
+        """
+        Writes the session to a file, in the Prometheus text format
+        if its extension is .prom, otherwise as JSON
+        """
+        if os.path.splitext(file_path)[1].lower() == ".prom":
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.summary(), indent=4)
+        with atomic_write(file_path) as metrics_file:
+            metrics_file.write(content)
+
+
+# The metrics of the process
+metrics = Metrics()
+
+
+def instrumented(method):
+    """
+    Decorator recording the time of every call of a method under
+    "<class>.<method>", the class being that of the object called,
+    so that the subclasses of a storage are told apart
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not metrics.enabled:
+            return method(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            metrics.record(f"{type(self).__name__}.{method.__name__}",
+                           time.perf_counter() - start)
+    return wrapper
@@ -1,6 +1,21 @@
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from storage import rating_stats
+import random
+import heapq
 
 class IStorage(ABC):
+    """
+    Interface of the movie storages.
+    Besides the abstract methods, it provides query methods (count,
+    get_movie, random_movie, filter, top_n, aggregate_ratings,
+    rating_histogram, average_by_decade, search, suggest) with default
+    implementations on top of list_movies(). Storages that can answer
+    those queries faster (e.g. in SQL) override them, and MovieApp always
+    goes through them. The same goes for the bulk changes (add_movies,
+    delete_movies, update_movies), for transaction() and for
+    iter_movies().
+    """
     @abstractmethod
     def list_movies(self):
         """
@@ -30,3 +45,159 @@ class IStorage(ABC):
         Updates the rating of the movie with the given title
         """
         pass
+
+    def add_movies(self, movies):
+        """
+        Adds many movies at once. movies is a dictionary in the format
+        returned by list_movies(). Storages that rewrite a whole file on
+        every change override it to write the file only once.
+        """
+        for title, properties in movies.items():
+            self.add_movie(title, properties["year"], properties["rating"],
+                           properties["poster"])
+
+    def delete_movies(self, titles):
+        """
+        Deletes many movies at once
+        """
+        for title in titles:
+            self.delete_movie(title)
+
+    def update_movies(self, ratings):
+        """
+        Updates the ratings of many movies at once,
+        given as a dictionary of title: rating
+        """
+        for title, rating in ratings.items():
+            self.update_movie(title, rating)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Context manager grouping the changes made inside it, so that
+        they are saved together when it ends. By default every change
+        is saved as soon as it is made.
+        """
+        yield self
+
+    def iter_movies(self):
+        """
+        Yields the (title, properties) pairs of the movies in catalogue
+        order. Storages that can read one movie at a time override it,
+        so that a catalogue can be processed in constant memory.
+        """
+        yield from self.list_movies().items()
+
+    def count(self):
+        """
+        Returns the number of movies in the storage
+        """
+        return len(self.list_movies())
+
+    def get_movie(self, title):
+        """
+        Returns the properties of the movie with the given title,
+        or None if it is not in the storage
+        """
+        return self.list_movies().get(title)
+
+    def random_movie(self):
+        """
+        Returns the (title, properties) pair of a movie picked at
+        random, or None if the storage is empty
+        """
+        movies = self.list_movies()
+        if not movies:
+            return None
+        title = random.choice(list(movies))
+        return title, movies[title]
+
+    def filter(self, min_rating=None, start_year=None, end_year=None):
+        """
+        Returns the movies with a rating of at least min_rating,
+        released between start_year and end_year.
+        Criteria left as None are not applied.
+        """
+        return {title: properties
+                for title, properties in self.list_movies().items()
+                if (min_rating is None or properties["rating"] >= min_rating)
+                and (start_year is None or properties["year"] >= start_year)
+                and (end_year is None or properties["year"] <= end_year)}
+
+    def top_n(self, key, n=None, reverse=False, offset=0):
+        """
+        Returns n (title, properties) pairs ordered by key ("title",
+        "year" or "rating") from position offset, or all of them from
+        offset if n is None. Movies with the same key keep their
+        insertion order. A page is selected with a heap of offset + n
+        movies instead of sorting the catalogue.
+        """
+        if key == "title":
+            sort_key = lambda movie: movie[0]
+        else:
+            sort_key = lambda movie: movie[1][key]
+        movies = self.iter_movies()
+        if n is None:
+            return sorted(movies, key=sort_key, reverse=reverse)[offset:]
+        select = heapq.nlargest if reverse else heapq.nsmallest
+        return select(offset + n, movies, key=sort_key)[offset:]
+
+    def rating_columns(self):
+        """
+        Returns the (titles, ratings, years) columns of the storage,
+        as sequences in catalogue order, for the rating statistics
+        """
+        titles = []
+        ratings = []
+        years = []
+        for title, properties in self.list_movies().items():
+            titles.append(title)
+            ratings.append(properties["rating"])
+            years.append(properties["year"])
+        return titles, ratings, years
+
+    def aggregate_ratings(self):
+        """
+        Returns the rating statistics of the storage (count, mean,
+        median, min, max, the best and worst movie and the quartiles
+        under "percentiles"), or None if the storage is empty.
+        On ties, the best movie is the last one added
+        and the worst movie the first one.
+        """
+        titles, ratings, years = self.rating_columns()
+        return rating_stats.summarise(titles, ratings)
+
+    def rating_histogram(self, bins=rating_stats.HISTOGRAM_BINS):
+        """
+        Returns the histogram of the ratings as (counts, edges),
+        see rating_stats.histogram()
+        """
+        titles, ratings, years = self.rating_columns()
+        return rating_stats.histogram(ratings, bins)
+
+    def average_by_decade(self):
+        """
+        Returns the number of movies and their average rating
+        per decade, as a dictionary of decade: (count, average)
+        """
+        titles, ratings, years = self.rating_columns()
+        return rating_stats.group_means(years, ratings, 10)
+
+    def search(self, query):
+        """
+        Returns the movies whose title contains query
+        (case-insensitive), in catalogue order
+        """
+        query = query.lower()
+        return {title: properties
+                for title, properties in self.list_movies().items()
+                if query in title.lower()}
+
+    def suggest(self, query, threshold=60):
+        """
+        Returns the (title, score) pairs of the titles that fuzzy match
+        query with a score of at least threshold, best match first
+        """
+        from thefuzz import process  # loaded only when suggesting
+        fuzzy_movies = process.extract(query, list(self.list_movies()))
+        return [result for result in fuzzy_movies if result[1] >= threshold]
@@ -0,0 +1,187 @@
+from collections.abc import MutableMapping
+from array import array
+
+# Decimal digits kept when reading back a rating stored as a 32-bit float
+RATING_DIGITS = 5
+# Largest year that fits in an unsigned 16-bit column
+MAX_YEAR = 65535
+# Deleted slots tolerated before the columns are compacted
+COMPACT_MIN_DELETED = 1024
+# Length recorded for a poster that is None
+NO_POSTER = 0xFFFFFFFF
+
+
+def split_poster(poster):
+    """
+    Splits a poster URL into its directory prefix, shared by many
+    posters, and its file name
+    """
+    if not isinstance(poster, str):
+        return "", poster
+    cut = poster.rfind("/") + 1
+    return poster[:cut], poster[cut:]
+
+
+class MovieCatalogue(MutableMapping):
+    """
+    Compact, columnar movies catalogue. Instead of one dictionary per
+    movie, the titles are kept in one list, the years and ratings in
+    array('H') and array('f') columns, and the posters as the index of
+    their (deduplicated) URL prefix plus their file name, the names
+    being packed in one UTF-8 buffer.
+
+    It reads like the dictionary of dictionaries returned by
+    IStorage.list_movies(): movies[title] builds the properties
+    dictionary of the movie on access, with the rating read back
+    rounded to RATING_DIGITS decimals. Changing that dictionary does
+    not change the catalogue, assign it back with movies[title] = ...
+    Iteration follows the insertion order, like a dict. Deleted movies
+    leave an empty slot until the columns are compacted.
+    """
+    def __init__(self, movies=None):
+        self._titles = []
+        self._positions = {}  # title -> position in the columns
+        self._years = array('H')
+        self._ratings = array('f')
+        self._prefix_ids = array('I')
+        self._name_starts = array('Q')
+        self._name_lengths = array('I')
+        self._names = bytearray()
+        self._prefixes = []
+        self._prefix_positions = {}  # prefix -> its index in _prefixes
+        self._deleted = 0
+        if movies:
+            for title, properties in movies.items():
+                self[title] = properties
+
+    def _prefix_id(self, prefix):
+        """
+        Returns the index of a poster prefix, adding it if it is new
+        """
+        prefix_id = self._prefix_positions.get(prefix)
+        if prefix_id is None:
+            prefix_id = len(self._prefixes)
+            self._prefixes.append(prefix)
+            self._prefix_positions[prefix] = prefix_id
+        return prefix_id
+
+    def __getitem__(self, title):
+        position = self._positions[title]
+        return {
+            "year": self._years[position],
+            "rating": round(self._ratings[position], RATING_DIGITS),
+            "poster": self.poster(position)
+        }
+
+    def poster(self, position):
+        """
+        Returns the poster URL of the movie at a position
+        """
+        name = self._name(position)
+        if name is None:
+            return None
+        return self._prefixes[self._prefix_ids[position]] + name
+
+    def _name(self, position):
+        """
+        Returns the poster file name of the movie at a position
+        """
+        length = self._name_lengths[position]
+        if length == NO_POSTER:
+            return None
+        start = self._name_starts[position]
+        return self._names[start:start + length].decode("utf-8")
+
+    def _pack_name(self, name):
+        """
+        Appends a poster file name to the buffer
+        :return: (start, length) of the name in the buffer
+        """
+        if name is None:
+            return 0, NO_POSTER
+        start = len(self._names)
+        self._names += name.encode("utf-8")
+        return start, len(self._names) - start
+
+    def __setitem__(self, title, properties):
+        year = int(properties["year"])
+        if not 0 <= year <= MAX_YEAR:
+            raise ValueError(f"year {year} of {title} out of range")
+        rating = float(properties["rating"])
+        prefix, name = split_poster(properties["poster"])
+        prefix_id = self._prefix_id(prefix)
+        position = self._positions.get(title)
+        if position is not None and self._name(position) == name:
+            # keep the packed name, e.g. when only the rating changed
+            start = self._name_starts[position]
+            length = self._name_lengths[position]
+        else:
+            start, length = self._pack_name(name)
+        if position is None:
+            self._positions[title] = len(self._titles)
+            self._titles.append(title)
+            self._years.append(year)
+            self._ratings.append(rating)
+            self._prefix_ids.append(prefix_id)
+            self._name_starts.append(start)
+            self._name_lengths.append(length)
+        else:  # a replaced name stays in the buffer until compact()
+            self._years[position] = year
+            self._ratings[position] = rating
+            self._prefix_ids[position] = prefix_id
+            self._name_starts[position] = start
+            self._name_lengths[position] = length
+
+    def __delitem__(self, title):
+        position = self._positions.pop(title)
+        self._titles[position] = None
+        self._deleted += 1
+        if self._deleted >= COMPACT_MIN_DELETED and \
+                self._deleted * 2 > len(self._titles):
+            self.compact()
+
+    def __iter__(self):
+        for title in self._titles:
+            if title is not None:
+                yield title
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, title):
+        return title in self._positions
+
+    def columns(self):
+        """
+        Returns the (titles, ratings, years) columns in catalogue
+        order, compacting them first if movies were deleted. They are
+        the catalogue's own list and arrays: read them, do not change
+        them. The ratings are 32-bit floats, see RATING_DIGITS.
+        """
+        if self._deleted:
+            self.compact()
+        return self._titles, self._ratings, self._years
+
+    def compact(self):
+        """
+        Removes the slots left by deleted movies from the columns,
+        and the names of their posters from the buffer
+        """
+        keep = [position for position, title in enumerate(self._titles)
+                if title is not None]
+        names = [self._name(position) for position in keep]
+        self._names = bytearray()
+        packed = [self._pack_name(name) for name in names]
+        self._name_starts = array('Q', (start for start, length in packed))
+        self._name_lengths = array('I', (length for start, length
+                                         in packed))
+        self._titles = [self._titles[position] for position in keep]
+        self._years = array('H', (self._years[position]
+                                  for position in keep))
+        self._ratings = array('f', (self._ratings[position]
+                                    for position in keep))
+        self._prefix_ids = array('I', (self._prefix_ids[position]
+                                       for position in keep))
+        self._positions = {title: position
+                           for position, title in enumerate(self._titles)}
+        self._deleted = 0
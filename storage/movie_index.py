@@ -0,0 +1,292 @@
+from bisect import bisect_left, insort
+from collections import Counter
+from storage import rating_stats
+import math
+
+class RunningSum:
+    """
+    Running sum with Neumaier compensation, so that adding and
+    removing values for a long time does not accumulate rounding errors
+    """
+    def __init__(self):
+        self._total = 0.0
+        self._compensation = 0.0
+
+    def add(self, value):
+        """
+        Adds a value, or removes it when it is negated
+        """
+        total = self._total + value
+        if abs(self._total) >= abs(value):
+            self._compensation += (self._total - total) + value
+        else:
+            self._compensation += (value - total) + self._total
+        self._total = total
+
+    def value(self):
+        """
+        Returns the sum
+        """
+        return self._total + self._compensation
+
+class SortedIndex:
+    """
+    Sorted array of (value, seq, title) entries maintained with bisect.
+    seq is the insertion order of the movie in the catalogue, so movies
+    with the same value keep the order they have in the catalogue.
+    """
+    def __init__(self, entries=()):
+        self._entries = sorted(entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, value, seq, title):
+        """
+        Inserts an entry, O(log N) search plus the list insertion
+        """
+        insort(self._entries, (value, seq, title))
+
+    def remove(self, value, seq):
+        """
+        Removes the entry of the movie with the given value and seq
+        """
+        del self._entries[bisect_left(self._entries, (value, seq))]
+
+    def first(self):
+        """
+        Returns the entry with the lowest value
+        (the first one in catalogue order on ties)
+        """
+        return self._entries[0]
+
+    def last(self):
+        """
+        Returns the entry with the highest value
+        (the last one in catalogue order on ties)
+        """
+        return self._entries[-1]
+
+    def percentile(self, percentile):
+        """
+        Returns a percentile of the values, interpolated linearly
+        like numpy.percentile(), in O(1)
+        """
+        position = (len(self._entries) - 1) * percentile / 100
+        low = math.floor(position)
+        high = min(low + 1, len(self._entries) - 1)
+        low_value = self._entries[low][0]
+        return low_value + (self._entries[high][0] - low_value) * \
+            (position - low)
+
+    def bounds(self, low=None, high=None):
+        """
+        Returns the (start, end) positions of the entries
+        with low <= value <= high, in O(log N)
+        """
+        start = 0 if low is None else bisect_left(self._entries, (low,))
+        end = (len(self._entries) if high is None
+               else bisect_left(self._entries, (high, math.inf)))
+        return start, max(start, end)
+
+    def range(self, low=None, high=None):
+        """
+        Yields the (value, seq, title) entries with
+        low <= value <= high, in O(log N + k)
+        """
+        start, end = self.bounds(low, high)
+        for position in range(start, end):
+            yield self._entries[position]
+
+    def ascending(self, skip=0):
+        """
+        Yields the titles in ascending order of value,
+        starting after the first skip of them
+        """
+        for position in range(skip, len(self._entries)):
+            yield self._entries[position][2]
+
+    def descending(self, skip=0):
+        """
+        Yields the titles in descending order of value. Movies with the
+        same value are still yielded in catalogue order, as sorted(...,
+        reverse=True) would do, by walking the array one value at a time.
+        The first skip titles are skipped a whole value at a time,
+        without walking their entries.
+        """
+        entries = self._entries
+        end = len(entries)
+        while end > 0:
+            start = bisect_left(entries, (entries[end - 1][0],), 0, end)
+            if skip >= end - start:
+                skip -= end - start
+            else:
+                for position in range(start + skip, end):
+                    yield entries[position][2]
+                skip = 0
+            end = start
+
+class MovieIndex:
+    """
+    Secondary indexes of a movies catalogue, keyed by rating and by year.
+    They are built once from the catalogue and then updated
+    incrementally as movies are added, deleted and updated.
+    Running aggregates of the ratings are kept along with them (their
+    sum, the number of movies of every rating, and the count and sum
+    per decade), so the rating statistics never scan the catalogue:
+    the median and the best and worst movie are read from the ends
+    and the middle of the rating index.
+    """
+    def __init__(self, movies=None):
+        self._movies = {}  # title -> (seq, year, rating)
+        self._next_seq = 0
+        self._rating_sum = RunningSum()
+        self._rating_counts = Counter()  # rating -> number of movies
+        self._decades = {}  # decade -> [number of movies, RunningSum]
+        ratings = []
+        years = []
+        for title, properties in (movies or {}).items():
+            seq = self._next_seq
+            self._next_seq += 1
+            self._movies[title] = (seq, properties["year"],
+                                   properties["rating"])
+            self._aggregate(properties["year"], properties["rating"], 1)
+            ratings.append((properties["rating"], seq, title))
+            years.append((properties["year"], seq, title))
+        self._indexes = {
+            "rating": SortedIndex(ratings),
+            "year": SortedIndex(years)
+        }
+
+    def __len__(self):
+        return len(self._movies)
+
+    def _aggregate(self, year, rating, sign):
+        """
+        Adds a movie to the running aggregates (sign 1),
+        or removes it from them (sign -1)
+        """
+        self._rating_sum.add(sign * rating)
+        self._rating_counts[rating] += sign
+        if self._rating_counts[rating] == 0:
+            del self._rating_counts[rating]
+        decade = self._decades.setdefault(year // 10 * 10,
+                                          [0, RunningSum()])
+        decade[0] += sign
+        decade[1].add(sign * rating)
+        if decade[0] == 0:
+            del self._decades[year // 10 * 10]
+
+    def supports(self, key):
+        """
+        Returns True if the movies are indexed by key
+        """
+        return key in self._indexes
+
+    def add(self, title, year, rating):
+        """
+        Indexes a new movie. Re-adding an existing title replaces its
+        entries but keeps its catalogue position, like a dict does.
+        """
+        if title in self._movies:
+            seq = self._movies[title][0]
+            self.remove(title)
+        else:
+            seq = self._next_seq
+            self._next_seq += 1
+        self._movies[title] = (seq, year, rating)
+        self._indexes["rating"].add(rating, seq, title)
+        self._indexes["year"].add(year, seq, title)
+        self._aggregate(year, rating, 1)
+
+    def remove(self, title):
+        """
+        Removes a movie from the indexes
+        """
+        seq, year, rating = self._movies.pop(title)
+        self._indexes["rating"].remove(rating, seq)
+        self._indexes["year"].remove(year, seq)
+        self._aggregate(year, rating, -1)
+
+    def update(self, title, rating):
+        """
+        Moves a movie to its new position in the rating index
+        """
+        seq, year, old_rating = self._movies[title]
+        self._indexes["rating"].remove(old_rating, seq)
+        self._indexes["rating"].add(rating, seq, title)
+        self._movies[title] = (seq, year, rating)
+        self._aggregate(year, old_rating, -1)
+        self._aggregate(year, rating, 1)
+
+    def filter(self, min_rating=None, start_year=None, end_year=None):
+        """
+        Returns the titles matching the criteria, in catalogue order.
+        Only the range of the more selective index is scanned, so the
+        cost is O(log N + k) for k candidates.
+        """
+        rating_start, rating_end = self._indexes["rating"].bounds(min_rating)
+        year_start, year_end = self._indexes["year"].bounds(start_year,
+                                                            end_year)
+        if rating_end - rating_start <= year_end - year_start:
+            candidates = self._indexes["rating"].range(min_rating)
+            matches = [(seq, title) for rating, seq, title in candidates
+                       if (start_year is None or
+                           self._movies[title][1] >= start_year)
+                       and (end_year is None or
+                            self._movies[title][1] <= end_year)]
+        else:
+            candidates = self._indexes["year"].range(start_year, end_year)
+            matches = [(seq, title) for year, seq, title in candidates
+                       if min_rating is None or
+                       self._movies[title][2] >= min_rating]
+        matches.sort()
+        return [title for seq, title in matches]
+
+    def ordered(self, key, reverse=False, offset=0):
+        """
+        Yields the titles ordered by key ("rating" or "year"),
+        starting at position offset
+        """
+        index = self._indexes[key]
+        return index.descending(offset) if reverse \
+            else index.ascending(offset)
+
+    def rating_summary(self, percentiles=rating_stats.PERCENTILES):
+        """
+        Returns the rating statistics, like rating_stats.summarise(),
+        in O(1) from the running aggregates and the rating index
+        """
+        if not self._movies:
+            return None
+        ratings = self._indexes["rating"]
+        worst_rating, seq, worst = ratings.first()
+        best_rating, seq, best = ratings.last()
+        return {
+            "count": len(self._movies),
+            "mean": self._rating_sum.value() / len(self._movies),
+            "median": ratings.percentile(50),
+            "min": worst_rating,
+            "max": best_rating,
+            "best": best,
+            "worst": worst,
+            "percentiles": {percentile: ratings.percentile(percentile)
+                            for percentile in percentiles}
+        }
+
+    def rating_histogram(self, bins=rating_stats.HISTOGRAM_BINS):
+        """
+        Returns the histogram of the ratings, computed over the
+        distinct ratings weighted by their number of movies
+        """
+        ratings = list(self._rating_counts)
+        return rating_stats.histogram(
+            ratings, bins, [self._rating_counts[rating]
+                            for rating in ratings])
+
+    def decade_averages(self):
+        """
+        Returns the number of movies and average rating per decade
+        """
+        return {decade: (count, total.value() / count)
+                for decade, (count, total) in sorted(self._decades.items())}
@@ -0,0 +1,202 @@
+"""
+Streaming readers and writers of the movie file formats.
+
+The readers yield (title, properties) pairs one movie at a time, and
+the writers take any iterable of such pairs, so a catalogue can be
+read, written or converted without ever holding the whole file or the
+whole catalogue in memory.
+
+Formats:
+    json   one object of title: properties, as written by StorageJson
+    csv    title,year,rating,poster rows, as written by StorageCsv
+    jsonl  one {"title", "year", "rating", "poster"} object per line
+"""
+from itertools import islice
+import json
+import csv
+import re
+
+# Characters read from the file at a time by the JSON reader
+CHUNK_SIZE = 1 << 16
+CSV_FIELDS = ["title", "year", "rating", "poster"]
+# Movies written per batch when converting to a storage without
+# streaming writes
+CONVERT_BATCH = 10000
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class _JsonReader:
+    """
+    Incremental parser of one JSON object of title: properties,
+    decoding one member at a time from a buffer of CHUNK_SIZE reads
+    """
+    def __init__(self, file):
+        self._file = file
+        self._buffer = ""
+        self._position = 0
+        self._eof = False
+
+    def _fill(self):
+        """
+        Reads the next chunk into the buffer, dropping what was parsed
+        :return: False at the end of the file
+        """
+        if self._eof:
+            return False
+        chunk = self._file.read(CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._position:] + chunk
+        self._position = 0
+        return True
+
+    def _next_char(self):
+        """
+        Skips the whitespace and returns the next character,
+        or '' at the end of the file
+        """
+        while True:
+            self._position = _WHITESPACE.match(self._buffer,
+                                               self._position).end()
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._fill():
+                return ''
+
+    def _expect(self, characters):
+        """
+        Consumes the next character, which must be one of characters
+        """
+        char = self._next_char()
+        if char == '' or char not in characters:
+            raise ValueError(f"expected one of {characters!r} in the "
+                             f"JSON file, found {char!r}")
+        self._position += 1
+        return char
+
+    def _value(self):
+        """
+        Decodes the next JSON value, reading more of the file until
+        the buffer holds all of it
+        """
+        self._next_char()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer,
+                                                 self._position)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # a number may continue in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._position = end
+            return value
+
+    def __iter__(self):
+        self._expect("{")
+        if self._next_char() == "}":
+            return
+        while True:
+            title = self._value()
+            self._expect(":")
+            yield title, self._value()
+            if self._expect(",}") == "}":
+                return
+
+
+def iter_json(file):
+    """
+    Yields the (title, properties) pairs of a JSON movies file
+    """
+    return iter(_JsonReader(file))
+
+
+def write_json(file, movies):
+    """
+    Writes (title, properties) pairs as a JSON object, exactly as
+    json.dumps() writes the movies dictionary
+    """
+    file.write("{")
+    separator = ""
+    for title, properties in movies:
+        file.write(f"{separator}{json.dumps(title)}: "
+                   f"{json.dumps(properties)}")
+        separator = ", "
+    file.write("}")
+
+
+def iter_csv(file):
+    """
+    Yields the (title, properties) pairs of a CSV movies file
+    """
+    for row in csv.DictReader(file):
+        yield row["title"], {
+            "year": int(row["year"]),
+            "rating": float(row["rating"]),
+            "poster": row.get("poster", "N/A")
+        }
+
+
+def write_csv(file, movies):
+    """
+    Writes (title, properties) pairs as CSV rows
+    """
+    writer = csv.writer(file)
+    writer.writerow(CSV_FIELDS)
+    writer.writerows((title, data["year"], data["rating"], data["poster"])
+                     for title, data in movies)
+
+
+def iter_jsonl(file):
+    """
+    Yields the (title, properties) pairs of a JSON Lines movies file
+    """
+    for line in file:
+        if line.strip() == '':
+            continue
+        movie = json.loads(line)
+        title = movie.pop("title")
+        yield title, movie
+
+
+def write_jsonl(file, movies):
+    """
+    Writes (title, properties) pairs as JSON Lines
+    """
+    for title, properties in movies:
+        file.write(json.dumps(dict(title=title, **properties)) + "\n")
+
+
+def convert(source, target, batch=CONVERT_BATCH):
+    """
+    Copies every movie of the source storage into the target storage,
+    which must be empty, one movie at a time: file storages are written
+    as a stream, the other storages receive the movies in batches
+    :return: the number of movies copied
+    :raise ValueError: if the target already holds movies
+    """
+    if target.count() > 0:
+        raise ValueError("The target storage is not empty")
+    copied = 0
+
+    def counted(movies):
+        nonlocal copied
+        for movie in movies:
+            copied += 1
+            yield movie
+
+    movies = counted(source.iter_movies())
+    if hasattr(target, "write_movies"):
+        target.write_movies(movies)
+        return copied
+    with target.transaction():
+        while True:
+            chunk = dict(islice(movies, batch))
+            if not chunk:
+                return copied
+            target.add_movies(chunk)
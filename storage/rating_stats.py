@@ -0,0 +1,158 @@
+"""
+Statistics of the ratings column of a catalogue.
+
+Every function takes the columns of the catalogue (titles, ratings,
+years as sequences in catalogue order). With NumPy the work is done in
+a few vectorised, linear-time passes over the columns (percentiles use
+selection, not sorting). NumPy is optional and only imported when
+statistics are first computed; without it the same results are
+computed in plain Python, sorting the ratings for the percentiles.
+"""
+from storage.movie_catalogue import RATING_DIGITS
+import statistics
+import math
+
+PERCENTILES = (25, 50, 75)
+HISTOGRAM_BINS = 10
+
+
+def _numpy():
+    """
+    Returns the numpy module, or None if it is not installed
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _as_array(numpy, ratings):
+    """
+    Returns the ratings as a float64 NumPy array, rounding back
+    the ratings of a float32 column (array('f'))
+    """
+    values = numpy.asarray(ratings, dtype=numpy.float64)
+    if getattr(ratings, "typecode", None) == "f":
+        values = values.round(RATING_DIGITS)
+    return values
+
+
+def _as_list(ratings):
+    """
+    Returns the ratings as a list, rounding back
+    the ratings of a float32 column (array('f'))
+    """
+    if getattr(ratings, "typecode", None) == "f":
+        return [round(rating, RATING_DIGITS) for rating in ratings]
+    return list(ratings)
+
+
+def _percentile(ordered, percentile):
+    """
+    Returns a percentile of sorted values, interpolated
+    linearly like numpy.percentile does
+    """
+    position = (len(ordered) - 1) * percentile / 100
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarise(titles, ratings, percentiles=PERCENTILES):
+    """
+    Returns the statistics of the ratings: count, mean, median, min,
+    max, the best and worst movie, and the given percentiles (as a
+    dictionary of percentile: value), or None if there are no ratings.
+    On ties, the best movie is the last one and the worst the first,
+    like IStorage.aggregate_ratings().
+    """
+    if len(ratings) == 0:
+        return None
+    numpy = _numpy()
+    if numpy is not None:
+        values = _as_array(numpy, ratings)
+        count = len(values)
+        worst = int(values.argmin())
+        best = count - 1 - int(values[::-1].argmax())
+        points = numpy.percentile(values, (50,) + tuple(percentiles))
+        mean = float(values.mean())
+        points = [float(point) for point in points]
+        minimum, maximum = float(values[worst]), float(values[best])
+    else:
+        values = _as_list(ratings)
+        count = len(values)
+        worst = min(range(count), key=values.__getitem__)
+        best = max(reversed(range(count)), key=values.__getitem__)
+        ordered = sorted(values)
+        points = [statistics.median(ordered)] + [
+            _percentile(ordered, percentile) for percentile in percentiles]
+        mean = math.fsum(values) / count
+        minimum, maximum = values[worst], values[best]
+    return {
+        "count": count,
+        "mean": mean,
+        "median": points[0],
+        "min": minimum,
+        "max": maximum,
+        "best": titles[best],
+        "worst": titles[worst],
+        "percentiles": dict(zip(percentiles, points[1:]))
+    }
+
+
+def histogram(ratings, bins=HISTOGRAM_BINS, weights=None):
+    """
+    Returns the histogram of the ratings as (counts, edges), with bins
+    of equal width from the lowest to the highest rating, like
+    numpy.histogram() and matplotlib's hist() compute it
+    :param weights: number of movies of every rating, if the ratings
+        are the distinct ratings of the catalogue
+    """
+    if len(ratings) == 0:
+        return [0] * bins, [float(edge) for edge in range(bins + 1)]
+    numpy = _numpy()
+    if numpy is not None:
+        counts, edges = numpy.histogram(_as_array(numpy, ratings), bins,
+                                        weights=weights)
+        return [int(count) for count in counts], edges.tolist()
+    values = _as_list(ratings)
+    weights = [1] * len(values) if weights is None else weights
+    low, high = min(values), max(values)
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    width = (high - low) / bins
+    edges = [low + width * number for number in range(bins)] + [high]
+    counts = [0] * bins
+    for value, weight in zip(values, weights):
+        counts[min(int((value - low) / width), bins - 1)] += weight
+    return counts, edges
+
+
+def group_means(keys, ratings, width=10):
+    """
+    Returns the average rating of every group of keys of the given
+    width, e.g. of every decade for years and width 10
+    :return: dictionary of the first key of the group: (number of
+        movies, average rating), in ascending order of the groups
+    """
+    if len(ratings) == 0:
+        return {}
+    numpy = _numpy()
+    if numpy is not None:
+        groups = numpy.asarray(keys, dtype=numpy.int64) // width
+        values = _as_array(numpy, ratings)
+        first = groups.min()
+        counts = numpy.bincount(groups - first)
+        sums = numpy.bincount(groups - first, weights=values)
+        return {int((first + group) * width): (int(counts[group]),
+                                               float(sums[group]
+                                                     / counts[group]))
+                for group in numpy.flatnonzero(counts)}
+    totals = {}
+    for key, rating in zip(keys, _as_list(ratings)):
+        group = key // width * width
+        count, total = totals.get(group, (0, 0.0))
+        totals[group] = count + 1, total + rating
+    return {group: (count, total / count)
+            for group, (count, total) in sorted(totals.items())}
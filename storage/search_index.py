@@ -0,0 +1,128 @@
+from thefuzz import utils
+from rapidfuzz import fuzz, process
+
+# Fuzzy matches below this score are not suggested
+FUZZY_THRESHOLD = 60
+# Number of fuzzy matches scored by thefuzz.process.extract
+FUZZY_LIMIT = 5
+
+
+def fuzzy_process(text):
+    """
+    Normalises a string the way thefuzz.process.extract does before
+    scoring it with WRatio: only lower case letters and numbers, ASCII
+    """
+    return utils.full_process(text, force_ascii=True)
+
+
+def trigrams(text):
+    """
+    Returns the set of 3-character substrings of text
+    """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TitleSearchIndex:
+    """
+    Search index over the movie titles, built once from the catalogue
+    and updated as movies are added and deleted.
+    It holds the lower case and the fuzzy-normalised form of every
+    title, a trigram inverted index for the case-insensitive substring
+    search, and a character inverted index used to prune the titles
+    that cannot reach the fuzzy threshold before they are scored.
+    """
+    def __init__(self, titles=()):
+        self._titles = {}  # title -> (seq, lower case, fuzzy normalised)
+        self._trigrams = {}  # trigram -> titles containing it
+        self._characters = {}  # character -> titles containing it
+        self._next_seq = 0
+        for title in titles:
+            self.add(title)
+
+    def add(self, title):
+        """
+        Indexes a title, keeping the catalogue position of a title
+        that is already indexed
+        """
+        if title in self._titles:
+            return
+        lowered = title.lower()
+        processed = fuzzy_process(title)
+        self._titles[title] = (self._next_seq, lowered, processed)
+        self._next_seq += 1
+        for trigram in trigrams(lowered):
+            self._trigrams.setdefault(trigram, set()).add(title)
+        for character in set(processed):
+            self._characters.setdefault(character, set()).add(title)
+
+    def remove(self, title):
+        """
+        Removes a title from the index
+        """
+        seq, lowered, processed = self._titles.pop(title)
+        for trigram in trigrams(lowered):
+            self._discard(self._trigrams, trigram, title)
+        for character in set(processed):
+            self._discard(self._characters, character, title)
+
+    @staticmethod
+    def _discard(postings, key, title):
+        """
+        Removes a title from a posting list, dropping empty lists
+        """
+        titles = postings[key]
+        titles.discard(title)
+        if not titles:
+            del postings[key]
+
+    def _in_catalogue_order(self, titles):
+        """
+        Sorts titles by their position in the catalogue
+        """
+        return sorted(titles, key=lambda title: self._titles[title][0])
+
+    def search(self, query):
+        """
+        Returns the titles containing query (case-insensitive), in
+        catalogue order. Queries of 3 characters or more only verify
+        the titles that contain every trigram of the query.
+        """
+        query = query.lower()
+        query_trigrams = trigrams(query)
+        if not query_trigrams:
+            return [title for title, (seq, lowered, processed)
+                    in self._titles.items() if query in lowered]
+        postings = sorted((self._trigrams.get(trigram, set())
+                           for trigram in query_trigrams), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return self._in_catalogue_order(
+            title for title in candidates
+            if query in self._titles[title][1])
+
+    def suggest(self, query, threshold=FUZZY_THRESHOLD, limit=FUZZY_LIMIT):
+        """
+        Returns the same (title, score) pairs as
+        [match for match in thefuzz.process.extract(query, titles)
+         if match[1] >= threshold],
+        scoring only the titles sharing at least one character with
+        the normalised query, as all the others score 0
+        """
+        query = fuzzy_process(utils.full_process(query))
+        if not query:
+            return []
+        candidates = set()
+        for character in set(query):
+            candidates.update(self._characters.get(character, ()))
+        candidates = self._in_catalogue_order(candidates)
+        # thefuzz rounds the WRatio score, so x.5 below the threshold
+        # still reaches it
+        matches = process.extract(
+            query, [self._titles[title][2] for title in candidates],
+            scorer=fuzz.WRatio, processor=None, limit=limit,
+            score_cutoff=threshold - 0.5)
+        results = []
+        for choice, score, position in matches:
+            score = int(round(score))
+            if score >= threshold:
+                results.append((candidates[position], score))
+        return results
@@ -0,0 +1,523 @@
+from storage.istorage import IStorage
+from storage.file_utils import atomic_write
+from storage.instrumentation import metrics, instrumented
+from contextlib import contextmanager
+import random
+import struct
+import mmap
+import zlib
+import os
+
+# We define colors as global variables
+MAGENTA = '\033[95m'
+BLUE = '\033[94m'
+GREEN = '\033[92m'
+YELLOW = '\033[93m'
+RED = '\033[91m'
+ENDC = '\033[0m'
+
+MAGIC = b"MOVIEBIN"
+FORMAT_VERSION = 1
+# magic, format version, title size, poster size, dirty flag, record
+# slots, slots used so far, movies, first free slot, index buckets,
+# next sequence number
+HEADER = struct.Struct("<8sHHHBxIIIIIQ")
+HEADER_SIZE = 64
+# status, next free slot, title hash, sequence number, rating, year,
+# title length, poster length; followed by the title and poster bytes
+RECORD = struct.Struct("<B3xIIQdiHH")
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 12  # of the sequence number in RECORD
+RATING = struct.Struct("<d")
+RATING_OFFSET = 20  # of the rating in RECORD
+BUCKET = struct.Struct("<I")
+
+FREE, LIVE = 0, 1
+NO_SLOT = 0xFFFFFFFF
+NO_POSTER = 0xFFFF
+TITLE_SIZE = 255
+POSTER_SIZE = 255
+INITIAL_CAPACITY = 1024
+# Free slots tolerated before the file is compacted, so that picking
+# a random slot finds a movie in two tries on average
+COMPACT_MIN_FREE = 1024
+
+
+class StorageBinary(IStorage):
+    """
+    Memory-mapped binary storage with fixed-width records.
+    The file holds a header, a hash index of title -> record slot
+    (open addressing with linear probing, on crc32 of the title) and
+    the records, title_size and poster_size bytes wide for the title
+    and the poster. Looking up, updating the rating of or picking
+    a random movie reads or writes a single record of the map, without
+    parsing the rest of the file; ratings are updated in place.
+    Deleted records go to a free list and are reused by the next adds.
+    The movies keep their insertion order through a sequence number.
+    When the records are full, or more than half of them are free,
+    the file is rewritten (atomically) with the live records only.
+
+    The changes are written to the map as they are made and flushed to
+    the disk at the end of every change, or of transaction(), which does
+    not roll back. A crash in the middle of a change leaves the dirty
+    flag of the header set, and the file is rebuilt from its records
+    when it is next opened.
+    One process at a time should open the file.
+    """
+    def __init__(self, file_path, title_size=TITLE_SIZE,
+                 poster_size=POSTER_SIZE):
+        self.file_path = file_path
+        self._mmap = None
+        self._in_transaction = False
+        if not os.path.exists(file_path):
+            self._create(title_size, poster_size, INITIAL_CAPACITY)
+        self._open()
+        if self._dirty:
+            print(f"{YELLOW}{file_path} was not closed cleanly, "
+                  f"rebuilding it{ENDC}")
+            self._rebuild(self._capacity, recover=True)
+
+    def _create(self, title_size, poster_size, capacity):
+        """
+        Writes an empty movies file
+        """
+        self._title_size = title_size
+        self._poster_size = poster_size
+        with atomic_write(self.file_path, mode="wb") as binary_file:
+            binary_file.truncate(self._file_size(capacity))
+            binary_file.write(HEADER.pack(
+                MAGIC, FORMAT_VERSION, title_size, poster_size, 0,
+                capacity, 0, 0, NO_SLOT, self._bucket_count(capacity), 0))
+
+    def _open(self):
+        """
+        Maps the movies file and reads its header
+        """
+        with open(self.file_path, "r+b") as binary_file:
+            self._mmap = mmap.mmap(binary_file.fileno(), 0)
+        self._read_header()
+
+    def _read_header(self):
+        """
+        Reads the header of the mapped file
+        :raise ValueError: if the file is not a movies binary file
+        """
+        if len(self._mmap) < HEADER_SIZE or HEADER.unpack_from(
+                self._mmap)[:2] != (MAGIC, FORMAT_VERSION):
+            self.close()
+            raise ValueError(f"{self.file_path} is not a movies "
+                             f"binary file")
+        (magic, version, self._title_size, self._poster_size,
+         self._dirty, self._capacity, self._used, self._count,
+         self._free, self._buckets, self._next_seq) = \
+            HEADER.unpack_from(self._mmap)
+        self._record_size = (RECORD.size + self._title_size
+                             + self._poster_size)
+        self._records_start = HEADER_SIZE + BUCKET.size * self._buckets
+
+    def close(self):
+        """
+        Flushes and unmaps the movies file
+        """
+        if self._mmap is not None:
+            self._mmap.flush()
+            self._mmap.close()
+            self._mmap = None
+
+    @staticmethod
+    def _bucket_count(capacity):
+        """
+        Returns the size of the hash index for capacity records:
+        the power of two that keeps it at most half full
+        """
+        buckets = 1
+        while buckets < 2 * capacity:
+            buckets *= 2
+        return buckets
+
+    def _file_size(self, capacity):
+        """
+        Returns the size of a file of capacity records
+        """
+        return (HEADER_SIZE + BUCKET.size * self._bucket_count(capacity)
+                + (RECORD.size + self._title_size + self._poster_size)
+                * capacity)
+
+    def _write_header(self):
+        HEADER.pack_into(
+            self._mmap, 0, MAGIC, FORMAT_VERSION, self._title_size,
+            self._poster_size, self._dirty, self._capacity, self._used,
+            self._count, self._free, self._buckets, self._next_seq)
+
+    @contextmanager
+    def _change(self):
+        """
+        Marks the file as dirty while a change is written to the map,
+        and flushes it when the change, or the transaction, ends
+        """
+        if self._in_transaction:
+            yield
+            return
+        self._dirty = 1
+        self._write_header()
+        yield
+        self._dirty = 0
+        self._write_header()
+        self._mmap.flush()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Flushes the changes made inside it once, when it ends.
+        The changes are not rolled back if the block raises.
+        """
+        if self._in_transaction:  # nested transaction
+            yield self
+            return
+        with self._change():
+            self._in_transaction = True
+            try:
+                yield self
+            finally:
+                self._in_transaction = False
+
+    def _offset(self, slot):
+        return self._records_start + slot * self._record_size
+
+    def _bucket(self, number):
+        return BUCKET.unpack_from(
+            self._mmap, HEADER_SIZE + BUCKET.size * number)[0]
+
+    def _set_bucket(self, number, value):
+        BUCKET.pack_into(self._mmap, HEADER_SIZE + BUCKET.size * number,
+                         value)
+
+    def _encode(self, text, size, name):
+        """
+        Returns the UTF-8 bytes of a title or poster
+        :raise ValueError: if they do not fit in size bytes
+        """
+        data = text.encode("utf-8")
+        if len(data) > size:
+            raise ValueError(f"The {name} {text!r} is longer than "
+                             f"{size} bytes")
+        return data
+
+    def _find(self, title):
+        """
+        Looks a title up in the hash index
+        :return: (bucket, slot), the slot being None and the bucket
+            the empty one where the title would go if it is missing
+            (None too for a title too long to be stored)
+        """
+        data = title.encode("utf-8")
+        if len(data) > self._title_size:
+            return None, None
+        title_hash = zlib.crc32(data)
+        mask = self._buckets - 1
+        number = title_hash & mask
+        while True:
+            value = self._bucket(number)
+            if value == 0:
+                return number, None
+            slot = value - 1
+            offset = self._offset(slot)
+            fields = RECORD.unpack_from(self._mmap, offset)
+            start = offset + RECORD.size
+            if fields[2] == title_hash and \
+                    self._mmap[start:start + fields[6]] == data:
+                return number, slot
+            number = (number + 1) & mask
+
+    def _read(self, slot):
+        """
+        Returns the (title, properties) pair of the record at a slot
+        """
+        offset = self._offset(slot)
+        (status, next_free, title_hash, seq, rating, year, title_length,
+         poster_length) = RECORD.unpack_from(self._mmap, offset)
+        start = offset + RECORD.size
+        title = self._mmap[start:start + title_length].decode("utf-8")
+        poster = None
+        if poster_length != NO_POSTER:
+            start += self._title_size
+            poster = self._mmap[start:start + poster_length].decode("utf-8")
+        return title, {"year": year, "rating": rating, "poster": poster}
+
+    def _write(self, slot, title, year, rating, poster, seq):
+        """
+        Writes a live record at a slot
+        """
+        data = self._encode(title, self._title_size, "title")
+        poster_data = b""
+        poster_length = NO_POSTER
+        if poster is not None:
+            poster_data = self._encode(poster, self._poster_size, "poster")
+            poster_length = len(poster_data)
+        offset = self._offset(slot)
+        start = offset + RECORD.size
+        self._mmap[start:start + len(data)] = data
+        start += self._title_size
+        self._mmap[start:start + len(poster_data)] = poster_data
+        RECORD.pack_into(self._mmap, offset, LIVE, NO_SLOT,
+                         zlib.crc32(data), seq, rating, year, len(data),
+                         poster_length)
+
+    def _unlink(self, number):
+        """
+        Empties a bucket of the index, moving back the following
+        entries of its probe sequence (backward shift deletion)
+        """
+        mask = self._buckets - 1
+        following = number
+        while True:
+            self._set_bucket(number, 0)
+            while True:
+                following = (following + 1) & mask
+                value = self._bucket(following)
+                if value == 0:
+                    return
+                home = RECORD.unpack_from(
+                    self._mmap, self._offset(value - 1))[2] & mask
+                # an entry whose home bucket lies cyclically in
+                # (number, following] stays where it is
+                if number <= following:
+                    stays = number < home <= following
+                else:
+                    stays = home <= following or home > number
+                if not stays:
+                    self._set_bucket(number, value)
+                    number = following
+                    break
+
+    def _allocate(self):
+        """
+        Returns a free slot, from the free list or after the slots
+        used so far, or None if the records are full
+        """
+        if self._free != NO_SLOT:
+            slot = self._free
+            self._free = RECORD.unpack_from(
+                self._mmap, self._offset(slot))[1]
+            return slot
+        if self._used < self._capacity:
+            self._used += 1
+            return self._used - 1
+        return None
+
+    def _live_slots(self):
+        """
+        Returns the slots of the movies, in insertion order
+        """
+        live = []
+        for slot in range(self._used):
+            status, next_free, title_hash, seq = RECORD.unpack_from(
+                self._mmap, self._offset(slot))[:4]
+            if status == LIVE:
+                live.append((seq, slot))
+        live.sort()
+        return [slot for seq, slot in live]
+
+    @instrumented
+    def _rebuild(self, capacity, recover=False):
+        """
+        Rewrites the file with capacity record slots, the live records
+        in insertion order and a new index and free list
+        :param recover: the header may be stale (after a crash),
+            check every record of the file
+        """
+        if recover:
+            self._used = self._capacity
+        old_map = self._mmap
+        old_offsets = [self._offset(slot) for slot in self._live_slots()]
+        try:
+            with atomic_write(self.file_path, mode="wb") as binary_file:
+                binary_file.truncate(self._file_size(capacity))
+                binary_file.flush()
+                self._mmap = mmap.mmap(binary_file.fileno(), 0)
+                self._copy(old_map, old_offsets, capacity)
+                old_map.close()
+        except BaseException:
+            # maps the file again, the old one if it was not replaced
+            self._mmap.close()
+            old_map.close()
+            self._open()
+            raise
+        self._open()
+        metrics.add("rebuilds")
+        metrics.add_file_size("bytes_written", self.file_path)
+
+    def _copy(self, old_map, old_offsets, capacity):
+        """
+        Fills the new map of _rebuild() with the records of the old map
+        """
+        record_size = self._record_size
+        self._capacity = capacity
+        self._buckets = self._bucket_count(capacity)
+        self._records_start = HEADER_SIZE + BUCKET.size * self._buckets
+        self._count = self._used = self._next_seq = 0
+        self._free = NO_SLOT
+        for old_offset in old_offsets:
+            slot = self._used
+            offset = self._offset(slot)
+            self._mmap[offset:offset + record_size] = \
+                old_map[old_offset:old_offset + record_size]
+            SEQ.pack_into(self._mmap, offset + SEQ_OFFSET,
+                          self._next_seq)
+            self._link(RECORD.unpack_from(self._mmap, offset)[2], slot)
+            self._used += 1
+            self._count += 1
+            self._next_seq += 1
+        # inside a transaction, the header of the file is only up to date
+        # when it ends: a crash before then must recover the file
+        self._dirty = 1 if self._in_transaction else 0
+        self._write_header()
+        self._mmap.flush()
+        self._mmap.close()
+
+    def _link(self, title_hash, slot):
+        """
+        Adds a slot to the hash index
+        """
+        mask = self._buckets - 1
+        number = title_hash & mask
+        while self._bucket(number) != 0:
+            number = (number + 1) & mask
+        self._set_bucket(number, slot + 1)
+
+    def get_movie(self, title):
+        """
+        Returns the properties of a movie, or None if it is not
+        in the storage, reading only its record
+        """
+        slot = self._find(title)[1]
+        return None if slot is None else self._read(slot)[1]
+
+    def random_movie(self):
+        """
+        Returns the (title, properties) pair of a random movie, or None
+        if the storage is empty, picking random slots until one holds
+        a movie (at most half of them are free)
+        """
+        if self._count == 0:
+            return None
+        while True:
+            slot = random.randrange(self._used)
+            if self._mmap[self._offset(slot)] == LIVE:
+                return self._read(slot)
+
+    def count(self):
+        """
+        Returns the number of movies, kept in the header
+        """
+        return self._count
+
+    def iter_movies(self):
+        """
+        Yields the movies one record at a time, in insertion order
+        """
+        for slot in self._live_slots():
+            yield self._read(slot)
+
+    @instrumented
+    def list_movies(self):
+        """
+        Returns a dictionary of dictionaries that
+        contains the movies information in the database.
+        """
+        metrics.add("full_loads")
+        return dict(self.iter_movies())
+
+    def add_movie(self, title, year, rating, poster):
+        """
+        Adds a movie to the movies database, or replaces
+        the properties of a movie with the same title.
+        :raise ValueError: if the title or the poster is too long
+        """
+        self._encode(title, self._title_size, "title")
+        if poster is not None:
+            self._encode(poster, self._poster_size, "poster")
+        number, slot = self._find(title)
+        if slot is not None:
+            seq = RECORD.unpack_from(self._mmap, self._offset(slot))[3]
+            with self._change():
+                self._write(slot, title, year, rating, poster, seq)
+            return
+        slot = self._allocate()
+        if slot is None:
+            self._rebuild(self._capacity * 2)
+            self.add_movie(title, year, rating, poster)
+            return
+        with self._change():
+            self._write(slot, title, year, rating, poster, self._next_seq)
+            self._set_bucket(number, slot + 1)
+            self._next_seq += 1
+            self._count += 1
+
+    def add_movies(self, movies):
+        """
+        Adds many movies, flushing the file once.
+        """
+        with self.transaction():
+            for title, properties in movies.items():
+                self.add_movie(title, properties["year"],
+                               properties["rating"], properties["poster"])
+
+    def delete_movie(self, title):
+        """
+        Deletes a movie from the movies database, putting
+        its record on the free list.
+        """
+        number, slot = self._find(title)
+        if slot is None:
+            print(f"{RED}Movie '{title}' doesn't exist!{ENDC}")
+            return
+        with self._change():
+            self._unlink(number)
+            offset = self._offset(slot)
+            RECORD.pack_into(self._mmap, offset, FREE, self._free,
+                             *RECORD.unpack_from(self._mmap, offset)[2:])
+            self._free = slot
+            self._count -= 1
+        print(f'{MAGENTA}Movie "{title}" successfully deleted{ENDC}')
+        free = self._used - self._count
+        if free >= COMPACT_MIN_FREE and free > self._count and \
+                not self._in_transaction:
+            self.compact()
+
+    def delete_movies(self, titles):
+        """
+        Deletes many movies, flushing the file once.
+        """
+        with self.transaction():
+            for title in titles:
+                self.delete_movie(title)
+        free = self._used - self._count
+        if free >= COMPACT_MIN_FREE and free > self._count:
+            self.compact()
+
+    def update_movie(self, title, rating):
+        """
+        Updates the rating of a movie in place.
+        """
+        slot = self._find(title)[1]
+        if slot is None:
+            raise KeyError(title)
+        with self._change():
+            RATING.pack_into(self._mmap, self._offset(slot) + RATING_OFFSET,
+                             rating)
+
+    def update_movies(self, ratings):
+        """
+        Updates the ratings of many movies, flushing the file once.
+        """
+        with self.transaction():
+            for title, rating in ratings.items():
+                self.update_movie(title, rating)
+
+    def compact(self):
+        """
+        Rewrites the file without the free records, keeping room
+        for twice as many movies as it holds
+        """
+        self._rebuild(max(INITIAL_CAPACITY, 2 * self._count))
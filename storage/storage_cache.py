@@ -0,0 +1,362 @@
+from storage.istorage import IStorage
+from storage.movie_catalogue import MovieCatalogue
+from storage.movie_index import MovieIndex
+from storage import rating_stats
+from storage.storage_file import StorageConflictError
+from storage.instrumentation import metrics
+from types import MappingProxyType
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+import os
+
+# We define colors as global variables
+MAGENTA = '\033[95m'
+BLUE = '\033[94m'
+GREEN = '\033[92m'
+YELLOW = '\033[93m'
+RED = '\033[91m'
+ENDC = '\033[0m'
+
+class StorageCache(IStorage):
+    """
+    In-memory, write-through cache that wraps any IStorage backend.
+    The parsed catalogue is kept in memory and reused for as long as
+    the backend file keeps the same modification time and size.
+    Every change is applied to the cached catalogue first and then
+    written through to the wrapped backend.
+    The cached catalogue is indexed by rating and by year (MovieIndex),
+    so filters and rankings do not scan or sort the whole catalogue,
+    and its titles by a TitleSearchIndex for searches, built on the
+    first search so that other commands never load the fuzzy matching
+    libraries.
+    With columnar=True the catalogue is kept in a compact MovieCatalogue
+    instead of a dictionary of dictionaries, which takes several times
+    less memory for large catalogues.
+    """
+    def __init__(self, storage, columnar=False):
+        self._storage = storage
+        self.columnar = columnar
+        self._movies = None
+        self._index = None
+        self._search_index = None
+        self._signature = None
+        self._in_transaction = False
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def _file_signature(self):
+        """
+        Returns the version of the backend file (its (mtime, size) pair
+        if the backend has no version()), or None if the backend is not
+        file based or the file is missing
+        """
+        if hasattr(self._storage, "version"):
+            return self._storage.version()
+        file_path = getattr(self._storage, "file_path", None)
+        if file_path is None:
+            return None
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def version(self):
+        """
+        Returns the version of the backend file, which changes when
+        any process writes it, see _file_signature()
+        """
+        return self._file_signature()
+
+    def _load(self):
+        """
+        Returns the cached catalogue, reloading it from the backend
+        when the file changed since it was last read or written.
+        Inside a transaction the cached catalogue is always used.
+        """
+        if self._movies is not None and (
+                self._in_transaction or
+                self._file_signature() == self._signature):
+            self.hits += 1
+            metrics.add("cache_hits")
+            return self._movies
+        self.misses += 1
+        metrics.add("cache_misses")
+        with metrics.timer("StorageCache.reload"):
+            # read before loading: a write made while loading then makes
+            # the next save fail its version check instead of being lost
+            signature = self._file_signature()
+            movies = self._storage.list_movies()
+            self._movies = MovieCatalogue(movies) if self.columnar \
+                else dict(movies)
+            self._index = MovieIndex(self._movies)
+        self._search_index = None
+        self._signature = signature
+        return self._movies
+
+    def _lock(self):
+        """
+        Returns the write lock of the backend, if it has one. Changes
+        hold it from revalidating the cache to writing through, so
+        changes made by other processes are never overwritten.
+        """
+        if hasattr(self._storage, "lock"):
+            return self._storage.lock()
+        return nullcontext()
+
+    def _save(self):
+        """
+        Saves the whole cached catalogue to the backend, provided the
+        file still has the version the cache was loaded from. On a
+        conflict, or if the save fails, the cache is dropped, so it gets
+        reloaded without the changes that were not saved.
+        """
+        try:
+            self._storage.save_movies(self._movies, self._signature)
+        except (StorageConflictError, IOError):
+            self.invalidate()
+            raise
+        self._signature = self._file_signature()
+
+    def _write_through(self, mutation, *args):
+        """
+        Persists the cached catalogue with a single save when the backend
+        supports it (at the end of the transaction, if one is running),
+        otherwise replays the mutation on the backend.
+        Returns True if the catalogue is saved directly.
+        """
+        saved = hasattr(self._storage, "save_movies")
+        if not saved:
+            mutation(*args)
+            self._signature = self._file_signature()
+        elif self._in_transaction:
+            self._dirty = True
+        else:
+            self._save()
+        return saved
+
+    @contextmanager
+    def transaction(self):
+        """
+        Groups changes: the catalogue is written through once when the
+        transaction ends (backends without save_movies() run their own
+        transaction instead). If the block raises an exception, the
+        changes are dropped and the cache is reloaded from the backend.
+        """
+        if self._in_transaction:  # nested transaction
+            yield self
+            return
+        direct = hasattr(self._storage, "save_movies")
+        with self._lock() if direct else self._storage.transaction():
+            self._load()
+            self._in_transaction = True
+            self._dirty = False
+            try:
+                yield self
+            except BaseException:
+                self.invalidate()
+                raise
+            finally:
+                self._in_transaction = False
+            if self._dirty:
+                self._dirty = False
+                self._save()
+
+    def _titles(self):
+        """
+        Returns the search index of the cached titles, building it
+        on first use
+        """
+        if self._search_index is None:
+            from storage.search_index import TitleSearchIndex
+            self._search_index = TitleSearchIndex(self._movies)
+        return self._search_index
+
+    def invalidate(self):
+        """
+        Drops the cached catalogue, the next read goes to the backend
+        """
+        self._movies = None
+        self._index = None
+        self._search_index = None
+        self._signature = None
+
+    def cache_info(self):
+        """
+        Returns the hit/miss counters of the cache
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def iter_movies(self):
+        """
+        Yields the cached movies if the cache is loaded and current,
+        otherwise streams them from the backend without loading
+        the cache
+        """
+        if self._movies is not None and (
+                self._in_transaction or
+                self._file_signature() == self._signature):
+            yield from self._movies.items()
+        else:
+            yield from self._storage.iter_movies()
+
+    def list_movies(self):
+        """
+        Returns a read-only view of the cached movies dictionary.
+        """
+        return MappingProxyType(self._load())
+
+    def add_movie(self, title, year, rating, poster):
+        """
+        Adds a movie to the cached catalogue and writes it through.
+        """
+        with self._lock():
+            movies = self._load()
+            movies[title] = {
+                "year": year,
+                "rating": rating,
+                "poster": poster
+            }
+            self._index.add(title, year, rating)
+            if self._search_index is not None:
+                self._search_index.add(title)
+            self._write_through(self._storage.add_movie,
+                                title, year, rating, poster)
+
+    def add_movies(self, movies):
+        """
+        Adds many movies to the cached catalogue
+        and writes them through at once.
+        """
+        with self.transaction():
+            for title, properties in movies.items():
+                self.add_movie(title, properties["year"],
+                               properties["rating"], properties["poster"])
+
+    def delete_movie(self, title):
+        """
+        Deletes a movie from the cached catalogue and writes it through.
+        """
+        with self._lock():
+            movies = self._load()
+            if title not in movies:
+                print(f"{RED}Movie '{title}' doesn't exist!{ENDC}")
+                return
+            del movies[title]
+            self._index.remove(title)
+            if self._search_index is not None:
+                self._search_index.remove(title)
+            if self._write_through(self._storage.delete_movie, title):
+                print(f'{MAGENTA}Movie "{title}" successfully deleted{ENDC}')
+
+    def delete_movies(self, titles):
+        """
+        Deletes many movies from the cached catalogue
+        and writes them through at once.
+        """
+        with self.transaction():
+            for title in titles:
+                self.delete_movie(title)
+
+    def update_movie(self, title, rating):
+        """
+        Updates the rating of a movie in the cached catalogue
+        and writes it through.
+        """
+        with self._lock():
+            movies = self._load()
+            movies[title] = dict(movies[title], rating=rating)
+            self._index.update(title, rating)
+            self._write_through(self._storage.update_movie, title, rating)
+
+    def update_movies(self, ratings):
+        """
+        Updates the ratings of many movies in the cached
+        catalogue and writes them through at once.
+        """
+        with self.transaction():
+            for title, rating in ratings.items():
+                self.update_movie(title, rating)
+
+    def count(self):
+        """
+        Returns the number of cached movies
+        """
+        return len(self._load())
+
+    def filter(self, min_rating=None, start_year=None, end_year=None):
+        """
+        Returns the movies matching the criteria, using the indexes
+        """
+        movies = self._load()
+        return {title: movies[title] for title in
+                self._index.filter(min_rating, start_year, end_year)}
+
+    def top_n(self, key, n=None, reverse=False, offset=0):
+        """
+        Returns n movies ordered by key from position offset, read in
+        order from the index instead of sorting the catalogue, so a page
+        costs the same whatever the size of the catalogue
+        """
+        movies = self._load()
+        if not self._index.supports(key):
+            return super().top_n(key, n, reverse, offset)
+        titles = islice(self._index.ordered(key, reverse, offset), n)
+        return [(title, movies[title]) for title in titles]
+
+    def aggregate_ratings(self):
+        """
+        Returns the rating statistics, kept up to date by the index
+        as movies change instead of being computed from the catalogue
+        """
+        self._load()
+        return self._index.rating_summary()
+
+    def rating_histogram(self, bins=rating_stats.HISTOGRAM_BINS):
+        """
+        Returns the histogram of the ratings, from the number
+        of movies of every rating kept by the index
+        """
+        self._load()
+        return self._index.rating_histogram(bins)
+
+    def average_by_decade(self):
+        """
+        Returns the number of movies and average rating per decade,
+        kept up to date by the index
+        """
+        self._load()
+        return self._index.decade_averages()
+
+    def rating_columns(self):
+        """
+        Returns the (titles, ratings, years) columns; a columnar
+        cache hands out its own columns without copying them
+        """
+        movies = self._load()
+        if self.columnar:
+            return movies.columns()
+        return super().rating_columns()
+
+    def search(self, query):
+        """
+        Returns the movies whose title contains query,
+        using the trigram index
+        """
+        movies = self._load()
+        return {title: movies[title]
+                for title in self._titles().search(query)}
+
+    def suggest(self, query, threshold=60):
+        """
+        Returns the fuzzy matches of query, scoring only
+        the titles the search index could not rule out
+        """
+        self._load()
+        return self._titles().suggest(query, threshold)
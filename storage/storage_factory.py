@@ -0,0 +1,68 @@
+"""
+Opens the storage of a movies file, choosing the backend
+from the file extension
+"""
+from storage.storage_binary import StorageBinary
+from storage.storage_cache import StorageCache
+from storage.storage_csv import StorageCsv
+from storage.storage_json import StorageJson
+from storage.storage_jsonl import StorageJsonl
+from storage.storage_journal import StorageJournal
+from storage.storage_sharded import StorageSharded
+from storage.storage_sqlite import StorageSqlite
+import os
+
+# Backend of every file extension
+EXTENSIONS = {
+    ".json": "json",
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".sqlite": "sqlite",
+    ".sqlite3": "sqlite",
+    ".db": "sqlite",
+    ".bin": "binary",
+    ".shards": "sharded"
+}
+BACKENDS = ("json", "csv", "jsonl", "journal", "sqlite", "binary",
+            "sharded")
+
+
+def open_storage(file_path, backend=None, interactive=True, cache=True,
+                 columnar=False):
+    """
+    Returns the storage of a movies file
+    :param file_path: path of the movies file
+    :param backend: "json", "csv", "jsonl", "journal", "sqlite",
+        "binary" or "sharded", by default chosen from the file extension
+    :param interactive: False for storages that never prompt,
+        a missing file then holds no movies
+    :param cache: wraps the JSON, CSV and JSON Lines storages
+        in a StorageCache
+    :param columnar: keeps the cached catalogue in a MovieCatalogue
+    :raise ValueError: if the backend is unknown, or the file is not
+        in the format of the backend
+    """
+    if backend is None:
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension not in EXTENSIONS:
+            raise ValueError(f"No storage for '{extension}' files, "
+                             f"choose one of {', '.join(BACKENDS)}")
+        backend = EXTENSIONS[extension]
+    if backend == "json":
+        storage = StorageJson(file_path, interactive)
+    elif backend == "csv":
+        storage = StorageCsv(file_path, interactive)
+    elif backend == "jsonl":
+        storage = StorageJsonl(file_path, interactive)
+    elif backend == "journal":
+        return StorageJournal(file_path)
+    elif backend == "sqlite":
+        return StorageSqlite(file_path)
+    elif backend == "binary":
+        return StorageBinary(file_path)
+    elif backend == "sharded":
+        return StorageSharded(file_path)
+    else:
+        raise ValueError(f"Unknown storage '{backend}', "
+                         f"choose one of {', '.join(BACKENDS)}")
+    return StorageCache(storage, columnar) if cache else storage
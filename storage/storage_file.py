@@ -0,0 +1,290 @@
+from storage.istorage import IStorage
+from storage.file_utils import atomic_write, file_lock, file_version
+from storage.instrumentation import metrics, instrumented
+from abc import abstractmethod
+from contextlib import contextmanager
+
+# We define colors as global variables
+MAGENTA = '\033[95m'
+BLUE = '\033[94m'
+GREEN = '\033[92m'
+YELLOW = '\033[93m'
+RED = '\033[91m'
+ENDC = '\033[0m'
+
+class StorageConflictError(Exception):
+    """
+    Raised when the file was saved by another writer
+    since the movies being saved were loaded
+    """
+    pass
+
+class StorageFile(IStorage):
+    """
+    Base class of the storages that keep the whole catalogue in one
+    file (StorageJson, StorageCsv). Every change loads the file,
+    modifies the movies, and saves the file again, unless it happens
+    inside transaction(), where the file is loaded and saved only once.
+
+    Saves are atomic (temporary file + fsync + rename), so a crash never
+    leaves a truncated file. Read-modify-write cycles hold an advisory
+    lock, so several processes can share one file without losing each
+    other's updates, while readers never wait. Every save also checks
+    that the file still has the version that was loaded, and raises
+    StorageConflictError if another writer changed it in between.
+
+    When the file does not exist, an interactive storage asks whether
+    to create it; a non-interactive one (interactive=False, for scripts
+    and batch runs) starts with no movies and creates the file on the
+    first save.
+    """
+    # newline argument used to open the file (the csv module needs "")
+    newline = None
+
+    def __init__(self, file_path, interactive=True):
+        self.file_path = file_path
+        self.interactive = interactive
+        self._transaction = None
+        self._version = None
+        self._lock_depth = 0
+
+    @abstractmethod
+    def _iter_movies(self, file):
+        """
+        Yields the (title, properties) pairs of the open file
+        one movie at a time
+        """
+        pass
+
+    @abstractmethod
+    def _write_movies(self, file, movies):
+        """
+        Writes an iterable of (title, properties) pairs to the open file
+        """
+        pass
+
+    def version(self):
+        """
+        Returns the current version of the file, see file_version()
+        """
+        return file_version(self.file_path)
+
+    @contextmanager
+    def lock(self):
+        """
+        Holds the exclusive advisory lock of the file. The lock is
+        reentrant within this storage object.
+        """
+        if self._lock_depth > 0:
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+            return
+        with file_lock(self.file_path):
+            self._lock_depth = 1
+            try:
+                yield
+            finally:
+                self._lock_depth = 0
+
+    @instrumented
+    def save_movies(self, movies, expected_version=None):
+        """
+        Gets all your movies as an argument and saves them atomically
+        to the file. If expected_version is given and the file no longer
+        has that version, StorageConflictError is raised and nothing
+        is saved. An IOError (e.g. a full disk) is raised, the file
+        keeping its old movies.
+        """
+        with self.lock():
+            if expected_version is not None and \
+                    self.version() != expected_version:
+                raise StorageConflictError(
+                    f"{self.file_path} was changed by another writer")
+            with atomic_write(self.file_path, self.newline) as file:
+                self._write_movies(file, movies.items())
+            self._version = self.version()
+            metrics.add("saves")
+            metrics.add_file_size("bytes_written", self.file_path)
+
+    @instrumented
+    def write_movies(self, movies):
+        """
+        Replaces the file with the movies of an iterable of (title,
+        properties) pairs, written one at a time, so the catalogue is
+        never held in memory (see movie_streams.convert())
+        """
+        with self.lock():
+            with atomic_write(self.file_path, self.newline) as file:
+                self._write_movies(file, movies)
+            self._version = self.version()
+            metrics.add("saves")
+            metrics.add_file_size("bytes_written", self.file_path)
+
+    def iter_movies(self):
+        """
+        Yields the (title, properties) pairs of the file one movie at
+        a time, without loading the whole file. A missing file holds
+        no movies.
+        """
+        if self._transaction is not None:
+            yield from self._transaction.items()
+            return
+        try:
+            file = open(self.file_path, "r", newline=self.newline)
+        except FileNotFoundError:
+            return
+        with file:
+            yield from self._iter_movies(file)
+            metrics.add("streamed_reads")
+            metrics.add_file_size("bytes_read", self.file_path)
+
+    @instrumented
+    def list_movies(self):
+        """
+        Returns a dictionary of dictionaries that
+        contains the movies information in the database.
+        The function loads the information from the file
+        and returns the data. Inside a transaction it returns
+        the movies as modified so far.
+        """
+        if self._transaction is not None:
+            return self._transaction
+        try:
+            version = self.version()
+            with open(self.file_path, "r", newline=self.newline) as file:
+                movies = dict(self._iter_movies(file))
+            self._version = version
+            metrics.add("full_loads")
+            metrics.add("bytes_read", version[2] if version else 0)
+            return movies
+        except IOError as e:
+            if not self.interactive:
+                if isinstance(e, FileNotFoundError):
+                    self._version = None
+                    return {}
+                raise
+            print(RED, end=" ")
+            print(e)
+            print(ENDC, end=" ")
+            return self._create_file()
+
+    def _create_file(self):
+        """
+        Asks whether to create the missing file, and exits
+        the application if the user does not want to
+        """
+        print(GREEN + f"Do you want to create empty {self.file_path} file?"
+                      f"\nY : Create {self.file_path}\n"
+                      f"N : Exit application " + ENDC)
+        while True:
+            choice = input('')
+            if choice in ("Y", "y"):
+                movies = {}
+                try:
+                    self.save_movies(movies)
+                except IOError as e:
+                    print(f"{RED}{e}{ENDC}")
+                return movies
+            elif choice in ("N", "n"):
+                exit()
+            else:
+                print(BLUE + 'Please enter "Y" or "N"' + ENDC)
+
+    def _store(self, movies):
+        """
+        Saves the modified movies, or leaves them to
+        the end of the running transaction
+        """
+        if self._transaction is None:
+            self.save_movies(movies, self._version)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Groups changes: the file is locked and loaded once when the
+        transaction starts and saved once when it ends. If the block
+        raises an exception, nothing is saved.
+        """
+        if self._transaction is not None:  # nested transaction
+            yield self
+            return
+        with self.lock():
+            self._transaction = self.list_movies()
+            try:
+                yield self
+            except BaseException:
+                self._transaction = None
+                raise
+            movies, self._transaction = self._transaction, None
+            self.save_movies(movies, self._version)
+
+    def add_movie(self, title, year, rating, poster):
+        """
+        Adds a movie to the movies database.
+        Loads the information from the file, add the movie,
+        and saves it. The function doesn't need to validate the input.
+        """
+        with self.lock():
+            movies = self.list_movies()
+            movies[title] = {
+                "year": year,
+                "rating": rating,
+                "poster": poster
+            }
+            self._store(movies)
+
+    def add_movies(self, movies):
+        """
+        Adds many movies to the movies database.
+        Loads the information from the file once, adds
+        all the movies, and saves it once.
+        """
+        with self.transaction():
+            for title, properties in movies.items():
+                self.add_movie(title, properties["year"],
+                               properties["rating"], properties["poster"])
+
+    def delete_movie(self, title):
+        """
+        Deletes a movie from the movies database.
+        Loads the information from the file, deletes the movie,
+        and saves it. The function doesn't need to validate the input.
+        """
+        with self.lock():
+            movies = self.list_movies()
+            if movies.pop(title, 0) == 0:  # checks if movie exists
+                print(f"{RED}Movie '{title}' doesn't exist!{ENDC}")
+            else:
+                self._store(movies)
+                print(f'{MAGENTA}Movie "{title}" successfully deleted{ENDC}')
+
+    def delete_movies(self, titles):
+        """
+        Deletes many movies with a single load and save of the file.
+        """
+        with self.transaction():
+            for title in titles:
+                self.delete_movie(title)
+
+    def update_movie(self, title, rating):
+        """
+        Updates a movie from the movies database.
+        Loads the information from the file, updates the movie,
+        and saves it. The function doesn't need to validate the input.
+        """
+        with self.lock():
+            movies = self.list_movies()
+            movies[title]["rating"] = rating
+            self._store(movies)
+
+    def update_movies(self, ratings):
+        """
+        Updates the ratings of many movies, given as a dictionary
+        of title: rating, with a single load and save of the file.
+        """
+        with self.transaction():
+            for title, rating in ratings.items():
+                self.update_movie(title, rating)
@@ -0,0 +1,228 @@
+from storage.istorage import IStorage
+from storage.file_utils import atomic_write
+from storage.instrumentation import metrics, instrumented
+from types import MappingProxyType
+from contextlib import contextmanager
+import json
+import os
+
+# We define colors as global variables
+MAGENTA = '\033[95m'
+BLUE = '\033[94m'
+GREEN = '\033[92m'
+YELLOW = '\033[93m'
+RED = '\033[91m'
+ENDC = '\033[0m'
+
+class StorageJournal(IStorage):
+    """
+    Append-only journal storage.
+    The catalogue lives in a JSON snapshot (same format as StorageJson)
+    plus a log file next to it, where every add/delete/update is appended
+    as one JSON record per line. On open the snapshot is loaded and the
+    log is replayed on top of it. Once the log grows past
+    compact_threshold bytes, the catalogue is written to a fresh snapshot
+    and the log is emptied.
+    Inside transaction(), the records are buffered and appended
+    with a single write when the transaction ends.
+    """
+    def __init__(self, file_path, compact_threshold=1024 * 1024):
+        self.file_path = file_path
+        self.log_path = file_path + ".log"
+        self.compact_threshold = compact_threshold
+        self._pending = None
+        self._movies = self._load_snapshot()
+        self._replay_log()
+
+    def _load_snapshot(self):
+        """
+        Loads the movies of the last snapshot, or an empty
+        catalogue if there is no snapshot yet
+        """
+        metrics.add("full_loads")
+        try:
+            with open(self.file_path, "r") as json_file:
+                movies = json.loads(json_file.read())
+        except FileNotFoundError:
+            return {}
+        metrics.add_file_size("bytes_read", self.file_path)
+        return movies
+
+    def _replay_log(self):
+        """
+        Applies the logged operations on top of the snapshot.
+        Torn or corrupt records at the end of the log (the process
+        crashed mid-append) are cut off, so the next append starts on
+        a clean line. A corrupt record followed by valid ones cannot
+        come from a crash: it is skipped, and the records after it are
+        still replayed (every record holds all the values it sets).
+        """
+        try:
+            log_file = open(self.log_path, "rb")
+        except FileNotFoundError:
+            return
+        offset = 0
+        good_offset = 0  # end of the last valid record
+        with log_file:
+            for line in log_file:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete record")
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    print(f"{YELLOW}Journal {self.log_path}: skipping bad "
+                          f"record at offset {offset} ({e}){ENDC}")
+                else:
+                    good_offset = offset + len(line)
+                offset += len(line)
+        metrics.add("bytes_read", offset)
+        if good_offset != offset:
+            with open(self.log_path, "r+b") as log_file:
+                log_file.truncate(good_offset)
+
+    def _apply(self, record):
+        """
+        Applies one journal record to the in-memory catalogue.
+        All operations are idempotent, so replaying a log on top of a
+        snapshot that already contains it gives the same catalogue.
+        """
+        op = record["op"]
+        if op == "add":
+            self._movies[record["title"]] = {
+                "year": record["year"],
+                "rating": record["rating"],
+                "poster": record["poster"]
+            }
+        elif op == "delete":
+            self._movies.pop(record["title"], None)
+        elif op == "update":
+            if record["title"] in self._movies:
+                self._movies[record["title"]]["rating"] = record["rating"]
+        else:
+            raise ValueError(f"unknown operation {op!r}")
+
+    def _append(self, *records):
+        """
+        Appends records to the log with a single write and compacts
+        the journal when the log has grown past the threshold.
+        Inside a transaction the records are only buffered.
+        """
+        if self._pending is not None:
+            self._pending.extend(records)
+            return
+        data = "".join(json.dumps(record) + "\n" for record in records)
+        with open(self.log_path, "a") as log_file:
+            log_file.write(data)
+            log_size = log_file.tell()
+        metrics.add("journal_appends")
+        metrics.add("bytes_written", len(data.encode("utf-8"))
+                    if metrics.enabled else 0)
+        if log_size >= self.compact_threshold:
+            self.compact()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Groups changes into one append to the log. If the block raises
+        an exception, nothing is logged and the catalogue is rebuilt
+        from the snapshot and the log.
+        """
+        if self._pending is not None:  # nested transaction
+            yield self
+            return
+        self._pending = []
+        try:
+            yield self
+        except BaseException:
+            self._pending = None
+            self._movies = self._load_snapshot()
+            self._replay_log()
+            raise
+        records, self._pending = self._pending, None
+        if records:
+            self._append(*records)
+
+    @instrumented
+    def compact(self):
+        """
+        Writes the whole catalogue to a new snapshot and empties the log.
+        The snapshot is written to a temporary file and renamed over the
+        old one, so a crash leaves either the old or the new snapshot.
+        A crash before the log is emptied only means the log is replayed
+        again on top of the new snapshot, which is harmless.
+        """
+        try:
+            with atomic_write(self.file_path) as json_file:
+                json_file.write(json.dumps(self._movies))
+            open(self.log_path, "w").close()
+        except IOError as e:
+            print(e)
+            return
+        metrics.add("saves")
+        metrics.add_file_size("bytes_written", self.file_path)
+
+    def list_movies(self):
+        """
+        Returns a read-only view of the movies dictionary
+        rebuilt from the snapshot and the log.
+        """
+        return MappingProxyType(self._movies)
+
+    def add_movie(self, title, year, rating, poster):
+        """
+        Adds a movie to the movies database
+        by appending an "add" record to the log.
+        """
+        record = {"op": "add", "title": title, "year": year,
+                  "rating": rating, "poster": poster}
+        self._apply(record)
+        self._append(record)
+
+    def add_movies(self, movies):
+        """
+        Adds many movies to the movies database
+        by appending their "add" records in one write.
+        """
+        with self.transaction():
+            for title, properties in movies.items():
+                self.add_movie(title, properties["year"],
+                               properties["rating"], properties["poster"])
+
+    def delete_movie(self, title):
+        """
+        Deletes a movie from the movies database
+        by appending a "delete" record to the log.
+        """
+        if title not in self._movies:
+            print(f"{RED}Movie '{title}' doesn't exist!{ENDC}")
+            return
+        record = {"op": "delete", "title": title}
+        self._apply(record)
+        self._append(record)
+        print(f'{MAGENTA}Movie "{title}" successfully deleted{ENDC}')
+
+    def delete_movies(self, titles):
+        """
+        Deletes many movies from the movies database
+        by appending their "delete" records in one write.
+        """
+        with self.transaction():
+            for title in titles:
+                self.delete_movie(title)
+
+    def update_movie(self, title, rating):
+        """
+        Updates the rating of a movie
+        by appending an "update" record to the log.
+        """
+        self._movies[title]["rating"] = rating
+        self._append({"op": "update", "title": title, "rating": rating})
+
+    def update_movies(self, ratings):
+        """
+        Updates the ratings of many movies
+        by appending their "update" records in one write.
+        """
+        with self.transaction():
+            for title, rating in ratings.items():
+                self.update_movie(title, rating)
@@ -0,0 +1,21 @@
+from storage.storage_file import StorageFile
+from storage.movie_streams import iter_jsonl, write_jsonl
+
+class StorageJsonl(StorageFile):
+    """
+    Movies file in JSON Lines: one {"title", "year", "rating",
+    "poster"} object per line, so it can be read, appended to and
+    processed line by line by other tools.
+    """
+    def _iter_movies(self, jsonl_file):
+        """
+        Yields the movies of the JSON Lines file one line at a time.
+        """
+        return iter_jsonl(jsonl_file)
+
+    def _write_movies(self, jsonl_file, movies):
+        """
+        Gets the (title, properties) pairs of your movies
+        as an argument and writes them to the JSON Lines file.
+        """
+        write_jsonl(jsonl_file, movies)
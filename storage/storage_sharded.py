@@ -0,0 +1,332 @@
+from storage.istorage import IStorage
+from storage.file_utils import atomic_write, file_version
+from storage.instrumentation import instrumented
+from storage.storage_csv import StorageCsv
+from storage.storage_json import StorageJson
+from storage.storage_jsonl import StorageJsonl
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import contextmanager, ExitStack
+from itertools import islice
+import heapq
+import random
+import json
+import zlib
+import os
+
+# Storages of the shard files
+SHARD_FORMATS = {"json": StorageJson, "csv": StorageCsv,
+                 "jsonl": StorageJsonl}
+DEFAULT_SHARDS = 8
+MANIFEST_VERSION = 1
+
+
+def shard_of(title, shards):
+    """
+    Returns the number of the shard of a title: the crc32 of
+    the title modulo the number of shards, stable across runs
+    """
+    return zlib.crc32(title.encode("utf-8")) % shards
+
+
+def _query_shard(shard_format, file_path, query, args):
+    """
+    Runs a query method of IStorage on one shard file, in a worker
+    thread or process
+    """
+    storage = SHARD_FORMATS[shard_format](file_path, interactive=False)
+    return getattr(storage, query)(*args)
+
+
+class StorageSharded(IStorage):
+    """
+    Storage partitioned by title across several shard files.
+    file_path is a JSON manifest listing the shard files, which sit
+    next to it and are plain StorageJson (or StorageCsv, StorageJsonl)
+    files. Every movie lives in shard shard_of(title), so a change
+    loads and rewrites only its shard, and changes to different shards
+    lock different files and can run in parallel.
+
+    Queries over the whole catalogue (list_movies, filter, top_n,
+    search, the rating statistics) run on every shard at once in
+    a pool of workers, threads by default or processes with
+    executor="process", and their results are merged: top_n() merges
+    the sorted shards lazily, reading only as far as it needs.
+    The catalogue order is the order of the shards, then the insertion
+    order within each shard.
+
+    transaction() groups the changes of every shard it touches, each
+    shard being loaded and saved once. The shards are saved one after
+    the other, so a failure while saving them can leave some of them
+    saved and the others not.
+    """
+    def __init__(self, file_path, shards=DEFAULT_SHARDS,
+                 shard_format="json", executor="thread", workers=None):
+        """
+        :param shards: number of shards of a new catalogue; an existing
+            catalogue keeps the number and format of its manifest
+        :param executor: "thread" or "process", the workers running
+            the queries on the shards
+        :param workers: number of workers, by default one per shard
+            up to the number of CPUs
+        """
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown executor '{executor}', "
+                             f"choose thread or process")
+        self.file_path = file_path
+        self.executor = executor
+        self._manifest = self._load_manifest(shards, shard_format)
+        directory = os.path.dirname(os.path.abspath(file_path))
+        self.shard_format = self._manifest["format"]
+        self.shard_paths = [os.path.join(directory, name)
+                            for name in self._manifest["files"]]
+        self.workers = workers or min(len(self.shard_paths),
+                                      os.cpu_count() or 1)
+        storage_class = SHARD_FORMATS[self.shard_format]
+        self._shards = [storage_class(path, interactive=False)
+                        for path in self.shard_paths]
+        self._pool = None
+        self._stack = None
+        self._entered = set()
+
+    def _load_manifest(self, shards, shard_format):
+        """
+        Reads the manifest, or writes the manifest of a new catalogue
+        :raise ValueError: if the manifest is not valid
+        """
+        try:
+            with open(self.file_path, "r") as manifest_file:
+                manifest = json.loads(manifest_file.read())
+        except FileNotFoundError:
+            if shard_format not in SHARD_FORMATS:
+                raise ValueError(f"Unknown shard format '{shard_format}', "
+                                 f"choose one of "
+                                 f"{', '.join(SHARD_FORMATS)}")
+            stem = os.path.splitext(os.path.basename(self.file_path))[0]
+            manifest = {
+                "version": MANIFEST_VERSION,
+                "format": shard_format,
+                "files": [f"{stem}.{number:03d}.{shard_format}"
+                          for number in range(shards)]
+            }
+            with atomic_write(self.file_path) as manifest_file:
+                manifest_file.write(json.dumps(manifest, indent=4))
+            return manifest
+        except ValueError:
+            raise ValueError(f"{self.file_path} is not a shards manifest")
+        if not isinstance(manifest, dict) or \
+                manifest.get("version") != MANIFEST_VERSION or \
+                manifest.get("format") not in SHARD_FORMATS or \
+                not manifest.get("files"):
+            raise ValueError(f"{self.file_path} is not a shards manifest")
+        return manifest
+
+    def version(self):
+        """
+        Returns the versions of the shard files, which change when
+        any process writes them
+        """
+        return tuple(file_version(path) for path in self.shard_paths)
+
+    def close(self):
+        """
+        Stops the workers
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _fan_out(self, query, *args):
+        """
+        Runs a query method on every shard
+        :return: iterator of the results, in the order of the shards,
+            each available as soon as its shard is done
+        """
+        if self._stack is not None:
+            # a transaction holds changes the shard files do not have yet
+            return (getattr(shard, query)(*args) for shard in self._shards)
+        if self._pool is None:
+            pool_class = (ProcessPoolExecutor if self.executor == "process"
+                          else ThreadPoolExecutor)
+            self._pool = pool_class(self.workers)
+        shards = len(self.shard_paths)
+        return self._pool.map(_query_shard, [self.shard_format] * shards,
+                              self.shard_paths, [query] * shards,
+                              [args] * shards)
+
+    def _shard(self, title):
+        """
+        Returns the storage of the shard of a title, joining it to the
+        running transaction
+        """
+        number = shard_of(title, len(self._shards))
+        shard = self._shards[number]
+        if self._stack is not None and number not in self._entered:
+            self._stack.enter_context(shard.transaction())
+            self._entered.add(number)
+        return shard
+
+    def _group(self, titles):
+        """
+        Returns a dictionary of shard storage: titles of that shard
+        """
+        groups = {}
+        for title in titles:
+            groups.setdefault(self._shard(title), []).append(title)
+        return groups
+
+    @contextmanager
+    def transaction(self):
+        """
+        Groups the changes of the shards: every shard touched inside it
+        is loaded once and saved once when it ends. If the block raises
+        an exception, nothing is saved.
+        """
+        if self._stack is not None:  # nested transaction
+            yield self
+            return
+        with ExitStack() as stack:
+            self._stack = stack
+            try:
+                yield self
+            finally:
+                self._stack = None
+                self._entered = set()
+
+    @instrumented
+    def list_movies(self):
+        """
+        Returns a dictionary of dictionaries that
+        contains the movies information in the database,
+        reading the shards in parallel.
+        """
+        movies = {}
+        for shard_movies in self._fan_out("list_movies"):
+            movies.update(shard_movies)
+        return movies
+
+    def iter_movies(self):
+        """
+        Yields the movies one at a time, streaming
+        the shards one after the other
+        """
+        for shard in self._shards:
+            yield from shard.iter_movies()
+
+    def add_movie(self, title, year, rating, poster):
+        """
+        Adds a movie to its shard, rewriting only that shard.
+        """
+        self._shard(title).add_movie(title, year, rating, poster)
+
+    def add_movies(self, movies):
+        """
+        Adds many movies, loading and saving every shard once.
+        """
+        for shard, titles in self._group(movies).items():
+            shard.add_movies({title: movies[title] for title in titles})
+
+    def delete_movie(self, title):
+        """
+        Deletes a movie from its shard, rewriting only that shard.
+        """
+        self._shard(title).delete_movie(title)
+
+    def delete_movies(self, titles):
+        """
+        Deletes many movies, loading and saving every shard once.
+        """
+        for shard, shard_titles in self._group(titles).items():
+            shard.delete_movies(shard_titles)
+
+    def update_movie(self, title, rating):
+        """
+        Updates the rating of a movie, rewriting only its shard.
+        """
+        self._shard(title).update_movie(title, rating)
+
+    def update_movies(self, ratings):
+        """
+        Updates many ratings, loading and saving every shard once.
+        """
+        for shard, titles in self._group(ratings).items():
+            shard.update_movies({title: ratings[title] for title in titles})
+
+    def get_movie(self, title):
+        """
+        Returns the properties of a movie, reading only its shard,
+        or None if it is not in the storage
+        """
+        return self._shards[shard_of(title, len(self._shards))] \
+            .get_movie(title)
+
+    def random_movie(self):
+        """
+        Returns a random (title, properties) pair, picking a shard
+        with a probability proportional to its number of movies
+        """
+        counts = list(self._fan_out("count"))
+        if sum(counts) == 0:
+            return None
+        shard = random.choices(self._shards, weights=counts)[0]
+        return shard.random_movie()
+
+    def count(self):
+        """
+        Returns the number of movies of all the shards
+        """
+        return sum(self._fan_out("count"))
+
+    def filter(self, min_rating=None, start_year=None, end_year=None):
+        """
+        Returns the movies with a rating of at least min_rating,
+        released between start_year and end_year, filtering
+        the shards in parallel.
+        """
+        movies = {}
+        for shard_movies in self._fan_out("filter", min_rating, start_year,
+                                          end_year):
+            movies.update(shard_movies)
+        return movies
+
+    @instrumented
+    def top_n(self, key, n=None, reverse=False, offset=0):
+        """
+        Returns n (title, properties) pairs ordered by key from position
+        offset, or all of them from offset if n is None. Every shard
+        sorts (or selects the first offset + n of) its movies in
+        parallel, and the sorted shards are merged lazily. Movies with
+        the same key keep the catalogue order.
+        """
+        if key == "title":
+            sort_key = lambda movie: movie[0]
+        else:
+            sort_key = lambda movie: movie[1][key]
+        shard_n = None if n is None else offset + n
+        merged = heapq.merge(*self._fan_out("top_n", key, shard_n, reverse),
+                             key=sort_key, reverse=reverse)
+        return list(islice(merged, offset, shard_n))
+
+    def rating_columns(self):
+        """
+        Returns the (titles, ratings, years) columns of the shards,
+        read in parallel and joined in catalogue order
+        """
+        titles = []
+        ratings = []
+        years = []
+        for shard_titles, shard_ratings, shard_years in \
+                self._fan_out("rating_columns"):
+            titles.extend(shard_titles)
+            ratings.extend(shard_ratings)
+            years.extend(shard_years)
+        return titles, ratings, years
+
+    def search(self, query):
+        """
+        Returns the movies whose title contains query
+        (case-insensitive), searching the shards in parallel
+        """
+        movies = {}
+        for shard_movies in self._fan_out("search", query):
+            movies.update(shard_movies)
+        return movies
@@ -0,0 +1,292 @@
+from storage.istorage import IStorage
+from storage.instrumentation import metrics, instrumented
+from storage import rating_stats
+from contextlib import contextmanager
+import sqlite3
+import math
+
+# We define colors as global variables
+MAGENTA = '\033[95m'
+BLUE = '\033[94m'
+GREEN = '\033[92m'
+YELLOW = '\033[93m'
+RED = '\033[91m'
+ENDC = '\033[0m'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS movies (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL UNIQUE,
+    year INTEGER NOT NULL,
+    rating REAL NOT NULL,
+    poster TEXT NOT NULL DEFAULT 'N/A'
+);
+CREATE INDEX IF NOT EXISTS idx_movies_year ON movies (year);
+CREATE INDEX IF NOT EXISTS idx_movies_rating ON movies (rating);
+"""
+
+UPSERT = ("INSERT INTO movies (title, year, rating, poster) "
+          "VALUES (?, ?, ?, ?) ON CONFLICT (title) DO UPDATE SET "
+          "year = excluded.year, rating = excluded.rating, "
+          "poster = excluded.poster")
+
+# Columns that top_n() may order by
+SORT_KEYS = ("title", "year", "rating")
+
+class StorageSqlite(IStorage):
+    """
+    SQLite storage, using the standard library sqlite3 module.
+    Movies keep their insertion order through the id column, and
+    title (unique), year and rating are indexed so that filtering,
+    ranking and statistics can run in SQL instead of in Python.
+    """
+    def __init__(self, file_path):
+        self.file_path = file_path
+        # the connection may be used from another thread (the writer
+        # of api_server.py), never by two threads at the same time
+        self._connection = sqlite3.connect(file_path,
+                                           check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+        self._in_transaction = False
+
+    def version(self):
+        """
+        Returns the version of the database, which changes with every
+        commit of this connection and of the other connections
+        """
+        data_version = self._connection.execute(
+            "PRAGMA data_version").fetchone()[0]
+        return data_version, self._connection.total_changes
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs the changes made inside it in one SQLite transaction,
+        committed when it ends or rolled back if the block raises
+        """
+        if self._in_transaction:  # nested transaction
+            yield self
+            return
+        self._in_transaction = True
+        try:
+            with self._connection:
+                yield self
+        finally:
+            self._in_transaction = False
+
+    @staticmethod
+    def _to_movies(rows):
+        """
+        Turns (title, year, rating, poster) rows into
+        the movies dictionary used by all the storages
+        """
+        return {title: {"year": year, "rating": rating, "poster": poster}
+                for title, year, rating, poster in rows}
+
+    @instrumented
+    def list_movies(self):
+        """
+        Returns a dictionary of dictionaries that
+        contains the movies information in the database.
+        """
+        rows = self._connection.execute(
+            "SELECT title, year, rating, poster FROM movies ORDER BY id")
+        metrics.add("full_loads")
+        return self._to_movies(rows)
+
+    def iter_movies(self):
+        """
+        Yields the movies one row at a time from a database cursor
+        """
+        rows = self._connection.execute(
+            "SELECT title, year, rating, poster FROM movies ORDER BY id")
+        for title, year, rating, poster in rows:
+            yield title, {"year": year, "rating": rating, "poster": poster}
+
+    def add_movie(self, title, year, rating, poster):
+        """
+        Adds a movie to the movies database, or replaces
+        the properties of a movie with the same title.
+        """
+        with self.transaction():
+            self._connection.execute(UPSERT, (title, year, rating, poster))
+
+    def add_movies(self, movies):
+        """
+        Adds many movies to the movies database in one transaction.
+        """
+        with self.transaction():
+            self._connection.executemany(
+                UPSERT,
+                ((title, properties["year"], properties["rating"],
+                  properties.get("poster", "N/A"))
+                 for title, properties in movies.items()))
+
+    def delete_movie(self, title):
+        """
+        Deletes a movie from the movies database.
+        """
+        with self.transaction():
+            cursor = self._connection.execute(
+                "DELETE FROM movies WHERE title = ?", (title,))
+        if cursor.rowcount == 0:  # checks if movie exists
+            print(f"{RED}Movie '{title}' doesn't exist!{ENDC}")
+        else:
+            print(f'{MAGENTA}Movie "{title}" successfully deleted{ENDC}')
+
+    def delete_movies(self, titles):
+        """
+        Deletes many movies from the movies database in one transaction.
+        """
+        with self.transaction():
+            for title in titles:
+                self.delete_movie(title)
+
+    def update_movie(self, title, rating):
+        """
+        Updates the rating of a movie in the movies database.
+        """
+        with self.transaction():
+            cursor = self._connection.execute(
+                "UPDATE movies SET rating = ? WHERE title = ?",
+                (rating, title))
+        if cursor.rowcount == 0:
+            raise KeyError(title)
+
+    def update_movies(self, ratings):
+        """
+        Updates the ratings of many movies in one transaction.
+        """
+        with self.transaction():
+            for title, rating in ratings.items():
+                self.update_movie(title, rating)
+
+    def count(self):
+        """
+        Returns the number of movies in the database
+        """
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM movies").fetchone()[0]
+
+    def get_movie(self, title):
+        """
+        Returns the properties of a movie, looked up
+        in the title index, or None if it is not in the database
+        """
+        row = self._connection.execute(
+            "SELECT year, rating, poster FROM movies WHERE title = ?",
+            (title,)).fetchone()
+        if row is None:
+            return None
+        year, rating, poster = row
+        return {"year": year, "rating": rating, "poster": poster}
+
+    def filter(self, min_rating=None, start_year=None, end_year=None):
+        """
+        Returns the movies with a rating of at least min_rating,
+        released between start_year and end_year.
+        Criteria left as None are not applied.
+        """
+        conditions = []
+        params = []
+        if min_rating is not None:
+            conditions.append("rating >= ?")
+            params.append(min_rating)
+        if start_year is not None:
+            conditions.append("year >= ?")
+            params.append(start_year)
+        if end_year is not None:
+            conditions.append("year <= ?")
+            params.append(end_year)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        rows = self._connection.execute(
+            f"SELECT title, year, rating, poster FROM movies {where}"
+            f"ORDER BY id", params)
+        return self._to_movies(rows)
+
+    def top_n(self, key, n=None, reverse=False, offset=0):
+        """
+        Returns n (title, properties) pairs ordered by key ("title",
+        "year" or "rating") from position offset, or all of them from
+        offset if n is None. Movies with the same key keep their
+        insertion order.
+        """
+        if key not in SORT_KEYS:
+            raise ValueError(f"Cannot sort movies by {key!r}")
+        order = "DESC" if reverse else "ASC"
+        rows = self._connection.execute(
+            f"SELECT title, year, rating, poster FROM movies "
+            f"ORDER BY {key} {order}, id ASC LIMIT ? OFFSET ?",
+            (-1 if n is None else n, offset))
+        return list(self._to_movies(rows).items())
+
+    def rating_columns(self):
+        """
+        Returns the (titles, ratings, years) columns, read
+        in catalogue order without building the movies
+        """
+        rows = self._connection.execute(
+            "SELECT title, rating, year FROM movies ORDER BY id").fetchall()
+        if not rows:
+            return [], [], []
+        titles, ratings, years = zip(*rows)
+        return titles, ratings, years
+
+    def aggregate_ratings(self):
+        """
+        Returns the rating statistics of the database (count, mean,
+        median, min, max, the best and worst movie and the quartiles
+        under "percentiles"), or None if the database is empty
+        """
+        count, mean, min_rating, max_rating = self._connection.execute(
+            "SELECT COUNT(*), AVG(rating), MIN(rating), MAX(rating) "
+            "FROM movies").fetchone()
+        if count == 0:
+            return None
+        median = self._connection.execute(
+            "SELECT AVG(rating) FROM (SELECT rating FROM movies "
+            "ORDER BY rating LIMIT ? OFFSET ?)",
+            (2 - count % 2, (count - 1) // 2)).fetchone()[0]
+        # Same tie-breaks as sorting the catalogue by rating:
+        # the best movie is the last one added, the worst the first one
+        best = self._connection.execute(
+            "SELECT title FROM movies "
+            "ORDER BY rating DESC, id DESC LIMIT 1").fetchone()[0]
+        worst = self._connection.execute(
+            "SELECT title FROM movies "
+            "ORDER BY rating ASC, id ASC LIMIT 1").fetchone()[0]
+        return {
+            "count": count,
+            "mean": mean,
+            "median": median,
+            "min": min_rating,
+            "max": max_rating,
+            "best": best,
+            "worst": worst,
+            "percentiles": {percentile: self._percentile(count, percentile)
+                            for percentile in rating_stats.PERCENTILES}
+        }
+
+    def _percentile(self, count, percentile):
+        """
+        Returns a percentile of the ratings, interpolated linearly like
+        numpy.percentile(), reading the two ratings around it from the
+        rating index
+        """
+        position = (count - 1) * percentile / 100
+        low = math.floor(position)
+        ratings = [rating for rating, in self._connection.execute(
+            "SELECT rating FROM movies ORDER BY rating LIMIT 2 OFFSET ?",
+            (low,))]
+        high_rating = ratings[-1] if low + 1 < count else ratings[0]
+        return ratings[0] + (high_rating - ratings[0]) * (position - low)
+
+    def import_movies(self, storage):
+        """
+        One-shot import of every movie of another storage
+        (e.g. StorageJson or StorageCsv) in a single transaction.
+        Returns the number of imported movies.
+        """
+        movies = storage.list_movies()
+        self.add_movies(movies)
+        return len(movies)
@@ -0,0 +1,95 @@
+"""
+Locking of the API server: storage calls in the storage thread,
+OMDb lookups outside the write lock.
+"""
+import asyncio
+import json
+import threading
+from api_server import MovieServer
+from storage.storage_factory import open_storage
+
+
+class SlowOmdb:
+    """
+    OMDb client stub whose answer waits until release is set
+    """
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def fetch_movie(self, title):
+        self.started.set()
+        self.release.wait(10)
+        return {"year": 1979, "rating": 8.5, "poster": "N/A"}
+
+
+async def call(port, method, path, body=None):
+    """
+    Sends one request to the server
+    :return: the status code and the JSON body of the response
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = b"" if body is None else json.dumps(body).encode("utf-8")
+    writer.write(f"{method} {path} HTTP/1.1\r\nConnection: close\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1")
+                 + data)
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(content) if content else None
+
+
+def serve(tmp_path, test):
+    """
+    Runs test(server) against a server of a catalogue of one movie
+    """
+    movies_file = tmp_path / "movies.json"
+    movies_file.write_text(json.dumps(
+        {"Heat": {"year": 1995, "rating": 8.3, "poster": "N/A"}}))
+    server = MovieServer(open_storage(str(movies_file), interactive=False),
+                         port=0)
+
+    async def run():
+        await server.start()
+        try:
+            await test(server)
+        finally:
+            await server.close()
+    asyncio.run(run())
+
+
+def test_omdb_lookup_does_not_hold_the_write_lock(tmp_path):
+    omdb = SlowOmdb()
+
+    async def test(server):
+        server.app._omdb = omdb
+        loop = asyncio.get_running_loop()
+        post = asyncio.ensure_future(
+            call(server.port, "POST", "/movies", {"title": "Alien"}))
+        assert await loop.run_in_executor(None, omdb.started.wait, 10)
+        status, movie = await asyncio.wait_for(
+            call(server.port, "PATCH", "/movies/Heat", {"rating": 9}), 5)
+        assert (status, movie["rating"]) == (200, 9)
+        assert (await call(server.port, "GET", "/movies/Heat"))[0] == 200
+        omdb.release.set()
+        status, movie = await post
+        assert (status, movie["year"]) == (201, 1979)
+        assert (await call(server.port, "POST", "/movies",
+                           {"title": "Alien"}))[0] == 409
+    serve(tmp_path, test)
+
+
+def test_reads_run_in_the_storage_thread(tmp_path):
+    threads = []
+
+    async def test(server):
+        get_movie = server.storage.get_movie
+
+        def record(title):
+            threads.append(threading.current_thread())
+            return get_movie(title)
+        server.storage.get_movie = record
+        status, movie = await call(server.port, "GET", "/movies/Heat")
+        assert (status, movie["year"]) == (200, 1995)
+    serve(tmp_path, test)
+    assert threads and threading.main_thread() not in threads
@@ -0,0 +1,71 @@
+"""
+Batch mode of the command line: every line gets its own result, and
+the lines that succeeded are saved even when others fail.
+"""
+import io
+import json
+import pytest
+from main import run_batch
+from movie_app import MovieApp
+from storage.storage_json import StorageJson
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = StorageJson(str(tmp_path / "movies.json"), interactive=False)
+    storage.add_movie("Titanic", 1997, 7.9, "N/A")
+    return storage
+
+
+def run(storage, *lines):
+    output = io.StringIO()
+    succeeded = run_batch(MovieApp(storage), storage, lines, output)
+    return succeeded, [json.loads(line)
+                       for line in output.getvalue().splitlines()]
+
+
+def test_bad_lines_fail_alone(storage):
+    succeeded, results = run(
+        storage,
+        '{"command": "update_movie", "title": "Titanic", "rating": 9}',
+        '{"command": 5}',
+        'null',
+        '[1, 2]',
+        '{"command": null}',
+        'not json',
+        '{"command": "no_such_command"}',
+        '{"command": "update_movie", "title": "Titanic", "rating": "x"}',
+        '{"command": "update_movie", "title": 7, "rating": 8}',
+        '{"command": "sort_movies_by_rating", "limit": "1"}')
+    assert not succeeded
+    assert [result["ok"] for result in results] == \
+        [True] + [False] * 8 + [True]
+    assert results[-1]["result"][0][0] == "Titanic"
+    movies = StorageJson(storage.file_path).list_movies()
+    assert movies["Titanic"]["rating"] == 9
+
+
+def test_numbers_written_as_strings_are_converted(storage):
+    succeeded, results = run(
+        storage,
+        '{"command": "update_movie", "title": "Titanic", "rating": "8"}',
+        '{"command": "filter_movies", "min_rating": "8"}')
+    assert succeeded
+    assert list(results[1]["result"]) == ["Titanic"]
+    assert StorageJson(storage.file_path).get_movie("Titanic")["rating"] \
+        == 8.0
+
+
+def test_failed_save_reports_every_line(storage, monkeypatch):
+    def full_disk(self, file, movies):
+        raise OSError(28, "No space left on device")
+    monkeypatch.setattr(StorageJson, "_write_movies", full_disk)
+    succeeded, results = run(
+        storage,
+        '{"command": "update_movie", "title": "Titanic", "rating": 9}')
+    assert not succeeded
+    assert results[0]["ok"] is False
+    assert "not saved" in results[0]["error"]
+    monkeypatch.undo()
+    assert StorageJson(storage.file_path).get_movie("Titanic")["rating"] \
+        == 7.9
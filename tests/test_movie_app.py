@@ -0,0 +1,61 @@
+"""
+Operations and menu commands of MovieApp that check their input.
+"""
+import builtins
+import os
+import pytest
+from movie_app import MovieApp, CommandError
+from storage.storage_json import StorageJson
+from website import PLACEHOLDER
+
+TEMPLATE = f"<html><body><ul>{PLACEHOLDER}</ul></body></html>"
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """
+    A MovieApp of three movies, run in a directory with
+    a website template
+    """
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("_static")
+    with open(os.path.join("_static", "index_template.html"), "w") as html:
+        html.write(TEMPLATE)
+    storage = StorageJson("movies.json", interactive=False)
+    storage.add_movies({title: {"year": 2000, "rating": 7.0,
+                                "poster": "N/A"}
+                        for title in ("Titanic", "Alien", "Heat")})
+    return MovieApp(storage)
+
+
+def answer(monkeypatch, *answers):
+    """
+    Makes input() return the answers one after the other
+    """
+    answers = iter(answers)
+    monkeypatch.setattr(builtins, "input", lambda prompt="": next(answers))
+
+
+def page_movies(file_name):
+    with open(os.path.join("_static", file_name)) as html:
+        return html.read().count("<li")
+
+
+def test_blank_per_page_generates_a_single_page(app, monkeypatch):
+    answer(monkeypatch, "", "N")
+    app._command_generate_website()
+    assert page_movies("index.html") == 3
+
+
+def test_per_page_splits_the_website(app, monkeypatch):
+    answer(monkeypatch, "2", "N")
+    app._command_generate_website()
+    assert page_movies("index-1.html") == 2
+    assert page_movies("index-2.html") == 1
+
+
+@pytest.mark.parametrize("per_page", [0, -3])
+def test_per_page_below_one_is_rejected(app, per_page):
+    with pytest.raises(CommandError):
+        app.generate_website(per_page)
+    assert not os.path.exists(os.path.join("_static", "index.html"))
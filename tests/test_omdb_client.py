@@ -0,0 +1,121 @@
+"""
+OmdbClient against a local stub of the OMDb API: not-found titles,
+retries of 5xx and 429 responses, and the single write of an import.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import threading
+import json
+import time
+import pytest
+from movie_app import MovieApp
+from omdb_client import OmdbClient, NOT_FOUND
+from storage.storage_json import StorageJson
+
+MOVIES = {
+    "Titanic": {"Year": "1997", "imdbRating": "7.9", "Poster": "N/A"},
+    "Alien": {"Year": "1979", "imdbRating": "8.5", "Poster": "N/A"},
+    "Heat": {"Year": "1995", "imdbRating": "8.3", "Poster": "N/A"},
+}
+
+
+class StubOmdb(BaseHTTPRequestHandler):
+    """
+    Answers like OMDb. The server's failures dictionary holds, for a
+    title, the (status, headers) of the responses to send before
+    answering normally
+    """
+    def do_GET(self):
+        title = parse_qs(urlsplit(self.path).query)["t"][0]
+        with self.server.lock:
+            self.server.requests.append((title, time.monotonic()))
+            failures = self.server.failures.get(title)
+            failure = failures.pop(0) if failures else None
+        if failure is not None:
+            status, headers = failure
+            body = {"Response": "False", "Error": "try again"}
+        elif title in MOVIES:
+            status, headers = 200, {}
+            body = dict(MOVIES[title], Response="True")
+        else:
+            status, headers = 200, {}
+            body = {"Response": "False", "Error": NOT_FOUND}
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOmdb)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.failures = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(server, retries=3):
+    return OmdbClient(api_key="test",
+                      base_url=f"http://127.0.0.1:{server.server_port}/",
+                      retries=retries, backoff=0.01, max_rate=None)
+
+
+def requests_of(server, title):
+    return [moment for requested, moment in server.requests
+            if requested == title]
+
+
+def test_fetch_movies_with_missing_and_failing_titles(server):
+    server.failures = {"Alien": [(503, {})],
+                       "Heat": [(429, {"Retry-After": "1"})]}
+    movies, errors = make_client(server).fetch_movies(
+        ["Titanic", "Nonexistent Movie", "Alien", "Heat"])
+    assert list(movies) == ["Titanic", "Alien", "Heat"]
+    assert movies["Alien"] == {"year": 1979, "rating": 8.5, "poster": "N/A"}
+    assert errors == {"Nonexistent Movie": NOT_FOUND}
+    assert len(requests_of(server, "Titanic")) == 1
+    assert len(requests_of(server, "Alien")) == 2
+    heat = requests_of(server, "Heat")
+    assert len(heat) == 2
+    # the retry waited for Retry-After rather than the short backoff
+    assert heat[1] - heat[0] >= 0.9
+
+
+def test_errors_after_the_last_retry(server):
+    server.failures = {"Titanic": [(500, {})] * 3}
+    movies, errors = make_client(server, retries=2).fetch_movies(["Titanic"])
+    assert movies == {}
+    assert "500" in errors["Titanic"]
+    assert len(requests_of(server, "Titanic")) == 3
+
+
+def test_import_saves_the_found_movies_once(server, tmp_path):
+    class CountingStorage(StorageJson):
+        saves = 0
+
+        def save_movies(self, movies, expected_version=None):
+            CountingStorage.saves += 1
+            super().save_movies(movies, expected_version)
+
+    storage = CountingStorage(str(tmp_path / "movies.json"),
+                              interactive=False)
+    server.failures = {"Heat": [(502, {})]}
+    app = MovieApp(storage, omdb=make_client(server))
+    result = app.import_movies(["Titanic", "Alien", "Heat", "Nothing"])
+    assert list(result["movies"]) == ["Titanic", "Alien", "Heat"]
+    assert result["errors"] == {"Nothing": NOT_FOUND}
+    assert CountingStorage.saves == 1
+    assert list(StorageJson(storage.file_path).list_movies()) == \
+        ["Titanic", "Alien", "Heat"]
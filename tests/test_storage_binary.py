@@ -0,0 +1,68 @@
+"""
+Crash safety and lookups of the memory-mapped binary storage.
+"""
+import subprocess
+import sys
+import os
+import pytest
+from storage.storage_binary import StorageBinary, INITIAL_CAPACITY
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Adds movies in one transaction, growing the file, and dies
+# before the transaction ends
+CRASH_IN_TRANSACTION = """
+import os, sys
+from storage.storage_binary import StorageBinary
+storage = StorageBinary(sys.argv[1])
+with storage.transaction():
+    for number in range(int(sys.argv[2])):
+        storage.add_movie(f"t{number}", 2000, 5.0, "N/A")
+    os._exit(1)
+"""
+
+
+@pytest.fixture
+def file_path(tmp_path):
+    return str(tmp_path / "movies.bin")
+
+
+def test_crash_after_growing_in_a_transaction(file_path):
+    movies = INITIAL_CAPACITY + INITIAL_CAPACITY // 2
+    process = subprocess.run(
+        [sys.executable, "-c", CRASH_IN_TRANSACTION, file_path,
+         str(movies)], cwd=ROOT)
+    assert process.returncode == 1
+    storage = StorageBinary(file_path)
+    titles = [f"t{number}" for number in range(movies)]
+    assert list(storage.list_movies()) == titles
+    storage.add_movie("new", 2001, 6.0, "N/A")
+    assert storage.count() == movies + 1
+    assert list(storage.list_movies()) == titles + ["new"]
+    assert all(storage.get_movie(title) is not None for title in titles)
+    storage.close()
+
+
+def test_reopen_after_a_clean_transaction(file_path):
+    storage = StorageBinary(file_path)
+    storage.add_movies({f"t{number}": {"year": 2000, "rating": 5.0,
+                                       "poster": "N/A"}
+                        for number in range(INITIAL_CAPACITY + 1)})
+    storage.close()
+    storage = StorageBinary(file_path)
+    assert storage.count() == INITIAL_CAPACITY + 1
+    storage.close()
+
+
+def test_oversize_title_is_missing(file_path):
+    storage = StorageBinary(file_path)
+    storage.add_movie("Titanic", 1997, 7.9, "N/A")
+    title = "x" * 300
+    assert storage.get_movie(title) is None
+    storage.delete_movie(title)
+    assert storage.count() == 1
+    with pytest.raises(ValueError):
+        storage.add_movie(title, 2000, 5.0, "N/A")
+    with pytest.raises(ValueError):
+        storage.add_movie("Alien", 1979, 8.5, "http://" + "p" * 300)
+    assert list(storage.list_movies()) == ["Titanic"]
+    storage.close()
@@ -0,0 +1,72 @@
+"""
+Optimistic concurrency of the cached file storages: a write made by
+another process is never overwritten.
+"""
+import pytest
+from storage.storage_cache import StorageCache
+from storage.storage_file import StorageConflictError
+from storage.storage_json import StorageJson
+
+
+class RacingStorage(StorageJson):
+    """
+    A StorageJson where another writer adds a movie right after
+    the first time the file is loaded
+    """
+    raced = False
+
+    def list_movies(self):
+        movies = super().list_movies()
+        if not self.raced:
+            self.raced = True
+            StorageJson(self.file_path, interactive=False) \
+                .add_movie("B", 2000, 5.0, "N/A")
+        return movies
+
+
+@pytest.fixture
+def file_path(tmp_path):
+    file_path = str(tmp_path / "movies.json")
+    StorageJson(file_path, interactive=False).add_movie("A", 2000, 5.0,
+                                                        "N/A")
+    return file_path
+
+
+def test_write_during_a_load_is_not_overwritten(file_path):
+    cache = StorageCache(RacingStorage(file_path, interactive=False))
+    assert list(cache.list_movies()) == ["A"]
+    # the cache holds the version read before B was added: it reloads
+    cache.add_movie("C", 2000, 5.0, "N/A")
+    assert list(StorageJson(file_path).list_movies()) == ["A", "B", "C"]
+
+
+def test_save_over_a_newer_file_is_a_conflict(file_path):
+    storage = StorageJson(file_path, interactive=False)
+    version = storage.version()
+    movies = storage.list_movies()
+    StorageJson(file_path, interactive=False).add_movie("B", 2000, 5.0,
+                                                        "N/A")
+    with pytest.raises(StorageConflictError):
+        storage.save_movies(movies, version)
+    assert list(StorageJson(file_path).list_movies()) == ["A", "B"]
+
+
+def test_write_of_another_process_is_reloaded(file_path):
+    cache = StorageCache(StorageJson(file_path, interactive=False))
+    assert list(cache.list_movies()) == ["A"]
+    StorageJson(file_path, interactive=False).add_movie("B", 2000, 5.0,
+                                                        "N/A")
+    cache.add_movie("C", 2000, 5.0, "N/A")
+    assert list(StorageJson(file_path).list_movies()) == ["A", "B", "C"]
+
+
+def test_failed_save_is_not_cached(file_path, monkeypatch):
+    cache = StorageCache(StorageJson(file_path, interactive=False))
+
+    def full_disk(self, file, movies):
+        raise OSError(28, "No space left on device")
+    monkeypatch.setattr(StorageJson, "_write_movies", full_disk)
+    with pytest.raises(OSError):
+        cache.add_movie("C", 2000, 5.0, "N/A")
+    monkeypatch.undo()
+    assert list(cache.list_movies()) == ["A"]
@@ -0,0 +1,88 @@
+"""
+Crash safety of the journal storage: replaying a log whose last record
+was torn by a crash, and appending to it again.
+"""
+import json
+import pytest
+from storage.storage_journal import StorageJournal
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    """
+    A journal with two movies in its log and no snapshot
+    """
+    file_path = str(tmp_path / "movies.json")
+    journal = StorageJournal(file_path)
+    journal.add_movie("Titanic", 1997, 7.9, "N/A")
+    journal.add_movie("Alien", 1979, 8.5, "N/A")
+    return file_path
+
+
+def read_log(file_path):
+    with open(file_path + ".log", "rb") as log_file:
+        return log_file.read()
+
+
+def write_log(file_path, data):
+    with open(file_path + ".log", "wb") as log_file:
+        log_file.write(data)
+
+
+def test_replays_the_log(journal_path):
+    journal = StorageJournal(journal_path)
+    assert list(journal.list_movies()) == ["Titanic", "Alien"]
+
+
+def test_truncated_last_line_is_dropped(journal_path):
+    log = read_log(journal_path)
+    write_log(journal_path, log + b'{"op": "delete", "title": "Tit\n')
+    journal = StorageJournal(journal_path)
+    assert list(journal.list_movies()) == ["Titanic", "Alien"]
+
+
+def test_truncated_line_without_newline_is_dropped(journal_path):
+    log = read_log(journal_path)
+    # a complete JSON object, but the crash happened before the newline
+    write_log(journal_path, log + b'{"op": "delete", "title": "Titanic"}')
+    journal = StorageJournal(journal_path)
+    assert list(journal.list_movies()) == ["Titanic", "Alien"]
+
+
+def test_torn_record_is_cut_off_the_log(journal_path):
+    log = read_log(journal_path)
+    write_log(journal_path, log + b'{"op": "upd')
+    StorageJournal(journal_path)
+    assert read_log(journal_path) == log
+
+
+def test_append_after_recovery_starts_on_a_clean_line(journal_path):
+    log = read_log(journal_path)
+    write_log(journal_path, log + b'{"op": "add", "title": "Heat", "ye')
+    journal = StorageJournal(journal_path)
+    journal.update_movie("Alien", 9.0)
+    journal = StorageJournal(journal_path)
+    assert journal.list_movies()["Alien"]["rating"] == 9.0
+    assert "Heat" not in journal.list_movies()
+    for line in read_log(journal_path).splitlines():
+        json.loads(line)
+
+
+def test_corrupt_record_inside_the_log_is_skipped(journal_path):
+    log = read_log(journal_path)
+    write_log(journal_path, log + b'not json\n'
+              + b'{"op": "update", "title": "Titanic", "rating": 9.5}\n')
+    journal = StorageJournal(journal_path)
+    # the records after the corrupt one are kept, and so is the log
+    assert journal.list_movies()["Titanic"]["rating"] == 9.5
+    assert b"not json" in read_log(journal_path)
+
+
+def test_compaction_keeps_the_recovered_catalogue(journal_path):
+    log = read_log(journal_path)
+    write_log(journal_path, log + b'{"op"')
+    journal = StorageJournal(journal_path)
+    journal.compact()
+    assert read_log(journal_path) == b""
+    assert list(StorageJournal(journal_path).list_movies()) == \
+        ["Titanic", "Alien"]
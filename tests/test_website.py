@@ -0,0 +1,76 @@
+"""
+Incremental website builds streamed from the storage.
+"""
+import json
+import os
+import pytest
+from storage.storage_json import StorageJson
+from website import WebsiteGenerator, PLACEHOLDER, MANIFEST_NAME
+
+TEMPLATE = f"<html><body><ul>{PLACEHOLDER}</ul></body></html>"
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """
+    A catalogue of 25 movies
+    """
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("_static")
+    with open(os.path.join("_static", "index_template.html"), "w") as html:
+        html.write(TEMPLATE)
+    storage = StorageJson("movies.json", interactive=False)
+    storage.add_movies({f"Movie {number}": {"year": 2000 + number,
+                                            "rating": 7.0, "poster": "N/A"}
+                        for number in range(25)})
+    return storage
+
+
+def build(generator, monkeypatch, per_page):
+    """
+    Generates the website, failing if it loads the whole catalogue
+    """
+    def list_movies():
+        raise AssertionError("the website loaded the whole catalogue")
+    with monkeypatch.context() as patch:
+        patch.setattr(generator._storage, "list_movies", list_movies)
+        return generator.generate(per_page)
+
+
+def page(file_name):
+    with open(os.path.join("_static", file_name)) as html:
+        return html.read()
+
+
+def test_pages_are_streamed(storage, monkeypatch):
+    report = build(WebsiteGenerator(storage), monkeypatch, 10)
+    assert report["pages"] == ["index-1.html", "index-2.html",
+                               "index-3.html"]
+    assert [page(name).count("<li") for name in report["pages"]] == \
+        [10, 10, 5]
+    assert report["added"] == 25
+    with open(os.path.join("_static", MANIFEST_NAME)) as manifest:
+        assert len(json.load(manifest)["movies"]) == 25
+
+
+def test_only_changed_pages_are_rebuilt(storage, monkeypatch):
+    generator = WebsiteGenerator(storage)
+    build(generator, monkeypatch, 10)
+    storage.add_movie("Movie 12", 1999, 7.0, "N/A")
+    report = build(generator, monkeypatch, 10)
+    assert (report["rebuilt"], report["skipped"], report["updated"]) == \
+        (1, 2, 1)
+    second = page("index-2.html")
+    assert second.count("<li") == 10
+    assert "Movie 10<" in second and "1999" in second
+    assert "Movie 9<" not in second
+
+
+def test_deleted_movies_move_the_later_pages(storage, monkeypatch):
+    generator = WebsiteGenerator(storage)
+    build(generator, monkeypatch, 10)
+    storage.delete_movie("Movie 3")
+    report = build(generator, monkeypatch, 10)
+    assert report["deleted"] == 1
+    assert [page(name).count("<li") for name in report["pages"]] == \
+        [10, 10, 4]
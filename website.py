@@ -0,0 +1,342 @@
+"""
+Static website generation for the Movie App.
+
+The movie grid is rendered as a stream of <li> fragments written
+straight to the output file, so memory use does not grow with the
+number of movies. The grid can be split into pages of a fixed number
+of movies (index-1.html, index-2.html, ...) linked by a navigation bar.
+
+Builds are incremental: a manifest keeps a content hash of every movie
+and every page, and only the pages whose content changed since the
+last build are rendered again. Unchanged pages are not rewritten, so
+their modification times stay the same. The manifest is the one part
+of a build that grows with the catalogue: the hashes of the last build
+are read back whole, a title and a hash per movie.
+
+With a PosterMirror, the posters are downloaded next to the pages
+and the grid points at the local copies instead of the remote URLs.
+"""
+from storage.file_utils import atomic_write
+from storage.instrumentation import metrics, instrumented
+from contextlib import closing
+from itertools import islice
+import hashlib
+import json
+import glob
+import os
+
+TEMPLATE_PATH = os.path.join("_static", "index_template.html")
+OUTPUT_DIR = "_static"
+PLACEHOLDER = "__TEMPLATE_MOVIE_GRID__"
+MANIFEST_NAME = ".website-manifest.json"
+# Pages linked on each side of the current page in the navigation bar
+NAV_WINDOW = 2
+
+
+def content_hash(*parts):
+    """
+    Returns a short hex digest of the given strings
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        hasher.update(part.encode("utf-8"))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+class WebsiteGenerator:
+    def __init__(self, storage, template_path=TEMPLATE_PATH,
+                 output_dir=OUTPUT_DIR, posters=None):
+        '''
+        :param posters: PosterMirror used for local copies of the
+            posters, None to link to the remote posters
+        '''
+        self._storage = storage
+        self.template_path = template_path
+        self.output_dir = output_dir
+        self.posters = posters
+
+    def read_template(self):
+        '''
+        Reads the HTML template file once
+        :return: the parts of the template before and after the grid
+        '''
+        with open(self.template_path, "r") as html_template:
+            head, tail = html_template.read().split(PLACEHOLDER, 1)
+        return head, tail
+
+    def poster_src(self, properties):
+        '''
+        Returns the src of the poster of a movie: the local copy
+        if it was mirrored, otherwise the poster URL
+        '''
+        poster = properties["poster"]
+        if self.posters is None:
+            return poster
+        return self.posters.local_src(poster) or poster
+
+    def serialize_movie(self, movie, properties):
+        '''
+        Serializes a movie object and outputs it as HTML
+        :param movie: Dictionary of the movie
+        :param properties: Dictionary with the movie properties
+        :return: the movie object as HTML
+        '''
+        try:
+            return (f'        <li>\n'
+                    f'            <div class="movie">\n'
+                    f'                <img class="movie-poster" '
+                    f'src={self.poster_src(properties)} title=""/>\n'
+                    f'                <div class ="movie-title">{movie}'
+                    f'</div>\n'
+                    f'                <div class ="movie-year">'
+                    f'{properties["year"]}</div>\n'
+                    f'            </div>\n'
+                    f'        </li>\n'
+                    )
+        except (KeyError, IndexError):
+            return ''
+
+    def iter_fragments(self, movies):
+        '''
+        Yields the HTML of the movies one at a time
+        :param movies: iterable of (title, properties) pairs
+        '''
+        yield '\n'
+        for movie, properties in movies:
+            yield self.serialize_movie(movie, properties)
+
+    @staticmethod
+    def page_name(page):
+        '''
+        Returns the file name of a page, counting from 1
+        '''
+        return f"index-{page}.html"
+
+    def navigation(self, page, pages):
+        '''
+        Builds the navigation bar of a page
+        :param page: number of the current page
+        :param pages: total number of pages
+        :return: the navigation bar as HTML
+        '''
+        links = []
+        if page > 1:
+            links.append(f'<a href="{self.page_name(page - 1)}">'
+                         f'&laquo; Previous</a>')
+        shown = sorted({1, pages} |
+                       set(range(max(1, page - NAV_WINDOW),
+                                 min(pages, page + NAV_WINDOW) + 1)))
+        previous = 0
+        for number in shown:
+            if number > previous + 1:
+                links.append('<span class="gap">&hellip;</span>')
+            if number == page:
+                links.append(f'<span class="current">{number}</span>')
+            else:
+                links.append(f'<a href="{self.page_name(number)}">'
+                             f'{number}</a>')
+            previous = number
+        if page < pages:
+            links.append(f'<a href="{self.page_name(page + 1)}">'
+                         f'Next &raquo;</a>')
+        return ('<nav class="pagination">\n    ' + '\n    '.join(links)
+                + '\n</nav>\n')
+
+    def write_page(self, file_name, head, tail, movies, navigation=''):
+        '''
+        Streams one page to the output directory
+        :param movies: iterable of the (title, properties) of the page
+        :param navigation: HTML inserted before the end of the body
+        '''
+        if navigation:
+            if '</body>' in tail:
+                tail = tail.replace('</body>', navigation + '</body>', 1)
+            else:
+                tail += navigation
+        file_path = os.path.join(self.output_dir, file_name)
+        with atomic_write(file_path) as html_file:
+            html_file.write(head)
+            for fragment in self.iter_fragments(movies):
+                html_file.write(fragment)
+            html_file.write(tail)
+        metrics.add("pages_written")
+        metrics.add_file_size("bytes_written", file_path)
+
+    def movie_hash(self, movie, properties):
+        '''
+        Returns the hash of what the page shows of a movie
+        (a rating change alone does not change the page)
+        '''
+        try:
+            poster = self.poster_src(properties)
+        except KeyError:
+            poster = None
+        return content_hash(movie, str(properties.get("year")), str(poster))
+
+    def read_manifest(self):
+        '''
+        Reads the manifest of the last build
+        :return: the manifest, empty if there was no build yet
+        '''
+        try:
+            with open(os.path.join(self.output_dir, MANIFEST_NAME),
+                      "r") as manifest_file:
+                return json.load(manifest_file)
+        except (IOError, ValueError):
+            return {}
+
+    def write_manifest(self, manifest):
+        '''
+        Saves the manifest of the current build
+        '''
+        with atomic_write(os.path.join(self.output_dir, MANIFEST_NAME)) \
+                as manifest_file:
+            json.dump(manifest, manifest_file)
+
+    def plan_pages(self, count, per_page):
+        '''
+        Splits a catalogue of count movies into pages
+        :return: list of (file name, number of movies of the page,
+            navigation)
+        '''
+        if not per_page:
+            return [("index.html", count, '')]
+        pages = max(1, -(-count // per_page))
+        return [(self.page_name(page),
+                 min(per_page, count - (page - 1) * per_page),
+                 self.navigation(page, pages))
+                for page in range(1, pages + 1)]
+
+    def _hash_movies(self, manifest_file, old_movies, per_page, report):
+        '''
+        Streams the catalogue once, writing the hash of every movie to
+        the manifest and counting the movies added, updated and deleted
+        since the last build
+        :return: number of movies and, for every page, a digest of the
+            hashes of its movies
+        '''
+        count = 0
+        digests = [hashlib.blake2b(digest_size=16)]
+        for movie, properties in self._storage.iter_movies():
+            if per_page and count and count % per_page == 0:
+                digests.append(hashlib.blake2b(digest_size=16))
+            movie_hash = self.movie_hash(movie, properties)
+            digests[-1].update(movie_hash.encode("utf-8"))
+            manifest_file.write(("" if count == 0 else ", ")
+                                + json.dumps(movie) + ": "
+                                + json.dumps(movie_hash))
+            old_hash = old_movies.get(movie)
+            if old_hash is None:
+                report["added"] += 1
+            else:
+                report["deleted"] -= 1
+                report["updated"] += old_hash != movie_hash
+            count += 1
+        return count, [digest.hexdigest() for digest in digests]
+
+    @instrumented
+    def generate(self, per_page=None, force=False):
+        '''
+        Generates the website according to the template. Without
+        per_page, the whole grid goes to index.html. Otherwise the grid
+        is split into index-<k>.html pages of per_page movies, and
+        index.html redirects to the first one.
+        Only the pages whose content changed since the last build are
+        rendered, unless force is True.
+        The catalogue is streamed twice from the storage, once to hash
+        the movies and once to write the changed pages, and the new
+        manifest is written as the movies are hashed. The movie hashes
+        of the last build are still read whole, so memory use grows
+        with the catalogue by one title and hash per movie.
+        :return: report with the generated pages, how many of them were
+            rebuilt and skipped, and how many movies were added, updated
+            and deleted since the last build, and the report of the
+            PosterMirror under "posters"
+        '''
+        head, tail = self.read_template()
+        template_hash = content_hash(head, tail)
+        manifest = self.read_manifest()
+        old_movies = manifest.get("movies", {})
+        old_pages = manifest.get("pages", {})
+        if manifest.get("template") != template_hash:
+            old_pages = {}
+        posters = None
+        if self.posters is not None:
+            posters = self.posters.mirror(
+                properties.get("poster")
+                for movie, properties in self._storage.iter_movies())
+        report = {
+            "pages": [],
+            "rebuilt": 0,
+            "skipped": 0,
+            "added": 0,
+            "deleted": len(old_movies),
+            "updated": 0,
+            "posters": posters
+        }
+        with atomic_write(os.path.join(self.output_dir, MANIFEST_NAME)) \
+                as manifest_file:
+            manifest_file.write(f'{{"template": {json.dumps(template_hash)}'
+                                f', "movies": {{')
+            count, digests = self._hash_movies(manifest_file, old_movies,
+                                               per_page, report)
+            page_hashes = {}
+            # Movies of the skipped pages, passed over when the next
+            # changed page is read
+            passed = 0
+            with closing(self._storage.iter_movies()) as movies:
+                for (name, size, navigation), digest in zip(
+                        self.plan_pages(count, per_page), digests):
+                    page_hash = content_hash(template_hash, navigation,
+                                             digest)
+                    page_hashes[name] = page_hash
+                    report["pages"].append(name)
+                    if not force and old_pages.get(name) == page_hash and \
+                            os.path.exists(os.path.join(self.output_dir,
+                                                        name)):
+                        report["skipped"] += 1
+                        passed += size
+                        continue
+                    self.write_page(name, head, tail,
+                                    islice(movies, passed, passed + size),
+                                    navigation)
+                    passed = 0
+                    report["rebuilt"] += 1
+            self._remove_pages_from(len(report["pages"]) + 1
+                                    if per_page else 1)
+            if per_page:
+                self._write_redirect(report["pages"][0])
+            manifest_file.write(f'}}, "pages": {json.dumps(page_hashes)}}}')
+        return report
+
+    def _write_redirect(self, first_page):
+        '''
+        Makes index.html redirect to the first page,
+        leaving it untouched if it already does
+        '''
+        redirect = (f'<!DOCTYPE html>\n<html lang="en">\n<head>\n'
+                    f'    <meta http-equiv="refresh" '
+                    f'content="0; url={first_page}"/>\n'
+                    f'</head>\n<body>\n'
+                    f'<a href="{first_page}">My Movie App</a>\n'
+                    f'</body>\n</html>\n')
+        index_path = os.path.join(self.output_dir, "index.html")
+        try:
+            with open(index_path, "r") as index_file:
+                if index_file.read() == redirect:
+                    return
+        except IOError:
+            pass
+        with atomic_write(index_path) as index_file:
+            index_file.write(redirect)
+
+    def _remove_pages_from(self, first_page):
+        '''
+        Deletes the pages left over from a previous build
+        that had more pages
+        '''
+        for path in glob.glob(os.path.join(self.output_dir, "index-*.html")):
+            number = os.path.basename(path)[len("index-"):-len(".html")]
+            if number.isdigit() and int(number) >= first_page:
+                os.remove(path)